@@ -0,0 +1,147 @@
+import io
+import zipfile
+
+from lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+
+# Tables produced by compute_chain_analytics, in the order they are exported
+ANALYTICS_TABLES = ['put_call', 'strike_profile', 'max_pain', 'expected_move']
+
+
+def mid_price(df):
+    """Bid/ask midpoint, falling back to the last trade when either side is empty."""
+    bid = df['bid']
+    ask = df['ask']
+    mid = (bid + ask) / 2
+    return mid.where((bid > 0) & (ask > 0), df['lastPrice'])
+
+
+def strike_profile(df):
+    """Open interest and volume per (Expiration, strike), split by right."""
+    profile = (
+        df.groupby(['Expiration', 'strike', 'Option_Type'], sort=True)[['openInterest', 'volume']]
+        .sum()
+        .unstack('Option_Type', fill_value=0)
+        .reindex(columns=pd.MultiIndex.from_product([['openInterest', 'volume'], ['CALL', 'PUT']]),
+                 fill_value=0)
+    )
+    profile.columns = ['call_oi', 'put_oi', 'call_volume', 'put_volume']
+    return profile.reset_index()
+
+
+def put_call_ratios(profile):
+    """Put/call volume and open interest ratios per expiration."""
+    totals = profile.groupby('Expiration', sort=True)[
+        ['call_volume', 'put_volume', 'call_oi', 'put_oi']].sum()
+    totals['volume_ratio'] = totals['put_volume'] / totals['call_volume'].where(totals['call_volume'] > 0)
+    totals['oi_ratio'] = totals['put_oi'] / totals['call_oi'].where(totals['call_oi'] > 0)
+    return totals.reset_index()
+
+
+def max_pain(profile):
+    """Strike per expiration that minimizes the total payout to option holders.
+
+    With strikes sorted, the call payout at settlement K_j is
+    K_j * sum(callOI_i) - sum(callOI_i * K_i) over i <= j, and the put payout
+    is the mirror image over i >= j, so every candidate strike is priced with
+    running sums in one pass rather than a strike-by-strike loop.
+    """
+    expiration = profile['Expiration']
+    strike = profile['strike']
+    call_oi = profile['call_oi']
+    put_oi = profile['put_oi']
+    put_oi_strike = put_oi * strike
+
+    call_payout = (strike * call_oi.groupby(expiration).cumsum()
+                   - (call_oi * strike).groupby(expiration).cumsum())
+    # Sums over i >= j: group total minus the running sum up to j - 1
+    put_oi_above = put_oi.groupby(expiration).transform('sum') - put_oi.groupby(expiration).cumsum() + put_oi
+    put_oi_strike_above = (put_oi_strike.groupby(expiration).transform('sum')
+                           - put_oi_strike.groupby(expiration).cumsum() + put_oi_strike)
+    put_payout = put_oi_strike_above - strike * put_oi_above
+
+    payout = profile[['Expiration', 'strike']].assign(total_payout=call_payout + put_payout)
+    rows = payout.groupby('Expiration', sort=True)['total_payout'].idxmin()
+    return (payout.loc[rows]
+            .rename(columns={'strike': 'max_pain_strike'})
+            .reset_index(drop=True))
+
+
+def expected_move(df, spot=None):
+    """Straddle-implied expected move per expiration.
+
+    Uses the straddle at the strike nearest ``spot``. Without a spot price the
+    strike where call and put prices are closest is taken as at-the-money and
+    the underlying is estimated from put-call parity there.
+    """
+    mids = (
+        df.assign(mid=mid_price(df))
+        .groupby(['Expiration', 'strike', 'Option_Type'], sort=True)['mid']
+        .mean()
+        .unstack('Option_Type')
+        .reindex(columns=['CALL', 'PUT'])
+        .dropna()
+        .reset_index()
+    )
+    if mids.empty:
+        return pd.DataFrame(columns=['Expiration', 'atm_strike', 'underlying',
+                                     'expected_move', 'expected_move_pct'])
+
+    if spot is None:
+        distance = (mids['CALL'] - mids['PUT']).abs()
+    else:
+        distance = (mids['strike'] - spot).abs()
+    atm = mids.loc[distance.groupby(mids['Expiration']).idxmin()]
+
+    underlying = atm['strike'] + atm['CALL'] - atm['PUT'] if spot is None else spot
+    move = atm['CALL'] + atm['PUT']
+    return pd.DataFrame({
+        'Expiration': atm['Expiration'].values,
+        'atm_strike': atm['strike'].values,
+        'underlying': pd.Series(underlying, index=atm.index).values,
+        'expected_move': move.values,
+        'expected_move_pct': (move / underlying).values,
+    })
+
+
+def compute_chain_analytics(df, spot=None):
+    """Aggregate an assembled chain into the tables in ``ANALYTICS_TABLES``.
+
+    Every step is a groupby over (Expiration, strike), so the cost grows
+    linearly with the number of contracts.
+    """
+    if df.empty:
+        return {}
+    df = df.assign(
+        openInterest=df['openInterest'].fillna(0),
+        volume=df['volume'].fillna(0),
+    )
+    profile = strike_profile(df)
+    return {
+        'put_call': put_call_ratios(profile),
+        'strike_profile': profile,
+        'max_pain': max_pain(profile),
+        'expected_move': expected_move(df, spot),
+    }
+
+
+def expiration_summary(results):
+    """One row per expiration combining ratios, max pain and expected move."""
+    if not results:
+        return pd.DataFrame()
+    return (
+        results['put_call'][['Expiration', 'volume_ratio', 'oi_ratio']]
+        .merge(results['max_pain'][['Expiration', 'max_pain_strike']], on='Expiration', how='left')
+        .merge(results['expected_move'][['Expiration', 'atm_strike', 'expected_move', 'expected_move_pct']],
+               on='Expiration', how='left')
+    )
+
+
+def to_zip_bytes(results):
+    """Write every analytics table as a CSV inside one zip archive."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, table in results.items():
+            archive.writestr(f'{name}.csv', table.to_csv(index=False))
+    return buffer.getvalue()
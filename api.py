@@ -0,0 +1,262 @@
+"""JSON/REST routes for programmatic access, served by the Dash app's Flask server.
+
+    GET /api/v1/expirations/<ticker>
+    GET /api/v1/chain/<ticker>?type=CALL|PUT|BOTH&expiration=YYYY-MM-DD
+                              &min_strike=..&max_strike=..&around_spot=N
+                              &format=json|csv|arrow
+    GET /api/v1/history/<symbol>?days=365&format=json|csv
+    GET /api/v1/rollups/<ticker>?start=YYYY-MM-DD&end=YYYY-MM-DD&format=json|csv
+
+Responses go through the same cache and chain store as the Dash callbacks.
+Each carries an ETag and Last-Modified derived from the data snapshot, so a
+poller sending If-None-Match / If-Modified-Since gets a 304 without the body
+being rebuilt. Bodies are gzip-compressed when the client accepts it, or
+zstd-compressed when the optional ``zstandard`` package is installed and the
+client accepts that. Arguments are checked before anything is fetched: a
+malformed ticker, symbol or query argument gets a 400, a ticker with no
+options a 404.
+"""
+import datetime as dt
+import gzip
+import hashlib
+
+from flask import Blueprint, Response, jsonify, request
+
+import market_data
+from lazy_imports import lazy_import
+
+pa = lazy_import('pyarrow')
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+blueprint = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = 1024
+
+# Longest price history the history route serves, in calendar days
+MAX_HISTORY_DAYS = 36500
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'csv': 'text/csv',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+
+def register(server):
+    """Attach the API routes to a Flask server (``app.server`` for Dash)."""
+    server.register_blueprint(blueprint)
+
+
+def _error(message, status):
+    response = jsonify({'error': message})
+    response.status_code = status
+    return response
+
+
+@blueprint.errorhandler(market_data.InvalidSymbol)
+def invalid_symbol(error):
+    return _error(str(error), 400)
+
+
+@blueprint.errorhandler(market_data.NoChainError)
+def no_chain(error):
+    return _error(str(error), 404)
+
+
+def _etag(*parts):
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def _conditional(etag, last_modified, build):
+    """Return 304 if the client has this snapshot, else ``build()``'s response.
+
+    Call only once the request's arguments are validated. Validators go on
+    200s alone, so an error can never be revalidated into a 304. The body may
+    be compressed under the same ETag, so caches must key on Accept-Encoding.
+    """
+    if _not_modified(etag, last_modified):
+        response = Response(status=304)
+    else:
+        response = build()
+        if response.status_code != 200:
+            return response
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def _frame_response(df, fmt):
+    if fmt == 'csv':
+        body = df.to_csv(index=False)
+    else:
+        body = df.to_json(orient='records', date_format='iso')
+    return Response(body, content_type=CONTENT_TYPES[fmt])
+
+
+def _table_response(table, fmt):
+    if fmt == 'arrow':
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return Response(sink.getvalue().to_pybytes(), content_type=CONTENT_TYPES['arrow'])
+    return _frame_response(table.to_pandas(), fmt)
+
+
+def _version_time(version):
+    return dt.datetime.fromtimestamp(version / 1e9, tz=dt.timezone.utc)
+
+
+@blueprint.route('/expirations/<ticker>')
+def expirations(ticker):
+    version = market_data.chain_version(ticker)
+    return _conditional(
+        _etag('expirations', ticker.upper(), version),
+        _version_time(version),
+        lambda: jsonify({'ticker': ticker.upper(),
+                         'expirations': market_data.load_chain_index(ticker).expirations()})
+    )
+
+
+def _float_arg(name):
+    value = request.args.get(name)
+    return None if value in (None, '') else float(value)
+
+
+def _chain_args():
+    """The chain query's arguments, checked; raises ValueError for bad ones."""
+    option_type = request.args.get('type', 'BOTH').upper()
+    if option_type not in ('CALL', 'PUT', 'BOTH'):
+        raise ValueError("type must be CALL, PUT or BOTH")
+    try:
+        min_strike = _float_arg('min_strike')
+        max_strike = _float_arg('max_strike')
+        around_spot = int(request.args.get('around_spot') or 0)
+    except ValueError:
+        raise ValueError("min_strike, max_strike and around_spot must be numbers")
+    if around_spot < 0:
+        raise ValueError("around_spot must be positive")
+    return {
+        'option_type': option_type,
+        'expiration': request.args.get('expiration'),
+        'low': float('-inf') if min_strike is None else min_strike,
+        'high': float('inf') if max_strike is None else max_strike,
+        'around_spot': around_spot,
+    }
+
+
+def _select_chain(ticker, args):
+    option_type = args['option_type']
+    index = market_data.load_chain_index(ticker)
+    expiries = [args['expiration']] if args['expiration'] else index.expirations()
+
+    if args['around_spot']:
+        tables = [index.around_spot(e, args['spot'], args['around_spot'], option_type) for e in expiries]
+    else:
+        tables = [index.strike_range(e, args['low'], args['high'], option_type) for e in expiries]
+
+    tables = [table for table in tables if table.num_rows]
+    if not tables:
+        return index.table.slice(0, 0)
+    return pa.concat_tables(tables)
+
+
+@blueprint.route('/chain/<ticker>')
+def chain(ticker):
+    fmt = request.args.get('format', 'json')
+    if fmt not in CONTENT_TYPES:
+        return _error(f"format must be one of {', '.join(CONTENT_TYPES)}", 400)
+    try:
+        args = _chain_args()
+    except ValueError as e:
+        return _error(str(e), 400)
+    ticker = market_data.validate_symbol(ticker)
+    version = market_data.chain_version(ticker)
+    args['spot'] = None
+    if args['around_spot']:
+        args['spot'] = market_data.spot_price(ticker)
+        if args['spot'] is None:
+            return _error("no spot price available for around_spot", 400)
+
+    return _conditional(
+        _etag('chain', ticker.upper(), version, sorted(request.args.items(multi=True)), args['spot']),
+        _version_time(version),
+        lambda: _table_response(_select_chain(ticker, args), fmt)
+    )
+
+
+@blueprint.route('/history/<symbol>')
+def history(symbol):
+    fmt = request.args.get('format', 'json')
+    if fmt not in ('json', 'csv'):
+        return _error("format must be json or csv", 400)
+    try:
+        days = int(request.args.get('days', 365))
+    except ValueError:
+        return _error("days must be a whole number", 400)
+    if not 0 < days <= MAX_HISTORY_DAYS:
+        return _error(f"days must be between 1 and {MAX_HISTORY_DAYS}", 400)
+    symbol = market_data.validate_symbol(symbol)
+
+    df, created = market_data.fetch_history_entry(symbol, days)
+    if df.empty:
+        return _error(f"no price history for {symbol}", 404)
+    return _conditional(
+        _etag('history', symbol.upper(), days, created, fmt),
+        dt.datetime.fromtimestamp(created, tz=dt.timezone.utc),
+        lambda: _frame_response(df.reset_index(), fmt)
+    )
+
+
+@blueprint.route('/rollups/<ticker>')
+def rollups(ticker):
+    fmt = request.args.get('format', 'json')
+    if fmt not in ('json', 'csv'):
+        return _error("format must be json or csv", 400)
+    ticker = market_data.validate_symbol(ticker)
+    # Rollups are read as stored; asking for them never fetches a chain
+    version = market_data.daily_rollups.latest_version(ticker)
+    if version is None:
+        return _error(f"no rollups for {ticker}", 404)
+    start, end = request.args.get('start'), request.args.get('end')
+    return _conditional(
+        _etag('rollups', ticker.upper(), version, start, end, fmt),
+        _version_time(version),
+        lambda: _frame_response(market_data.load_rollups(ticker, start, end).reset_index(), fmt)
+    )
+
+
+@blueprint.after_request
+def compress(response):
+    if (response.status_code != 200 or response.direct_passthrough
+            or 'Content-Encoding' in response.headers):
+        return response
+    body = response.get_data()
+    if len(body) < MIN_COMPRESS_BYTES:
+        return response
+
+    accepted = request.accept_encodings
+    if zstandard is not None and accepted['zstd']:
+        response.set_data(zstandard.ZstdCompressor(level=3).compress(body))
+        response.headers['Content-Encoding'] = 'zstd'
+    elif accepted['gzip']:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        return response
+    response.vary.add('Accept-Encoding')
+    return response
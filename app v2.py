@@ -1,13 +1,30 @@
-import numpy as np
-import datetime as dt
-import yfinance as yf
+import functools
+import os
+from urllib.parse import urlsplit
+
 import dash
-from dash import dcc, html, dash_table
+import flask
+from dash import dcc, html, dash_table, callback, clientside_callback, ClientsideFunction
 from dash.dependencies import Input, Output, State
-import pandas as pd
-import io
-import base64
-from dash.dependencies import Input, Output
+import plotly.graph_objects as go
+
+import analytics
+import api
+import correlation
+import density
+import downsample
+import futures_curve
+import market_data
+import memprofile
+import metrics
+import payload_cache
+import portfolio
+import scenarios
+import volatility
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
 
 # Define colors
 COLORS = {
@@ -19,14 +36,8 @@ COLORS = {
     'white': '#ffffff'
 }
 
-# Initialize the Dash app with external stylesheets
-app = dash.Dash(__name__, 
-    external_stylesheets=[
-        'https://fonts.googleapis.com/css2?family=Open+Sans:wght@400;600&display=swap',
-        'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css'
-    ],
-    suppress_callback_exceptions=True
-)
+# Fonts, icons and clientside callbacks are served from here
+ASSETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
 
 # Create the navigation bar layout
 nav_bar = html.Div([
@@ -53,6 +64,14 @@ nav_bar = html.Div([
             'textDecoration': 'none',
             'fontWeight': '600'
         }
+    ),
+    dcc.Link('Portfolio', href='/portfolio', className='nav-link',
+        style={
+            'color': COLORS['white'],
+            'padding': '1rem',
+            'textDecoration': 'none',
+            'fontWeight': '600'
+        }
     )
 ], style={
     'backgroundColor': COLORS['secondary'],
@@ -63,79 +82,750 @@ nav_bar = html.Div([
 })
 
 # Create the stock prices page layout
-stock_prices_layout = html.Div([
-    nav_bar,
-    # Hero section with background image
-    html.Div([
+@functools.lru_cache(maxsize=None)
+def stock_prices_layout():
+    return html.Div([
+        nav_bar,
+        # Hero section with background image
         html.Div([
-            html.H1('Stock Price Analytics',
-                style={
-                    'color': COLORS['white'],
-                    'fontSize': '2.5rem', 
-                    'fontWeight': '600',
-                    'marginBottom': '1rem'
-                }
-            ),
-            html.P('Download and analyze historical stock price data.',
-                style={
-                    'color': COLORS['white'],
-                    'fontSize': '1.2rem',
-                    'marginBottom': '2rem'
-                }
-            ),
+            html.Div([
+                html.H1('Stock Price Analytics',
+                    style={
+                        'color': COLORS['white'],
+                        'fontSize': '2.5rem', 
+                        'fontWeight': '600',
+                        'marginBottom': '1rem'
+                    }
+                ),
+                html.P('Download and analyze historical stock price data.',
+                    style={
+                        'color': COLORS['white'],
+                        'fontSize': '1.2rem',
+                        'marginBottom': '2rem'
+                    }
+                ),
+            ], style={
+                'maxWidth': '800px',
+                'margin': 'auto',
+                'padding': '4rem 2rem',
+                'textAlign': 'center'
+            })
+        ], style={
+            'backgroundColor': COLORS['primary'],
+            'backgroundImage': 'linear-gradient(rgba(26, 61, 92, 0.9), rgba(26, 61, 92, 0.9))',
+            'backgroundSize': 'cover',
+            'backgroundPosition': 'center',
+            'marginBottom': '2rem'
+        }),
+        
+        html.Div([
+            html.Div([
+                html.Div([
+                    html.Div([
+                        dcc.Input(
+                            id='stock-ticker',
+                            type='text',
+                            placeholder='Enter stock ticker (e.g., AAPL)',
+                            style={
+                                'width': '100%',
+                                'padding': '0.75rem',
+                                'borderRadius': '0.375rem',
+                                'border': f'1px solid {COLORS["accent"]}',
+                                'marginBottom': '1.5rem'
+                            }
+                        ),
+                        
+                        dcc.Dropdown(
+                            id='timeframe',
+                            options=[
+                                {'label': '1 Month', 'value': 30},
+                                {'label': '3 Months', 'value': 90},
+                                {'label': '6 Months', 'value': 180},
+                                {'label': '1 Year', 'value': 365},
+                                {'label': '2 Years', 'value': 730},
+                                {'label': '5 Years', 'value': 1825}
+                            ],
+                            value=365,
+                            style={
+                                'marginBottom': '1.5rem'
+                            }
+                        ),
+                        
+                        html.Button(
+                            [
+                                html.I(className="fas fa-download", style={'marginRight': '0.5rem'}),
+                                'Download Stock Data'
+                            ],
+                            id='download-stock-button',
+                            style={
+                                'backgroundColor': COLORS['accent'],
+                                'color': COLORS['white'],
+                                'padding': '0.75rem 1.5rem',
+                                'border': 'none',
+                                'borderRadius': '0.375rem',
+                                'cursor': 'pointer',
+                                'width': '100%',
+                                'fontSize': '1rem',
+                                'fontWeight': '600',
+                                'display': 'flex',
+                                'alignItems': 'center',
+                                'justifyContent': 'center',
+                                'transition': 'background-color 0.2s'
+                            }
+                        ),
+                        
+                        dcc.Download(id='download-stock-data'),
+                        
+                        html.Div(
+                            id='stock-output-message',
+                            style={
+                                'marginTop': '1rem',
+                                'padding': '1rem',
+                                'borderRadius': '0.375rem',
+                                'backgroundColor': '#fed7d7',
+                                'color': '#c53030',
+                                'display': 'none'
+                            }
+                        ),
+                        
+                        dcc.Graph(id='stock-chart', style={'display': 'none'}, config={'displaylogo': False}),
+                        
+                        html.Button(
+                            [
+                                html.I(className="fas fa-chart-line", style={'marginRight': '0.5rem'}),
+                                'Realized vs Implied Vol'
+                            ],
+                            id='stock-volatility-button',
+                            style={
+                                'backgroundColor': COLORS['secondary'],
+                                'color': COLORS['white'],
+                                'padding': '0.75rem 1.5rem',
+                                'border': 'none',
+                                'borderRadius': '0.375rem',
+                                'cursor': 'pointer',
+                                'width': '100%',
+                                'fontSize': '1rem',
+                                'fontWeight': '600',
+                                'display': 'flex',
+                                'alignItems': 'center',
+                                'justifyContent': 'center',
+                                'marginTop': '1rem'
+                            }
+                        ),
+                        
+                        html.Div(id='stock-volatility')
+                    ])
+                ], style={
+                    'padding': '2rem',
+                    'backgroundColor': COLORS['white'],
+                    'borderRadius': '0.5rem',
+                    'boxShadow': '0 4px 6px rgba(0, 0, 0, 0.1)',
+                    'maxWidth': '600px',
+                    'margin': 'auto'
+                })
+            ])
         ], style={
-            'maxWidth': '800px',
-            'margin': 'auto',
-            'padding': '4rem 2rem',
-            'textAlign': 'center'
+            'padding': '0 2rem',
+            'maxWidth': '1200px',
+            'margin': 'auto'
         })
-    ], style={
-        'backgroundColor': COLORS['primary'],
-        'backgroundImage': 'linear-gradient(rgba(26, 61, 92, 0.9), rgba(26, 61, 92, 0.9))',
-        'backgroundSize': 'cover',
-        'backgroundPosition': 'center',
-        'marginBottom': '2rem'
-    }),
-    
-    html.Div([
+    ], style={'backgroundColor': COLORS['background'], 'minHeight': '100vh'})
+
+# Create the options chain page layout
+@functools.lru_cache(maxsize=None)
+def options_chain_layout():
+    return html.Div([
+        nav_bar,
+        # Hero section with background image
         html.Div([
+            html.Div([
+                html.H1('Options Chain Analytics', 
+                    style={
+                        'color': COLORS['white'],
+                        'fontSize': '2.5rem',
+                        'fontWeight': '600',
+                        'marginBottom': '1rem'
+                    }
+                ),
+                html.P('Download and analyze comprehensive options data for any publicly traded company.',
+                    style={
+                        'color': COLORS['white'],
+                        'fontSize': '1.2rem',
+                        'marginBottom': '2rem'
+                    }
+                ),
+            ], style={
+                'maxWidth': '800px',
+                'margin': 'auto',
+                'padding': '4rem 2rem',
+                'textAlign': 'center'
+            })
+        ], style={
+            'backgroundColor': COLORS['primary'],
+            'backgroundImage': 'linear-gradient(rgba(26, 61, 92, 0.9), rgba(26, 61, 92, 0.9))',
+            'backgroundSize': 'cover',
+            'backgroundPosition': 'center',
+            'marginBottom': '2rem'
+        }),
+        
+        # Main content
+        html.Div([
+            # Input Card
             html.Div([
                 html.Div([
-                    dcc.Input(
-                        id='stock-ticker',
-                        type='text',
-                        placeholder='Enter stock ticker (e.g., AAPL)',
+                    html.I(className="fas fa-chart-line", style={'fontSize': '24px', 'color': COLORS['accent'], 'marginBottom': '1rem'}),
+                    html.H2('Options Data Parameters', 
+                        style={
+                            'color': COLORS['text'],
+                            'fontSize': '1.5rem',
+                            'fontWeight': '600',
+                            'marginBottom': '2rem'
+                        }
+                    ),
+                    
+                    # Input fields
+                    html.Div([
+                        html.Label('Stock Ticker', style={'fontWeight': '600', 'color': COLORS['text'], 'marginBottom': '0.5rem'}),
+                        dcc.Input(
+                            id='ticker',
+                            type='text',
+                            placeholder='Enter stock ticker (e.g., AAPL)',
+                            style={
+                                'width': '100%',
+                                'padding': '0.75rem',
+                                'borderRadius': '0.375rem',
+                                'border': f'1px solid {COLORS["accent"]}',
+                                'marginBottom': '1.5rem'
+                            }
+                        ),
+                        
+                        html.Label('Option Type', style={'fontWeight': '600', 'color': COLORS['text'], 'marginBottom': '0.5rem'}),
+                        dcc.Dropdown(
+                            id='option-type',
+                            options=[
+                                {'label': 'Calls', 'value': 'CALL'},
+                                {'label': 'Puts', 'value': 'PUT'},
+                                {'label': 'Both', 'value': 'BOTH'}
+                            ],
+                            value='BOTH',
+                            style={
+                                'marginBottom': '1.5rem',
+                                'borderRadius': '0.375rem'
+                            }
+                        ),
+                        
+                        html.Label('Lookback Days', style={'fontWeight': '600', 'color': COLORS['text'], 'marginBottom': '0.5rem'}),
+                        dcc.Input(
+                            id='lookback-days',
+                            type='number',
+                            value=60,
+                            min=1,
+                            style={
+                                'width': '100%',
+                                'padding': '0.75rem',
+                                'borderRadius': '0.375rem',
+                                'border': f'1px solid {COLORS["accent"]}',
+                                'marginBottom': '1.5rem'
+                            }
+                        ),
+                        
+                        html.Label('Strikes Around Spot', style={'fontWeight': '600', 'color': COLORS['text'], 'marginBottom': '0.5rem'}),
+                        dcc.Input(
+                            id='strikes-around-spot',
+                            type='number',
+                            placeholder='All strikes',
+                            min=1,
+                            style={
+                                'width': '100%',
+                                'padding': '0.75rem',
+                                'borderRadius': '0.375rem',
+                                'border': f'1px solid {COLORS["accent"]}',
+                                'marginBottom': '1.5rem'
+                            }
+                        ),
+                        
+                        html.Button(
+                            [
+                                html.I(className="fas fa-download", style={'marginRight': '0.5rem'}),
+                                'Download Options Data'
+                            ],
+                            id='download-button',
+                            style={
+                                'backgroundColor': COLORS['accent'],
+                                'color': COLORS['white'],
+                                'padding': '0.75rem 1.5rem',
+                                'border': 'none',
+                                'borderRadius': '0.375rem',
+                                'cursor': 'pointer',
+                                'width': '100%',
+                                'fontSize': '1rem',
+                                'fontWeight': '600',
+                                'display': 'flex',
+                                'alignItems': 'center',
+                                'justifyContent': 'center',
+                                'transition': 'background-color 0.2s'
+                            }
+                        ),
+                        
+                        dcc.Download(id='download-options-data'),
+                        dcc.Download(id='download-options-analytics'),
+                        
+                        html.Div(
+                            id='output-message',
+                            style={
+                                'marginTop': '1rem',
+                                'padding': '1rem',
+                                'borderRadius': '0.375rem',
+                                'backgroundColor': '#fed7d7',
+                                'color': '#c53030',
+                                'display': 'none'
+                            }
+                        ),
+                        
+                        # Analytics panel, filled in after a successful download
+                        html.Div(id='options-analytics'),
+                        
+                        html.Button(
+                            [
+                                html.I(className="fas fa-history", style={'marginRight': '0.5rem'}),
+                                'Daily History'
+                            ],
+                            id='options-rollups-button',
+                            style={
+                                'backgroundColor': COLORS['secondary'],
+                                'color': COLORS['white'],
+                                'padding': '0.75rem 1.5rem',
+                                'border': 'none',
+                                'borderRadius': '0.375rem',
+                                'cursor': 'pointer',
+                                'width': '100%',
+                                'fontSize': '1rem',
+                                'fontWeight': '600',
+                                'display': 'flex',
+                                'alignItems': 'center',
+                                'justifyContent': 'center',
+                                'marginTop': '1rem'
+                            }
+                        ),
+                        
+                        html.Div(id='options-rollups')
+                    ])
+                ], style={
+                    'padding': '2rem',
+                    'backgroundColor': COLORS['white'],
+                    'borderRadius': '0.5rem',
+                    'boxShadow': '0 4px 6px rgba(0, 0, 0, 0.1)',
+                    'maxWidth': '600px',
+                    'margin': 'auto'
+                })
+            ])
+        ], style={
+            'padding': '0 2rem',
+            'maxWidth': '1200px',
+            'margin': 'auto'
+        })
+    ], style={'backgroundColor': COLORS['background'], 'minHeight': '100vh'})
+
+# Create the futures page layout
+@functools.lru_cache(maxsize=None)
+def futures_layout():
+    return html.Div([
+        nav_bar,
+        html.Div([
+            html.Div([
+                html.H1('Futures Market Analytics',
+                    style={
+                        'color': COLORS['white'],
+                        'fontSize': '2.5rem', 
+                        'fontWeight': '600',
+                        'marginBottom': '1rem'
+                    }
+                ),
+                html.P('Download and analyze futures market data.',
+                    style={
+                        'color': COLORS['white'],
+                        'fontSize': '1.2rem',
+                        'marginBottom': '2rem'
+                    }
+                ),
+            ], style={
+                'maxWidth': '800px',
+                'margin': 'auto',
+                'padding': '4rem 2rem',
+                'textAlign': 'center'
+            })
+        ], style={
+            'backgroundColor': COLORS['primary'],
+            'backgroundImage': 'linear-gradient(rgba(26, 61, 92, 0.9), rgba(26, 61, 92, 0.9))',
+            'backgroundSize': 'cover',
+            'backgroundPosition': 'center',
+            'marginBottom': '2rem'
+        }),
+        
+        html.Div([
+            html.Div([
+                html.Div([
+                    html.Div([
+                        html.Label('Futures Symbol', style={'fontWeight': '600', 'color': COLORS['text'], 'marginBottom': '0.5rem'}),
+                        dcc.Input(
+                            id='futures-symbol',
+                            type='text',
+                            placeholder='Enter futures symbol (e.g., ES=F for E-mini S&P 500)',
+                            style={
+                                'width': '100%',
+                                'padding': '0.75rem',
+                                'borderRadius': '0.375rem',
+                                'border': f'1px solid {COLORS["accent"]}',
+                                'marginBottom': '1.5rem'
+                            }
+                        ),
+                        
+                        html.Label('Time Period', style={'fontWeight': '600', 'color': COLORS['text'], 'marginBottom': '0.5rem'}),
+                        dcc.Dropdown(
+                            id='futures-timeframe',
+                            options=[
+                                {'label': '1 Month', 'value': 30},
+                                {'label': '3 Months', 'value': 90},
+                                {'label': '6 Months', 'value': 180},
+                                {'label': '1 Year', 'value': 365},
+                                {'label': '2 Years', 'value': 730},
+                                {'label': '5 Years', 'value': 1825}
+                            ],
+                            value=365,
+                            style={
+                                'marginBottom': '1.5rem'
+                            }
+                        ),
+                        
+                        html.Button(
+                            [
+                                html.I(className="fas fa-download", style={'marginRight': '0.5rem'}),
+                                'Download Futures Data'
+                            ],
+                            id='download-futures-button',
+                            style={
+                                'backgroundColor': COLORS['accent'],
+                                'color': COLORS['white'],
+                                'padding': '0.75rem 1.5rem',
+                                'border': 'none',
+                                'borderRadius': '0.375rem',
+                                'cursor': 'pointer',
+                                'width': '100%',
+                                'fontSize': '1rem',
+                                'fontWeight': '600',
+                                'display': 'flex',
+                                'alignItems': 'center',
+                                'justifyContent': 'center',
+                                'transition': 'background-color 0.2s'
+                            }
+                        ),
+                        
+                        dcc.Download(id='download-futures-data'),
+                        
+                        html.Div(
+                            id='futures-output-message',
+                            style={
+                                'marginTop': '1rem',
+                                'padding': '1rem',
+                                'borderRadius': '0.375rem',
+                                'backgroundColor': '#fed7d7',
+                                'color': '#c53030',
+                                'display': 'none'
+                            }
+                        ),
+                        
+                        dcc.Graph(id='futures-chart', style={'display': 'none'}, config={'displaylogo': False}),
+                        
+                        html.Button(
+                            [
+                                html.I(className="fas fa-chart-line", style={'marginRight': '0.5rem'}),
+                                'Forward Curve'
+                            ],
+                            id='futures-curve-button',
+                            style={
+                                'backgroundColor': COLORS['secondary'],
+                                'color': COLORS['white'],
+                                'padding': '0.75rem 1.5rem',
+                                'border': 'none',
+                                'borderRadius': '0.375rem',
+                                'cursor': 'pointer',
+                                'width': '100%',
+                                'fontSize': '1rem',
+                                'fontWeight': '600',
+                                'display': 'flex',
+                                'alignItems': 'center',
+                                'justifyContent': 'center',
+                                'marginTop': '1rem'
+                            }
+                        ),
+                        
+                        html.Div(id='futures-curve')
+                    ])
+                ], style={
+                    'padding': '2rem',
+                    'backgroundColor': COLORS['white'],
+                    'borderRadius': '0.5rem',
+                    'boxShadow': '0 4px 6px rgba(0, 0, 0, 0.1)',
+                    'maxWidth': '600px',
+                    'margin': 'auto'
+                })
+            ])
+        ], style={
+            'padding': '0 2rem',
+            'maxWidth': '1200px',
+            'margin': 'auto'
+        }),
+
+        # Reference Section
+        html.Div([
+            html.Div([
+                html.H2('Futures Symbol Reference',
+                    style={
+                        'color': COLORS['text'],
+                        'fontSize': '1.5rem',
+                        'fontWeight': '600',
+                        'marginBottom': '1.5rem',
+                        'textAlign': 'center'
+                    }
+                ),
+                
+                # Energy Futures
+                html.Div([
+                    html.Button(
+                        'Energy Futures',
+                        id='energy-futures-button',
                         style={
                             'width': '100%',
-                            'padding': '0.75rem',
+                            'padding': '1rem',
+                            'backgroundColor': COLORS['accent'],
+                            'color': COLORS['white'],
+                            'border': 'none',
                             'borderRadius': '0.375rem',
-                            'border': f'1px solid {COLORS["accent"]}',
-                            'marginBottom': '1.5rem'
+                            'textAlign': 'left',
+                            'fontWeight': '600',
+                            'marginBottom': '0.5rem'
                         }
                     ),
-                    
-                    dcc.Dropdown(
-                        id='timeframe',
-                        options=[
-                            {'label': '1 Month', 'value': 30},
-                            {'label': '3 Months', 'value': 90},
-                            {'label': '6 Months', 'value': 180},
-                            {'label': '1 Year', 'value': 365},
-                            {'label': '2 Years', 'value': 730},
-                            {'label': '5 Years', 'value': 1825}
-                        ],
-                        value=365,
+                    html.Div([
+                        html.P('Crude Oil (WTI): CL=F', style={'margin': '0.5rem 0'}),
+                        html.P('Brent Crude Oil: BZ=F', style={'margin': '0.5rem 0'}),
+                        html.P('Natural Gas: NG=F', style={'margin': '0.5rem 0'}),
+                        html.P('Heating Oil: HO=F', style={'margin': '0.5rem 0'}),
+                        html.P('Gasoline (RBOB): RB=F', style={'margin': '0.5rem 0'})
+                    ], id='energy-futures-content', style={'display': 'none', 'padding': '1rem', 'backgroundColor': '#f8fafc'})
+                ], style={'marginBottom': '1rem'}),
+
+                # Metal Futures
+                html.Div([
+                    html.Button(
+                        'Metal Futures',
+                        id='metal-futures-button',
                         style={
-                            'marginBottom': '1.5rem'
+                            'width': '100%',
+                            'padding': '1rem',
+                            'backgroundColor': COLORS['accent'],
+                            'color': COLORS['white'],
+                            'border': 'none',
+                            'borderRadius': '0.375rem',
+                            'textAlign': 'left',
+                            'fontWeight': '600',
+                            'marginBottom': '0.5rem'
+                        }
+                    ),
+                    html.Div([
+                        html.P('Gold: GC=F', style={'margin': '0.5rem 0'}),
+                        html.P('Silver: SI=F', style={'margin': '0.5rem 0'}),
+                        html.P('Copper: HG=F', style={'margin': '0.5rem 0'}),
+                        html.P('Platinum: PL=F', style={'margin': '0.5rem 0'}),
+                        html.P('Palladium: PA=F', style={'margin': '0.5rem 0'})
+                    ], id='metal-futures-content', style={'display': 'none', 'padding': '1rem', 'backgroundColor': '#f8fafc'})
+                ], style={'marginBottom': '1rem'}),
+
+                # Agricultural Futures
+                html.Div([
+                    html.Button(
+                        'Agricultural Futures',
+                        id='ag-futures-button',
+                        style={
+                            'width': '100%',
+                            'padding': '1rem',
+                            'backgroundColor': COLORS['accent'],
+                            'color': COLORS['white'],
+                            'border': 'none',
+                            'borderRadius': '0.375rem',
+                            'textAlign': 'left',
+                            'fontWeight': '600',
+                            'marginBottom': '0.5rem'
+                        }
+                    ),
+                    html.Div([
+                        html.P('Corn: ZC=F', style={'margin': '0.5rem 0'}),
+                        html.P('Wheat: ZW=F', style={'margin': '0.5rem 0'}),
+                        html.P('Soybeans: ZS=F', style={'margin': '0.5rem 0'}),
+                        html.P('Soybean Oil: ZL=F', style={'margin': '0.5rem 0'}),
+                        html.P('Cotton: CT=F', style={'margin': '0.5rem 0'}),
+                        html.P('Sugar #11: SB=F', style={'margin': '0.5rem 0'}),
+                        html.P('Coffee: KC=F', style={'margin': '0.5rem 0'}),
+                        html.P('Cocoa: CC=F', style={'margin': '0.5rem 0'}),
+                        html.P('Live Cattle: LE=F', style={'margin': '0.5rem 0'}),
+                        html.P('Lean Hogs: HE=F', style={'margin': '0.5rem 0'})
+                    ], id='ag-futures-content', style={'display': 'none', 'padding': '1rem', 'backgroundColor': '#f8fafc'})
+                ], style={'marginBottom': '1rem'}),
+
+                # Index Futures
+                html.Div([
+                    html.Button(
+                        'Index Futures',
+                        id='index-futures-button',
+                        style={
+                            'width': '100%',
+                            'padding': '1rem',
+                            'backgroundColor': COLORS['accent'],
+                            'color': COLORS['white'],
+                            'border': 'none',
+                            'borderRadius': '0.375rem',
+                            'textAlign': 'left',
+                            'fontWeight': '600',
+                            'marginBottom': '0.5rem'
+                        }
+                    ),
+                    html.Div([
+                        html.P('S&P 500 E-mini: ES=F', style={'margin': '0.5rem 0'}),
+                        html.P('Nasdaq 100 E-mini: NQ=F', style={'margin': '0.5rem 0'}),
+                        html.P('Dow Jones E-mini: YM=F', style={'margin': '0.5rem 0'}),
+                        html.P('Russell 2000 E-mini: RTY=F', style={'margin': '0.5rem 0'})
+                    ], id='index-futures-content', style={'display': 'none', 'padding': '1rem', 'backgroundColor': '#f8fafc'})
+                ], style={'marginBottom': '1rem'}),
+
+                # Currency Futures
+                html.Div([
+                    html.Button(
+                        'Currency Futures',
+                        id='currency-futures-button',
+                        style={
+                            'width': '100%',
+                            'padding': '1rem',
+                            'backgroundColor': COLORS['accent'],
+                            'color': COLORS['white'],
+                            'border': 'none',
+                            'borderRadius': '0.375rem',
+                            'textAlign': 'left',
+                            'fontWeight': '600',
+                            'marginBottom': '0.5rem'
+                        }
+                    ),
+                    html.Div([
+                        html.P('Euro FX: 6E=F', style={'margin': '0.5rem 0'}),
+                        html.P('Japanese Yen: 6J=F', style={'margin': '0.5rem 0'}),
+                        html.P('British Pound: 6B=F', style={'margin': '0.5rem 0'}),
+                        html.P('Australian Dollar: 6A=F', style={'margin': '0.5rem 0'}),
+                        html.P('Canadian Dollar: 6C=F', style={'margin': '0.5rem 0'}),
+                        html.P('Swiss Franc: 6S=F', style={'margin': '0.5rem 0'})
+                    ], id='currency-futures-content', style={'display': 'none', 'padding': '1rem', 'backgroundColor': '#f8fafc'})
+                ], style={'marginBottom': '1rem'}),
+
+                # Interest Rate Futures
+                html.Div([
+                    html.Button(
+                        'Interest Rate Futures',
+                        id='interest-futures-button',
+                        style={
+                            'width': '100%',
+                            'padding': '1rem',
+                            'backgroundColor': COLORS['accent'],
+                            'color': COLORS['white'],
+                            'border': 'none',
+                            'borderRadius': '0.375rem',
+                            'textAlign': 'left',
+                            'fontWeight': '600',
+                            'marginBottom': '0.5rem'
+                        }
+                    ),
+                    html.Div([
+                        html.P('10-Year T-Note: ZN=F', style={'margin': '0.5rem 0'}),
+                        html.P('5-Year T-Note: ZF=F', style={'margin': '0.5rem 0'}),
+                        html.P('2-Year T-Note: ZT=F', style={'margin': '0.5rem 0'}),
+                        html.P('30-Year T-Bond: ZB=F', style={'margin': '0.5rem 0'}),
+                        html.P('Eurodollar: GE=F', style={'margin': '0.5rem 0'})
+                    ], id='interest-futures-content', style={'display': 'none', 'padding': '1rem', 'backgroundColor': '#f8fafc'})
+                ], style={'marginBottom': '1rem'})
+            ], style={
+                'padding': '2rem',
+                'backgroundColor': COLORS['white'],
+                'borderRadius': '0.5rem',
+                'boxShadow': '0 4px 6px rgba(0, 0, 0, 0.1)',
+                'maxWidth': '800px',
+                'margin': '2rem auto'
+            })
+        ], style={
+            'padding': '0 2rem',
+            'maxWidth': '1200px',
+            'margin': 'auto'
+        })
+    ], style={'backgroundColor': COLORS['background'], 'minHeight': '100vh'})
+
+# Create the portfolio page layout
+@functools.lru_cache(maxsize=None)
+def portfolio_layout():
+    return html.Div([
+        nav_bar,
+        html.Div([
+            html.Div([
+                html.H1('Portfolio Greeks',
+                    style={
+                        'color': COLORS['white'],
+                        'fontSize': '2.5rem',
+                        'fontWeight': '600',
+                        'marginBottom': '1rem'
+                    }
+                ),
+                html.P('Upload option positions to aggregate delta, gamma, vega and theta across your book.',
+                    style={
+                        'color': COLORS['white'],
+                        'fontSize': '1.2rem',
+                        'marginBottom': '2rem'
+                    }
+                ),
+            ], style={
+                'maxWidth': '800px',
+                'margin': 'auto',
+                'padding': '4rem 2rem',
+                'textAlign': 'center'
+            })
+        ], style={
+            'backgroundColor': COLORS['primary'],
+            'backgroundImage': 'linear-gradient(rgba(26, 61, 92, 0.9), rgba(26, 61, 92, 0.9))',
+            'backgroundSize': 'cover',
+            'backgroundPosition': 'center',
+            'marginBottom': '2rem'
+        }),
+        
+        html.Div([
+            html.Div([
+                html.Div([
+                    html.Label('Positions File', style={'fontWeight': '600', 'color': COLORS['text'], 'marginBottom': '0.5rem'}),
+                    html.P('CSV with contractSymbol and quantity columns (negative for short).',
+                        style={'color': COLORS['text'], 'fontSize': '0.9rem', 'margin': '0 0 0.5rem 0'}
+                    ),
+                    dcc.Upload(
+                        id='positions-upload',
+                        children=html.Div(['Drag and drop or ', html.A('select a file')]),
+                        style={
+                            'width': '100%',
+                            'padding': '1.5rem 0',
+                            'borderWidth': '1px',
+                            'borderStyle': 'dashed',
+                            'borderColor': COLORS['accent'],
+                            'borderRadius': '0.375rem',
+                            'textAlign': 'center',
+                            'marginBottom': '1.5rem',
+                            'cursor': 'pointer'
                         }
                     ),
                     
                     html.Button(
-                        [
-                            html.I(className="fas fa-download", style={'marginRight': '0.5rem'}),
-                            'Download Stock Data'
-                        ],
-                        id='download-stock-button',
+                        'Refresh Greeks',
+                        id='refresh-greeks-button',
                         style={
                             'backgroundColor': COLORS['accent'],
                             'color': COLORS['white'],
@@ -146,17 +836,15 @@ stock_prices_layout = html.Div([
                             'width': '100%',
                             'fontSize': '1rem',
                             'fontWeight': '600',
-                            'display': 'flex',
-                            'alignItems': 'center',
-                            'justifyContent': 'center',
                             'transition': 'background-color 0.2s'
                         }
                     ),
                     
-                    dcc.Download(id='download-stock-data'),
+                    dcc.Store(id='positions-store'),
+                    dcc.Store(id='rejected-positions-store'),
                     
                     html.Div(
-                        id='stock-output-message',
+                        id='portfolio-output-message',
                         style={
                             'marginTop': '1rem',
                             'padding': '1rem',
@@ -165,81 +853,38 @@ stock_prices_layout = html.Div([
                             'color': '#c53030',
                             'display': 'none'
                         }
-                    )
+                    ),
+                    
+                    html.Div(id='portfolio-greeks')
                 ])
             ], style={
                 'padding': '2rem',
                 'backgroundColor': COLORS['white'],
                 'borderRadius': '0.5rem',
                 'boxShadow': '0 4px 6px rgba(0, 0, 0, 0.1)',
-                'maxWidth': '600px',
+                'maxWidth': '800px',
                 'margin': 'auto'
-            })
-        ])
-    ], style={
-        'padding': '0 2rem',
-        'maxWidth': '1200px',
-        'margin': 'auto'
-    })
-], style={'backgroundColor': COLORS['background'], 'minHeight': '100vh'})
-
-# Create the options chain page layout
-options_chain_layout = html.Div([
-    nav_bar,
-    # Hero section with background image
-    html.Div([
-        html.Div([
-            html.H1('Options Chain Analytics', 
-                style={
-                    'color': COLORS['white'],
-                    'fontSize': '2.5rem',
-                    'fontWeight': '600',
-                    'marginBottom': '1rem'
-                }
-            ),
-            html.P('Download and analyze comprehensive options data for any publicly traded company.',
-                style={
-                    'color': COLORS['white'],
-                    'fontSize': '1.2rem',
-                    'marginBottom': '2rem'
-                }
-            ),
-        ], style={
-            'maxWidth': '800px',
-            'margin': 'auto',
-            'padding': '4rem 2rem',
-            'textAlign': 'center'
-        })
-    ], style={
-        'backgroundColor': COLORS['primary'],
-        'backgroundImage': 'linear-gradient(rgba(26, 61, 92, 0.9), rgba(26, 61, 92, 0.9))',
-        'backgroundSize': 'cover',
-        'backgroundPosition': 'center',
-        'marginBottom': '2rem'
-    }),
-    
-    # Main content
-    html.Div([
-        # Input Card
-        html.Div([
+            }),
+            
+            # Scenario analysis card
             html.Div([
-                html.I(className="fas fa-chart-line", style={'fontSize': '24px', 'color': COLORS['accent'], 'marginBottom': '1rem'}),
-                html.H2('Options Data Parameters', 
+                html.H2('Scenario Analysis',
                     style={
                         'color': COLORS['text'],
                         'fontSize': '1.5rem',
                         'fontWeight': '600',
-                        'marginBottom': '2rem'
+                        'marginBottom': '1.5rem'
                     }
                 ),
-                
-                # Input fields
                 html.Div([
-                    html.Label('Stock Ticker', style={'fontWeight': '600', 'color': COLORS['text'], 'marginBottom': '0.5rem'}),
+                    html.Label('Chain Ticker (optional)', style={'fontWeight': '600', 'color': COLORS['text'], 'marginBottom': '0.5rem'}),
+                    html.P('Leave empty to shock the uploaded positions, or enter a ticker to reprice its whole chain.',
+                        style={'color': COLORS['text'], 'fontSize': '0.9rem', 'margin': '0 0 0.5rem 0'}
+                    ),
                     dcc.Input(
-                        id='ticker',
+                        id='scenario-ticker',
                         type='text',
-                        placeholder='Enter stock ticker (e.g., AAPL)',
+                        placeholder='e.g., SPY',
                         style={
                             'width': '100%',
                             'padding': '0.75rem',
@@ -249,26 +894,26 @@ options_chain_layout = html.Div([
                         }
                     ),
                     
-                    html.Label('Option Type', style={'fontWeight': '600', 'color': COLORS['text'], 'marginBottom': '0.5rem'}),
-                    dcc.Dropdown(
-                        id='option-type',
-                        options=[
-                            {'label': 'Calls', 'value': 'CALL'},
-                            {'label': 'Puts', 'value': 'PUT'},
-                            {'label': 'Both', 'value': 'BOTH'}
-                        ],
-                        value='BOTH',
+                    html.Label('Spot Shock Range (+/- %)', style={'fontWeight': '600', 'color': COLORS['text'], 'marginBottom': '0.5rem'}),
+                    dcc.Input(
+                        id='spot-shock-range',
+                        type='number',
+                        value=20,
+                        min=1,
                         style={
-                            'marginBottom': '1.5rem',
-                            'borderRadius': '0.375rem'
+                            'width': '100%',
+                            'padding': '0.75rem',
+                            'borderRadius': '0.375rem',
+                            'border': f'1px solid {COLORS["accent"]}',
+                            'marginBottom': '1.5rem'
                         }
                     ),
                     
-                    html.Label('Lookback Days', style={'fontWeight': '600', 'color': COLORS['text'], 'marginBottom': '0.5rem'}),
+                    html.Label('Vol Shock Range (+/- vol points)', style={'fontWeight': '600', 'color': COLORS['text'], 'marginBottom': '0.5rem'}),
                     dcc.Input(
-                        id='lookback-days',
+                        id='vol-shock-range',
                         type='number',
-                        value=60,
+                        value=20,
                         min=1,
                         style={
                             'width': '100%',
@@ -279,12 +924,39 @@ options_chain_layout = html.Div([
                         }
                     ),
                     
+                    html.Label('Grid Points per Axis', style={'fontWeight': '600', 'color': COLORS['text'], 'marginBottom': '0.5rem'}),
+                    dcc.Input(
+                        id='scenario-grid-size',
+                        type='number',
+                        value=25,
+                        min=3,
+                        style={
+                            'width': '100%',
+                            'padding': '0.75rem',
+                            'borderRadius': '0.375rem',
+                            'border': f'1px solid {COLORS["accent"]}',
+                            'marginBottom': '1.5rem'
+                        }
+                    ),
+                    
+                    html.Label('Horizon (days forward)', style={'fontWeight': '600', 'color': COLORS['text'], 'marginBottom': '0.5rem'}),
+                    dcc.Input(
+                        id='scenario-horizon',
+                        type='number',
+                        value=0,
+                        min=0,
+                        style={
+                            'width': '100%',
+                            'padding': '0.75rem',
+                            'borderRadius': '0.375rem',
+                            'border': f'1px solid {COLORS["accent"]}',
+                            'marginBottom': '1.5rem'
+                        }
+                    ),
+                    
                     html.Button(
-                        [
-                            html.I(className="fas fa-download", style={'marginRight': '0.5rem'}),
-                            'Download Options Data'
-                        ],
-                        id='download-button',
+                        'Run Scenarios',
+                        id='run-scenarios-button',
                         style={
                             'backgroundColor': COLORS['accent'],
                             'color': COLORS['white'],
@@ -295,17 +967,15 @@ options_chain_layout = html.Div([
                             'width': '100%',
                             'fontSize': '1rem',
                             'fontWeight': '600',
-                            'display': 'flex',
-                            'alignItems': 'center',
-                            'justifyContent': 'center',
                             'transition': 'background-color 0.2s'
                         }
                     ),
                     
-                    dcc.Download(id='download-options-data'),
+                    dcc.Store(id='scenario-store'),
+                    dcc.Download(id='download-scenario-grid'),
                     
                     html.Div(
-                        id='output-message',
+                        id='scenario-output-message',
                         style={
                             'marginTop': '1rem',
                             'padding': '1rem',
@@ -314,67 +984,58 @@ options_chain_layout = html.Div([
                             'color': '#c53030',
                             'display': 'none'
                         }
-                    )
-                ])
-            ], style={
-                'padding': '2rem',
-                'backgroundColor': COLORS['white'],
-                'borderRadius': '0.5rem',
-                'boxShadow': '0 4px 6px rgba(0, 0, 0, 0.1)',
-                'maxWidth': '600px',
-                'margin': 'auto'
-            })
-        ])
-    ], style={
-        'padding': '0 2rem',
-        'maxWidth': '1200px',
-        'margin': 'auto'
-    })
-], style={'backgroundColor': COLORS['background'], 'minHeight': '100vh'})
-
-# Create the futures page layout
-futures_layout = html.Div([
-    nav_bar,
-    html.Div([
-        html.Div([
-            html.H1('Futures Market Analytics',
-                style={
-                    'color': COLORS['white'],
-                    'fontSize': '2.5rem', 
-                    'fontWeight': '600',
-                    'marginBottom': '1rem'
-                }
-            ),
-            html.P('Download and analyze futures market data.',
-                style={
-                    'color': COLORS['white'],
-                    'fontSize': '1.2rem',
-                    'marginBottom': '2rem'
-                }
-            ),
-        ], style={
-            'maxWidth': '800px',
-            'margin': 'auto',
-            'padding': '4rem 2rem',
-            'textAlign': 'center'
-        })
-    ], style={
-        'backgroundColor': COLORS['primary'],
-        'backgroundImage': 'linear-gradient(rgba(26, 61, 92, 0.9), rgba(26, 61, 92, 0.9))',
-        'backgroundSize': 'cover',
-        'backgroundPosition': 'center',
-        'marginBottom': '2rem'
-    }),
-    
-    html.Div([
-        html.Div([
+                    ),
+                    
+                    dcc.Graph(id='scenario-heatmap', style={'display': 'none'}),
+                    
+                    html.Button(
+                        [
+                            html.I(className="fas fa-download", style={'marginRight': '0.5rem'}),
+                            'Download Scenario Grid'
+                        ],
+                        id='download-scenario-button',
+                        style={
+                            'backgroundColor': COLORS['secondary'],
+                            'color': COLORS['white'],
+                            'padding': '0.75rem 1.5rem',
+                            'border': 'none',
+                            'borderRadius': '0.375rem',
+                            'cursor': 'pointer',
+                            'width': '100%',
+                            'fontSize': '1rem',
+                            'fontWeight': '600',
+                            'marginTop': '1rem'
+                        }
+                    )
+                ])
+            ], style={
+                'padding': '2rem',
+                'backgroundColor': COLORS['white'],
+                'borderRadius': '0.5rem',
+                'boxShadow': '0 4px 6px rgba(0, 0, 0, 0.1)',
+                'maxWidth': '800px',
+                'margin': '2rem auto'
+            }),
+            
+            # Correlation matrix card
             html.Div([
+                html.H2('Correlation Matrix',
+                    style={
+                        'color': COLORS['text'],
+                        'fontSize': '1.5rem',
+                        'fontWeight': '600',
+                        'marginBottom': '1.5rem'
+                    }
+                ),
                 html.Div([
-                    html.Label('Futures Symbol', style={'fontWeight': '600', 'color': COLORS['text'], 'marginBottom': '0.5rem'}),
+                    html.Label('Symbols', style={'fontWeight': '600', 'color': COLORS['text'], 'marginBottom': '0.5rem'}),
+                    html.P('Stocks and futures, separated by commas. FUTURES adds every symbol in the futures reference.',
+                        style={'color': COLORS['text'], 'fontSize': '0.9rem', 'margin': '0 0 0.5rem 0'}
+                    ),
                     dcc.Input(
-                        id='futures-symbol',
+                        id='correlation-symbols',
                         type='text',
-                        placeholder='Enter futures symbol (e.g., ES=F for E-mini S&P 500)',
+                        placeholder='e.g., SPY, QQQ, TLT, GC=F, FUTURES',
                         style={
                             'width': '100%',
                             'padding': '0.75rem',
@@ -384,29 +1045,36 @@ futures_layout = html.Div([
                         }
                     ),
                     
-                    html.Label('Time Period', style={'fontWeight': '600', 'color': COLORS['text'], 'marginBottom': '0.5rem'}),
+                    html.Label('Estimator', style={'fontWeight': '600', 'color': COLORS['text'], 'marginBottom': '0.5rem'}),
                     dcc.Dropdown(
-                        id='futures-timeframe',
+                        id='correlation-method',
+                        options=[
+                            {'label': f'Rolling {correlation.DEFAULT_WINDOW}-day', 'value': 'rolling'},
+                            {'label': f'EWMA (decay {correlation.EWMA_DECAY})', 'value': 'ewma'}
+                        ],
+                        value='rolling',
+                        style={
+                            'marginBottom': '1.5rem'
+                        }
+                    ),
+                    
+                    html.Label('History', style={'fontWeight': '600', 'color': COLORS['text'], 'marginBottom': '0.5rem'}),
+                    dcc.Dropdown(
+                        id='correlation-timeframe',
                         options=[
-                            {'label': '1 Month', 'value': 30},
-                            {'label': '3 Months', 'value': 90},
-                            {'label': '6 Months', 'value': 180},
                             {'label': '1 Year', 'value': 365},
                             {'label': '2 Years', 'value': 730},
                             {'label': '5 Years', 'value': 1825}
                         ],
-                        value=365,
+                        value=1825,
                         style={
                             'marginBottom': '1.5rem'
                         }
                     ),
                     
                     html.Button(
-                        [
-                            html.I(className="fas fa-download", style={'marginRight': '0.5rem'}),
-                            'Download Futures Data'
-                        ],
-                        id='download-futures-button',
+                        'Compute Correlations',
+                        id='run-correlation-button',
                         style={
                             'backgroundColor': COLORS['accent'],
                             'color': COLORS['white'],
@@ -417,17 +1085,12 @@ futures_layout = html.Div([
                             'width': '100%',
                             'fontSize': '1rem',
                             'fontWeight': '600',
-                            'display': 'flex',
-                            'alignItems': 'center',
-                            'justifyContent': 'center',
                             'transition': 'background-color 0.2s'
                         }
                     ),
                     
-                    dcc.Download(id='download-futures-data'),
-                    
                     html.Div(
-                        id='futures-output-message',
+                        id='correlation-output-message',
                         style={
                             'marginTop': '1rem',
                             'padding': '1rem',
@@ -436,240 +1099,126 @@ futures_layout = html.Div([
                             'color': '#c53030',
                             'display': 'none'
                         }
-                    )
+                    ),
+                    
+                    dcc.Graph(id='correlation-heatmap', style={'display': 'none'})
                 ])
             ], style={
                 'padding': '2rem',
                 'backgroundColor': COLORS['white'],
                 'borderRadius': '0.5rem',
                 'boxShadow': '0 4px 6px rgba(0, 0, 0, 0.1)',
-                'maxWidth': '600px',
-                'margin': 'auto'
+                'maxWidth': '800px',
+                'margin': '2rem auto'
             })
-        ])
-    ], style={
-        'padding': '0 2rem',
-        'maxWidth': '1200px',
-        'margin': 'auto'
-    }),
-
-    # Reference Section
-    html.Div([
-        html.Div([
-            html.H2('Futures Symbol Reference',
-                style={
-                    'color': COLORS['text'],
-                    'fontSize': '1.5rem',
-                    'fontWeight': '600',
-                    'marginBottom': '1.5rem',
-                    'textAlign': 'center'
-                }
-            ),
-            
-            # Energy Futures
-            html.Div([
-                html.Button(
-                    'Energy Futures',
-                    id='energy-futures-button',
-                    style={
-                        'width': '100%',
-                        'padding': '1rem',
-                        'backgroundColor': COLORS['accent'],
-                        'color': COLORS['white'],
-                        'border': 'none',
-                        'borderRadius': '0.375rem',
-                        'textAlign': 'left',
-                        'fontWeight': '600',
-                        'marginBottom': '0.5rem'
-                    }
-                ),
-                html.Div([
-                    html.P('Crude Oil (WTI): CL=F', style={'margin': '0.5rem 0'}),
-                    html.P('Brent Crude Oil: BZ=F', style={'margin': '0.5rem 0'}),
-                    html.P('Natural Gas: NG=F', style={'margin': '0.5rem 0'}),
-                    html.P('Heating Oil: HO=F', style={'margin': '0.5rem 0'}),
-                    html.P('Gasoline (RBOB): RB=F', style={'margin': '0.5rem 0'})
-                ], id='energy-futures-content', style={'display': 'none', 'padding': '1rem', 'backgroundColor': '#f8fafc'})
-            ], style={'marginBottom': '1rem'}),
-
-            # Metal Futures
-            html.Div([
-                html.Button(
-                    'Metal Futures',
-                    id='metal-futures-button',
-                    style={
-                        'width': '100%',
-                        'padding': '1rem',
-                        'backgroundColor': COLORS['accent'],
-                        'color': COLORS['white'],
-                        'border': 'none',
-                        'borderRadius': '0.375rem',
-                        'textAlign': 'left',
-                        'fontWeight': '600',
-                        'marginBottom': '0.5rem'
-                    }
-                ),
-                html.Div([
-                    html.P('Gold: GC=F', style={'margin': '0.5rem 0'}),
-                    html.P('Silver: SI=F', style={'margin': '0.5rem 0'}),
-                    html.P('Copper: HG=F', style={'margin': '0.5rem 0'}),
-                    html.P('Platinum: PL=F', style={'margin': '0.5rem 0'}),
-                    html.P('Palladium: PA=F', style={'margin': '0.5rem 0'})
-                ], id='metal-futures-content', style={'display': 'none', 'padding': '1rem', 'backgroundColor': '#f8fafc'})
-            ], style={'marginBottom': '1rem'}),
-
-            # Agricultural Futures
-            html.Div([
-                html.Button(
-                    'Agricultural Futures',
-                    id='ag-futures-button',
-                    style={
-                        'width': '100%',
-                        'padding': '1rem',
-                        'backgroundColor': COLORS['accent'],
-                        'color': COLORS['white'],
-                        'border': 'none',
-                        'borderRadius': '0.375rem',
-                        'textAlign': 'left',
-                        'fontWeight': '600',
-                        'marginBottom': '0.5rem'
-                    }
-                ),
-                html.Div([
-                    html.P('Corn: ZC=F', style={'margin': '0.5rem 0'}),
-                    html.P('Wheat: ZW=F', style={'margin': '0.5rem 0'}),
-                    html.P('Soybeans: ZS=F', style={'margin': '0.5rem 0'}),
-                    html.P('Soybean Oil: ZL=F', style={'margin': '0.5rem 0'}),
-                    html.P('Cotton: CT=F', style={'margin': '0.5rem 0'}),
-                    html.P('Sugar #11: SB=F', style={'margin': '0.5rem 0'}),
-                    html.P('Coffee: KC=F', style={'margin': '0.5rem 0'}),
-                    html.P('Cocoa: CC=F', style={'margin': '0.5rem 0'}),
-                    html.P('Live Cattle: LE=F', style={'margin': '0.5rem 0'}),
-                    html.P('Lean Hogs: HE=F', style={'margin': '0.5rem 0'})
-                ], id='ag-futures-content', style={'display': 'none', 'padding': '1rem', 'backgroundColor': '#f8fafc'})
-            ], style={'marginBottom': '1rem'}),
-
-            # Index Futures
-            html.Div([
-                html.Button(
-                    'Index Futures',
-                    id='index-futures-button',
-                    style={
-                        'width': '100%',
-                        'padding': '1rem',
-                        'backgroundColor': COLORS['accent'],
-                        'color': COLORS['white'],
-                        'border': 'none',
-                        'borderRadius': '0.375rem',
-                        'textAlign': 'left',
-                        'fontWeight': '600',
-                        'marginBottom': '0.5rem'
-                    }
-                ),
-                html.Div([
-                    html.P('S&P 500 E-mini: ES=F', style={'margin': '0.5rem 0'}),
-                    html.P('Nasdaq 100 E-mini: NQ=F', style={'margin': '0.5rem 0'}),
-                    html.P('Dow Jones E-mini: YM=F', style={'margin': '0.5rem 0'}),
-                    html.P('Russell 2000 E-mini: RTY=F', style={'margin': '0.5rem 0'})
-                ], id='index-futures-content', style={'display': 'none', 'padding': '1rem', 'backgroundColor': '#f8fafc'})
-            ], style={'marginBottom': '1rem'}),
-
-            # Currency Futures
-            html.Div([
-                html.Button(
-                    'Currency Futures',
-                    id='currency-futures-button',
-                    style={
-                        'width': '100%',
-                        'padding': '1rem',
-                        'backgroundColor': COLORS['accent'],
-                        'color': COLORS['white'],
-                        'border': 'none',
-                        'borderRadius': '0.375rem',
-                        'textAlign': 'left',
-                        'fontWeight': '600',
-                        'marginBottom': '0.5rem'
-                    }
-                ),
-                html.Div([
-                    html.P('Euro FX: 6E=F', style={'margin': '0.5rem 0'}),
-                    html.P('Japanese Yen: 6J=F', style={'margin': '0.5rem 0'}),
-                    html.P('British Pound: 6B=F', style={'margin': '0.5rem 0'}),
-                    html.P('Australian Dollar: 6A=F', style={'margin': '0.5rem 0'}),
-                    html.P('Canadian Dollar: 6C=F', style={'margin': '0.5rem 0'}),
-                    html.P('Swiss Franc: 6S=F', style={'margin': '0.5rem 0'})
-                ], id='currency-futures-content', style={'display': 'none', 'padding': '1rem', 'backgroundColor': '#f8fafc'})
-            ], style={'marginBottom': '1rem'}),
-
-            # Interest Rate Futures
-            html.Div([
-                html.Button(
-                    'Interest Rate Futures',
-                    id='interest-futures-button',
-                    style={
-                        'width': '100%',
-                        'padding': '1rem',
-                        'backgroundColor': COLORS['accent'],
-                        'color': COLORS['white'],
-                        'border': 'none',
-                        'borderRadius': '0.375rem',
-                        'textAlign': 'left',
-                        'fontWeight': '600',
-                        'marginBottom': '0.5rem'
-                    }
-                ),
-                html.Div([
-                    html.P('10-Year T-Note: ZN=F', style={'margin': '0.5rem 0'}),
-                    html.P('5-Year T-Note: ZF=F', style={'margin': '0.5rem 0'}),
-                    html.P('2-Year T-Note: ZT=F', style={'margin': '0.5rem 0'}),
-                    html.P('30-Year T-Bond: ZB=F', style={'margin': '0.5rem 0'}),
-                    html.P('Eurodollar: GE=F', style={'margin': '0.5rem 0'})
-                ], id='interest-futures-content', style={'display': 'none', 'padding': '1rem', 'backgroundColor': '#f8fafc'})
-            ], style={'marginBottom': '1rem'})
         ], style={
-            'padding': '2rem',
-            'backgroundColor': COLORS['white'],
-            'borderRadius': '0.5rem',
-            'boxShadow': '0 4px 6px rgba(0, 0, 0, 0.1)',
-            'maxWidth': '800px',
-            'margin': '2rem auto'
+            'padding': '0 2rem',
+            'maxWidth': '1200px',
+            'margin': 'auto'
         })
-    ], style={
-        'padding': '0 2rem',
-        'maxWidth': '1200px',
-        'margin': 'auto'
-    })
-], style={'backgroundColor': COLORS['background'], 'minHeight': '100vh'})
-
-# Define the main app layout
-app.layout = html.Div([
-    dcc.Location(id='url', refresh=False),
-    html.Div(id='page-content')
-])
-
-# Create the URL routing callback
-@app.callback(
-    Output('page-content', 'children'),
+    ], style={'backgroundColor': COLORS['background'], 'minHeight': '100vh'})
+
+# Page builders by the name the browser uses for each route (see
+# assets/clientside.js); the stock page is the default
+PAGES = {
+    'stock': stock_prices_layout,
+    'options': options_chain_layout,
+    'futures': futures_layout,
+    'portfolio': portfolio_layout,
+}
+ROUTES = {'/options-chain': 'options', '/futures': 'futures', '/portfolio': 'portfolio'}
+
+
+def _request_pathname():
+    # The layout is fetched from _dash-layout by the page at the route the
+    # user opened, which the browser sends as the referrer
+    if not flask.has_request_context():
+        return '/'
+    if flask.request.path.endswith('_dash-layout'):
+        return urlsplit(flask.request.referrer or '').path
+    return flask.request.path
+
+
+# Define the main app layout. Only the page for the route being opened is
+# built and sent; the others stay empty until first visited (see load_page).
+# Each page is built once, the first time any user opens it, and reused.
+@functools.lru_cache(maxsize=None)
+def page_shell(page):
+    return html.Div([
+        dcc.Location(id='url', refresh=False),
+        dcc.Store(id='loaded-pages', data=[page]),
+        dcc.Store(id='page-request'),
+    ] + [
+        html.Div(build() if name == page else None, id=f'{name}-page', style={'display': 'none'})
+        for name, build in PAGES.items()
+    ])
+
+
+def main_layout():
+    return page_shell(ROUTES.get(_request_pathname(), 'stock'))
+
+
+def create_app():
+    """Build the Dash app. Callbacks are registered globally via
+    ``dash.callback`` and attach to every app created here, so the WSGI
+    entry point and the dev server share one definition."""
+    app = dash.Dash(__name__,
+        assets_folder=ASSETS_PATH,
+        suppress_callback_exceptions=True
+    )
+    app.layout = main_layout
+    api.register(app.server)
+    if metrics.ENABLED:
+        metrics.instrument(app.server)
+    if memprofile.ENABLED:
+        memprofile.instrument(app.server)
+    return app
+
+def send_csv(df, filename):
+    # Serialization is its own stage when memory profiling is on
+    with memprofile.stage('serialize'):
+        return dcc.send_data_frame(df.to_csv, filename)
+
+
+# Create the URL routing callbacks. Showing a page runs in the browser (see
+# assets/clientside.js); a page not yet in the browser is requested once
+clientside_callback(
+    ClientsideFunction(namespace='navigation', function_name='display_page'),
+    Output('stock-page', 'style'),
+    Output('options-page', 'style'),
+    Output('futures-page', 'style'),
+    Output('portfolio-page', 'style'),
     Input('url', 'pathname')
 )
-def display_page(pathname):
-    if pathname == '/stock-prices' or pathname == '/':
-        return stock_prices_layout
-    elif pathname == '/options-chain':
-        return options_chain_layout
-    elif pathname == '/futures':
-        return futures_layout
-    else:
-        return stock_prices_layout  # Default to stock prices page
+
+clientside_callback(
+    ClientsideFunction(namespace='navigation', function_name='request_page'),
+    Output('page-request', 'data'),
+    Input('url', 'pathname'),
+    State('loaded-pages', 'data')
+)
+
+@callback(
+    [Output(f'{name}-page', 'children') for name in PAGES],
+    Output('loaded-pages', 'data'),
+    Input('page-request', 'data'),
+    State('loaded-pages', 'data'),
+    prevent_initial_call=True
+)
+def load_page(page, loaded):
+    if page not in PAGES or page in loaded:
+        raise dash.exceptions.PreventUpdate
+    return [build() if name == page else dash.no_update for name, build in PAGES.items()] + [loaded + [page]]
 
 # Create the stock data download callback
-@app.callback(
+@callback(
     Output('download-stock-data', 'data'),
     Output('stock-output-message', 'children'),
     Output('stock-output-message', 'style'),
     Input('download-stock-button', 'n_clicks'),
     State('stock-ticker', 'value'),
-    State('timeframe', 'value')
+    State('timeframe', 'value'),
+    prevent_initial_call=True
 )
 def download_stock_data(n_clicks, ticker, timeframe):
     if n_clicks is None:
@@ -686,15 +1235,9 @@ def download_stock_data(n_clicks, ticker, timeframe):
         }
     
     try:
-        # Get stock data
-        stock = yf.Ticker(ticker)
-        
-        # Calculate date range
-        end_date = dt.datetime.now()
-        start_date = end_date - dt.timedelta(days=timeframe)
-        
-        # Get historical data
-        df = stock.history(start=start_date, end=end_date)
+        # Get historical data (shared across workers)
+        with memprofile.stage('fetch'):
+            df, fetched_at = market_data.fetch_history_entry(ticker, timeframe)
         
         if df.empty:
             return None, "No stock data found for this ticker", {
@@ -706,9 +1249,14 @@ def download_stock_data(n_clicks, ticker, timeframe):
                 'display': 'block'
             }
         
-        # Prepare for download
+        # Prepare for download, reusing the encoded file until the data is refetched
+        filename = f"{ticker}_stock_prices.csv"
+        payload = payload_cache.payloads.get_or_build(
+            ('stock', ticker.upper(), timeframe), fetched_at, filename,
+            lambda: send_csv(df, filename)
+        )
         return (
-            dcc.send_data_frame(df.to_csv, f"{ticker}_stock_prices.csv"),
+            payload,
             "Download successful!",
             {
                 'marginTop': '1rem',
@@ -730,16 +1278,241 @@ def download_stock_data(n_clicks, ticker, timeframe):
             'display': 'block'
         }
 
-@app.callback(
+def build_price_figure(symbol, days, relayout_data=None):
+    # Serve the cached resolution that matches the visible window
+    resolutions = downsample.history_resolutions(symbol, days)
+    start, end = downsample.view_range(relayout_data) or (None, None)
+    x, y = resolutions.view(start, end)
+    figure = go.Figure(go.Scatter(x=x, y=y, mode='lines', name=symbol.upper(),
+                                  line={'color': COLORS['accent']}))
+    figure.update_layout(
+        title=f"{symbol.upper()} Close",
+        uirevision=f"{symbol.upper()}-{days}",
+        margin={'l': 60, 'r': 20, 't': 50, 'b': 40}
+    )
+    if start is not None:
+        figure.update_xaxes(range=[start, end])
+    return figure
+
+# Create the price chart callbacks; zooming re-requests the visible window
+@callback(
+    Output('stock-chart', 'figure'),
+    Output('stock-chart', 'style'),
+    Input('download-stock-button', 'n_clicks'),
+    Input('stock-chart', 'relayoutData'),
+    State('stock-ticker', 'value'),
+    State('timeframe', 'value'),
+    prevent_initial_call=True
+)
+def update_stock_chart(n_clicks, relayout_data, ticker, timeframe):
+    if not ticker:
+        raise dash.exceptions.PreventUpdate
+    if dash.ctx.triggered_id == 'stock-chart':
+        if downsample.view_range(relayout_data) is None:
+            raise dash.exceptions.PreventUpdate
+    else:
+        relayout_data = None
+    
+    try:
+        figure = build_price_figure(ticker, timeframe, relayout_data)
+    except Exception:
+        # The download callback reports the error
+        raise dash.exceptions.PreventUpdate
+    return figure, {'display': 'block', 'marginTop': '1rem'}
+
+@callback(
+    Output('futures-chart', 'figure'),
+    Output('futures-chart', 'style'),
+    Input('download-futures-button', 'n_clicks'),
+    Input('futures-chart', 'relayoutData'),
+    State('futures-symbol', 'value'),
+    State('futures-timeframe', 'value'),
+    prevent_initial_call=True
+)
+def update_futures_chart(n_clicks, relayout_data, symbol, timeframe):
+    if not symbol:
+        raise dash.exceptions.PreventUpdate
+    if dash.ctx.triggered_id == 'futures-chart':
+        if downsample.view_range(relayout_data) is None:
+            raise dash.exceptions.PreventUpdate
+    else:
+        relayout_data = None
+    
+    try:
+        figure = build_price_figure(symbol, timeframe, relayout_data)
+    except Exception:
+        # The download callback reports the error
+        raise dash.exceptions.PreventUpdate
+    return figure, {'display': 'block', 'marginTop': '1rem'}
+
+# Create the futures forward curve callback
+@callback(
+    Output('futures-curve', 'children'),
+    Input('futures-curve-button', 'n_clicks'),
+    State('futures-symbol', 'value'),
+    State('futures-timeframe', 'value'),
+    prevent_initial_call=True
+)
+def show_futures_curve(n_clicks, symbol, timeframe, max_spreads=4):
+    error_style = {
+        'marginTop': '1rem',
+        'padding': '1rem',
+        'borderRadius': '0.375rem',
+        'backgroundColor': '#fed7d7',
+        'color': '#c53030'
+    }
+    if not symbol:
+        return html.Div("Please enter a futures symbol", style=error_style)
+    
+    try:
+        curve, spreads = futures_curve.fetch_curve(symbol, timeframe)
+    except Exception as e:
+        return html.Div(f"Error: {str(e)}", style=error_style)
+    
+    root = futures_curve.parse_root(symbol)
+    curve_figure = go.Figure(go.Scatter(
+        x=curve['contract_month'], y=curve['last'], mode='lines+markers',
+        text=curve['symbol'], line={'color': COLORS['accent']}
+    ))
+    curve_figure.update_layout(
+        title=f"{root} Forward Curve",
+        xaxis_title='Contract month',
+        yaxis_title='Last price',
+        margin={'l': 60, 'r': 20, 't': 50, 'b': 50}
+    )
+    
+    spread_figure = go.Figure([
+        go.Scatter(x=spreads.index, y=spreads[column], mode='lines', name=column)
+        for column in spreads.columns[:max_spreads]
+    ])
+    spread_figure.update_layout(
+        title=f"{root} Calendar Spreads (near - next)",
+        yaxis_title='Spread',
+        margin={'l': 60, 'r': 20, 't': 50, 'b': 50}
+    )
+    return html.Div([dcc.Graph(figure=curve_figure), dcc.Graph(figure=spread_figure)],
+                    style={'marginTop': '1.5rem'})
+
+# Create the realized vs implied volatility callback
+@callback(
+    Output('stock-volatility', 'children'),
+    Input('stock-volatility-button', 'n_clicks'),
+    State('stock-ticker', 'value'),
+    State('timeframe', 'value'),
+    prevent_initial_call=True
+)
+def show_stock_volatility(n_clicks, ticker, timeframe):
+    error_style = {
+        'marginTop': '1rem',
+        'padding': '1rem',
+        'borderRadius': '0.375rem',
+        'backgroundColor': '#fed7d7',
+        'color': '#c53030'
+    }
+    if not ticker:
+        return html.Div("Please enter a ticker symbol", style=error_style)
+    
+    try:
+        realized, term_structure = volatility.vol_comparison(ticker, timeframe)
+        latest = realized.iloc[-1]
+    except Exception as e:
+        return html.Div(f"Error: {str(e)}", style=error_style)
+    
+    realized_figure = go.Figure([
+        go.Scatter(x=realized.index, y=realized[name] * 100, mode='lines', name=name.replace('_', ' ').title())
+        for name in volatility.ESTIMATORS
+    ])
+    realized_figure.update_layout(
+        title=f"{ticker.upper()} {volatility.DEFAULT_WINDOW}-day Realized Volatility",
+        yaxis_title='Annualized vol (%)',
+        margin={'l': 60, 'r': 20, 't': 50, 'b': 50}
+    )
+    if term_structure.empty:
+        # ETFs and indices without listed options: realized vol only
+        return html.Div([
+            dcc.Graph(figure=realized_figure),
+            html.Div(f"No listed options for {ticker.upper()}; implied vol is not available",
+                     style={**error_style, 'backgroundColor': '#fefcbf', 'color': '#975a16'})
+        ], style={'marginTop': '1.5rem'})
+    
+    term_figure = go.Figure(go.Scatter(
+        x=term_structure['days'], y=term_structure['atm_iv'] * 100,
+        mode='lines+markers', name='ATM IV', text=term_structure['Expiration']
+    ))
+    for name in volatility.ESTIMATORS:
+        if pd.notna(latest[name]):
+            term_figure.add_hline(y=latest[name] * 100, line_dash='dot', opacity=0.5,
+                                  annotation_text=name.replace('_', ' ').title())
+    term_figure.update_layout(
+        title='ATM Implied Vol Term Structure vs Current Realized',
+        xaxis_title='Days to expiration',
+        yaxis_title='Vol (%)',
+        margin={'l': 60, 'r': 20, 't': 50, 'b': 50}
+    )
+    return html.Div([dcc.Graph(figure=realized_figure), dcc.Graph(figure=term_figure)],
+                    style={'marginTop': '1.5rem'})
+
+# Create the daily rollup history callback
+@callback(
+    Output('options-rollups', 'children'),
+    Input('options-rollups-button', 'n_clicks'),
+    State('ticker', 'value'),
+    prevent_initial_call=True
+)
+def show_options_rollups(n_clicks, ticker):
+    error_style = {
+        'marginTop': '1rem',
+        'padding': '1rem',
+        'borderRadius': '0.375rem',
+        'backgroundColor': '#fed7d7',
+        'color': '#c53030'
+    }
+    if not ticker:
+        return html.Div("Please enter a ticker symbol", style=error_style)
+    
+    try:
+        history = market_data.load_rollups(ticker)
+    except Exception as e:
+        return html.Div(f"Error: {str(e)}", style=error_style)
+    if history.empty:
+        return html.Div(f"No daily history for {ticker.upper()} yet; it starts with the first download",
+                        style=error_style)
+    
+    vol_figure = go.Figure([
+        go.Scatter(x=history.index, y=history[column] * 100, mode='lines+markers', name=name)
+        for column, name in [('atm_iv_30d', 'ATM IV 30d'), ('atm_iv_90d', 'ATM IV 90d'),
+                             ('skew_25d', '25-Delta Skew'), ('term_slope', 'Term Slope (90d - 30d)')]
+    ])
+    vol_figure.update_layout(
+        title=f"{ticker.upper()} Daily Implied Vol",
+        yaxis_title='Vol points (%)',
+        margin={'l': 60, 'r': 20, 't': 50, 'b': 50}
+    )
+    
+    ratio_figure = go.Figure([
+        go.Scatter(x=history.index, y=history[column], mode='lines+markers', name=name)
+        for column, name in [('put_call_oi', 'P/C Open Interest'), ('put_call_volume', 'P/C Volume')]
+    ])
+    ratio_figure.update_layout(
+        title=f"{ticker.upper()} Daily Put/Call Ratios",
+        margin={'l': 60, 'r': 20, 't': 50, 'b': 50}
+    )
+    return html.Div([dcc.Graph(figure=vol_figure), dcc.Graph(figure=ratio_figure)],
+                    style={'marginTop': '1.5rem'})
+
+@callback(
     Output('download-options-data', 'data'),
     Output('output-message', 'children'),
     Output('output-message', 'style'),
+    Output('options-analytics', 'children'),
     [Input('download-button', 'n_clicks')],
     [State('ticker', 'value'),
      State('option-type', 'value'),
-     State('lookback-days', 'value')]
+     State('lookback-days', 'value'),
+     State('strikes-around-spot', 'value')],
+    prevent_initial_call=True
 )
-def download_options_data(n_clicks, ticker, option_type, lookback_days):
+def download_options_data(n_clicks, ticker, option_type, lookback_days, strikes_around_spot):
     if n_clicks is None:
         raise dash.exceptions.PreventUpdate
     
@@ -751,36 +1524,30 @@ def download_options_data(n_clicks, ticker, option_type, lookback_days):
             'backgroundColor': '#fed7d7',
             'color': '#c53030',
             'display': 'block'
-        }
+        }, None
     
     try:
-        # Get stock data
-        stock = yf.Ticker(ticker)
-        
-        # Calculate date range
-        end_date = dt.datetime.now()
-        start_date = end_date - dt.timedelta(days=lookback_days)
+        # Get the options chain (shared across workers), optionally limited
+        # to the strikes nearest the current price. The encoded file is
+        # reused for the same snapshot and filters, skipping serialization.
+        filename = f"{ticker}_options_chain.csv"
+        with memprofile.stage('fetch'):
+            version = market_data.chain_version(ticker)
+            spot = market_data.spot_price(ticker) if strikes_around_spot else None
         
-        # Get options chain
-        options_data = []
+        def build_payload():
+            with memprofile.stage('select'):
+                df = market_data.fetch_option_chain(ticker, option_type, strikes_around_spot)
+            if df.empty:
+                return None
+            return send_csv(df, filename)
         
-        # Get all available expiration dates
-        expirations = stock.options
-        
-        for exp_date in expirations:
-            opt_chain = stock.option_chain(exp_date)
-            
-            if option_type in ['CALL', 'BOTH']:
-                calls = opt_chain.calls
-                calls['Option_Type'] = 'CALL'
-                options_data.append(calls)
-                
-            if option_type in ['PUT', 'BOTH']:
-                puts = opt_chain.puts
-                puts['Option_Type'] = 'PUT'
-                options_data.append(puts)
+        payload = payload_cache.payloads.get_or_build(
+            ('options', ticker.upper()), version,
+            (filename, option_type, strikes_around_spot, spot), build_payload
+        )
         
-        if not options_data:
+        if payload is None:
             return None, "No options data found for this ticker", {
                 'marginTop': '1rem',
                 'padding': '1rem',
@@ -788,14 +1555,20 @@ def download_options_data(n_clicks, ticker, option_type, lookback_days):
                 'backgroundColor': '#fed7d7',
                 'color': '#c53030',
                 'display': 'block'
-            }
-            
-        # Combine all data
-        df = pd.concat(options_data, axis=0)
+            }, None
+        
+        # Precomputed analytics stored with the chain snapshot
+        summary = analytics.expiration_summary(market_data.load_chain_analytics(ticker))
+        
+        # Implied densities, computed once per snapshot
+        try:
+            curves, _ = density.chain_densities(ticker)
+        except ValueError:
+            curves = None
         
         # Prepare for download
         return (
-            dcc.send_data_frame(df.to_csv, f"{ticker}_options_chain.csv"),
+            payload,
             "Download successful!",
             {
                 'marginTop': '1rem',
@@ -804,7 +1577,8 @@ def download_options_data(n_clicks, ticker, option_type, lookback_days):
                 'backgroundColor': '#c6f6d5',
                 'color': '#2f855a',
                 'display': 'block'
-            }
+            },
+            build_analytics_panel(summary, curves)
         )
         
     except Exception as e:
@@ -815,16 +1589,104 @@ def download_options_data(n_clicks, ticker, option_type, lookback_days):
             'backgroundColor': '#fed7d7',
             'color': '#c53030',
             'display': 'block'
-        }
+        }, None
+
+def build_density_figure(curves, max_expirations=6):
+    figure = go.Figure()
+    for expiration in curves['Expiration'].unique()[:max_expirations]:
+        curve = curves[curves['Expiration'] == expiration]
+        figure.add_trace(go.Scatter(x=curve['strike'], y=curve['density'], mode='lines', name=expiration))
+    figure.update_layout(
+        title='Risk-Neutral Density by Expiration',
+        xaxis_title='Price at expiration',
+        yaxis_title='Density',
+        margin={'l': 60, 'r': 20, 't': 50, 'b': 50}
+    )
+    return figure
+
+def build_analytics_panel(summary, curves=None):
+    if summary.empty:
+        return None
+    columns = {
+        'Expiration': 'Expiration',
+        'volume_ratio': 'P/C Volume',
+        'oi_ratio': 'P/C OI',
+        'max_pain_strike': 'Max Pain',
+        'atm_strike': 'ATM Strike',
+        'expected_move': 'Exp. Move',
+        'expected_move_pct': 'Exp. Move %'
+    }
+    summary = summary.round({'volume_ratio': 2, 'oi_ratio': 2, 'expected_move': 2})
+    summary['expected_move_pct'] = (summary['expected_move_pct'] * 100).round(2)
+    return html.Div([
+        html.H3('Chain Analytics',
+            style={
+                'color': COLORS['text'],
+                'fontSize': '1.25rem',
+                'fontWeight': '600',
+                'marginBottom': '1rem'
+            }
+        ),
+        dash_table.DataTable(
+            data=summary.to_dict('records'),
+            columns=[{'name': label, 'id': column} for column, label in columns.items()],
+            page_size=10,
+            style_table={'overflowX': 'auto'},
+            style_cell={'fontFamily': 'Open Sans, sans-serif', 'padding': '0.5rem'},
+            style_header={'backgroundColor': COLORS['background'], 'fontWeight': '600'}
+        ),
+        dcc.Graph(figure=build_density_figure(curves)) if curves is not None and not curves.empty else None,
+        html.Button(
+            [
+                html.I(className="fas fa-download", style={'marginRight': '0.5rem'}),
+                'Download Analytics'
+            ],
+            id='download-analytics-button',
+            style={
+                'backgroundColor': COLORS['secondary'],
+                'color': COLORS['white'],
+                'padding': '0.75rem 1.5rem',
+                'border': 'none',
+                'borderRadius': '0.375rem',
+                'cursor': 'pointer',
+                'width': '100%',
+                'fontSize': '1rem',
+                'fontWeight': '600',
+                'marginTop': '1rem'
+            }
+        )
+    ], style={'marginTop': '2rem'})
+
+# Create the options analytics download callback
+@callback(
+    Output('download-options-analytics', 'data'),
+    Input('download-analytics-button', 'n_clicks'),
+    State('ticker', 'value'),
+    prevent_initial_call=True
+)
+def download_options_analytics(n_clicks, ticker):
+    if not n_clicks or not ticker:
+        raise dash.exceptions.PreventUpdate
+    
+    results = market_data.load_chain_analytics(ticker)
+    try:
+        results['density'], results['density_summary'] = density.chain_densities(ticker)
+    except ValueError:
+        pass
+    with memprofile.stage('serialize'):
+        archive = analytics.to_zip_bytes(results)
+    with memprofile.stage('encode'):
+        return dcc.send_bytes(archive, f"{ticker}_options_analytics.zip")
 
 # Create the futures data download callback
-@app.callback(
+@callback(
     Output('download-futures-data', 'data'),
     Output('futures-output-message', 'children'),
     Output('futures-output-message', 'style'),
     Input('download-futures-button', 'n_clicks'),
     State('futures-symbol', 'value'),
-    State('futures-timeframe', 'value')
+    State('futures-timeframe', 'value'),
+    prevent_initial_call=True
 )
 def download_futures_data(n_clicks, symbol, timeframe):
     if n_clicks is None:
@@ -841,15 +1703,9 @@ def download_futures_data(n_clicks, symbol, timeframe):
         }
     
     try:
-        # Get futures data
-        futures = yf.Ticker(symbol)
-        
-        # Calculate date range
-        end_date = dt.datetime.now()
-        start_date = end_date - dt.timedelta(days=timeframe)
-        
-        # Get historical data
-        df = futures.history(start=start_date, end=end_date)
+        # Get historical data (shared across workers)
+        with memprofile.stage('fetch'):
+            df, fetched_at = market_data.fetch_history_entry(symbol, timeframe)
         
         if df.empty:
             return None, "No futures data found for this symbol", {
@@ -861,9 +1717,14 @@ def download_futures_data(n_clicks, symbol, timeframe):
                 'display': 'block'
             }
         
-        # Prepare for download
+        # Prepare for download, reusing the encoded file until the data is refetched
+        filename = f"{symbol}_futures_data.csv"
+        payload = payload_cache.payloads.get_or_build(
+            ('futures', symbol.upper(), timeframe), fetched_at, filename,
+            lambda: send_csv(df, filename)
+        )
         return (
-            dcc.send_data_frame(df.to_csv, f"{symbol}_futures_data.csv"),
+            payload,
             "Download successful!",
             {
                 'marginTop': '1rem',
@@ -885,8 +1746,252 @@ def download_futures_data(n_clicks, symbol, timeframe):
             'display': 'block'
         }
 
-# Add callbacks for collapsible sections
-@app.callback(
+# Create the positions upload callback
+@callback(
+    Output('positions-store', 'data'),
+    Output('rejected-positions-store', 'data'),
+    Output('portfolio-output-message', 'children', allow_duplicate=True),
+    Output('portfolio-output-message', 'style', allow_duplicate=True),
+    Input('positions-upload', 'contents'),
+    State('positions-upload', 'filename'),
+    prevent_initial_call=True
+)
+def upload_positions(contents, filename):
+    try:
+        positions, rejected = portfolio.parse_upload(contents, filename)
+    except Exception as e:
+        return None, None, f"Error: {str(e)}", {
+            'marginTop': '1rem',
+            'padding': '1rem',
+            'borderRadius': '0.375rem',
+            'backgroundColor': '#fed7d7',
+            'color': '#c53030',
+            'display': 'block'
+        }
+    return positions.to_dict('list'), rejected, dash.no_update, dash.no_update
+
+# Create the portfolio Greeks callback
+@callback(
+    Output('portfolio-greeks', 'children'),
+    Output('portfolio-output-message', 'children'),
+    Output('portfolio-output-message', 'style'),
+    Input('positions-store', 'data'),
+    Input('refresh-greeks-button', 'n_clicks'),
+    State('rejected-positions-store', 'data'),
+    prevent_initial_call=True
+)
+def aggregate_portfolio_greeks(positions, n_clicks, rejected):
+    if not positions:
+        return None, "Please upload a positions file", {
+            'marginTop': '1rem',
+            'padding': '1rem',
+            'borderRadius': '0.375rem',
+            'backgroundColor': '#fed7d7',
+            'color': '#c53030',
+            'display': 'block'
+        }
+    
+    try:
+        summary, unmatched, unpriced, skipped = portfolio.aggregate(pd.DataFrame(positions))
+    except Exception as e:
+        return None, f"Error: {str(e)}", {
+            'marginTop': '1rem',
+            'padding': '1rem',
+            'borderRadius': '0.375rem',
+            'backgroundColor': '#fed7d7',
+            'color': '#c53030',
+            'display': 'block'
+        }
+    
+    message = [f"Aggregated {int(summary['positions'].iloc[-1])} positions."]
+    if unmatched:
+        message.append(f"{len(unmatched)} contracts not found in current chains: {', '.join(unmatched[:10])}")
+    if unpriced:
+        message.append(f"Skipped {len(unpriced)} positions with no implied volatility in the chain: "
+                       f"{', '.join(unpriced[:10])}")
+    for ticker, (error, symbols) in sorted(skipped.items()):
+        message.append(f"Skipped {len(symbols)} {ticker} positions ({', '.join(symbols[:10])}): {error}")
+    if rejected:
+        message.append(f"Skipped {len(rejected)} rows of the file: "
+                       f"{', '.join(f'{symbol} ({reason})' for symbol, reason in rejected[:10])}")
+    warn = bool(unmatched or unpriced or skipped or rejected)
+    
+    return (
+        dash_table.DataTable(
+            data=summary.round(2).to_dict('records'),
+            columns=[{'name': column.title(), 'id': column}
+                     for column in ['underlying', 'positions'] + portfolio.GREEKS],
+            style_table={'overflowX': 'auto', 'marginTop': '1.5rem'},
+            style_cell={'fontFamily': 'Open Sans, sans-serif', 'padding': '0.5rem'},
+            style_header={'backgroundColor': COLORS['background'], 'fontWeight': '600'}
+        ),
+        [html.Div(line) for line in message],
+        {
+            'marginTop': '1rem',
+            'padding': '1rem',
+            'borderRadius': '0.375rem',
+            'backgroundColor': '#c6f6d5' if not warn else '#fefcbf',
+            'color': '#2f855a' if not warn else '#975a16',
+            'display': 'block'
+        }
+    )
+
+# Create the scenario analysis callback
+@callback(
+    Output('scenario-heatmap', 'figure'),
+    Output('scenario-heatmap', 'style'),
+    Output('scenario-store', 'data'),
+    Output('scenario-output-message', 'children'),
+    Output('scenario-output-message', 'style'),
+    Input('run-scenarios-button', 'n_clicks'),
+    State('positions-store', 'data'),
+    State('scenario-ticker', 'value'),
+    State('spot-shock-range', 'value'),
+    State('vol-shock-range', 'value'),
+    State('scenario-grid-size', 'value'),
+    State('scenario-horizon', 'value'),
+    prevent_initial_call=True
+)
+def run_scenarios(n_clicks, positions, ticker, spot_range, vol_range, grid_size, horizon):
+    error_style = {
+        'marginTop': '1rem',
+        'padding': '1rem',
+        'borderRadius': '0.375rem',
+        'backgroundColor': '#fed7d7',
+        'color': '#c53030',
+        'display': 'block'
+    }
+    if not ticker and not positions:
+        return dash.no_update, {'display': 'none'}, None, "Upload positions or enter a chain ticker", error_style
+    
+    try:
+        if ticker:
+            book = scenarios.book_from_chain(ticker)
+            label = f"{ticker.upper()} chain ({len(book)} contracts)"
+        else:
+            book = scenarios.book_from_positions(pd.DataFrame(positions))
+            label = f"Uploaded book ({len(book)} positions)"
+        
+        grid_size = int(grid_size or 25)
+        spot_shocks = np.linspace(-1, 1, grid_size) * (spot_range or 20) / 100
+        vol_shocks = np.linspace(-1, 1, grid_size) * (vol_range or 20) / 100
+        days_forward = sorted({0, int(horizon or 0)})
+        pnl = scenarios.scenario_pnl(book, spot_shocks, vol_shocks, days_forward)
+    except Exception as e:
+        return dash.no_update, {'display': 'none'}, None, f"Error: {str(e)}", error_style
+    
+    figure = go.Figure(go.Heatmap(
+        z=pnl[-1],
+        x=np.round(vol_shocks * 100, 1),
+        y=np.round(spot_shocks * 100, 1),
+        colorscale='RdYlGn',
+        zmid=0,
+        colorbar={'title': 'P&L ($)'}
+    ))
+    figure.update_layout(
+        title=f"{label}, {days_forward[-1]} days forward",
+        xaxis_title='Vol shock (points)',
+        yaxis_title='Spot shock (%)',
+        margin={'l': 60, 'r': 20, 't': 50, 'b': 50}
+    )
+    grid = scenarios.grid_frame(pnl, spot_shocks, vol_shocks, days_forward)
+    return (
+        figure,
+        {'display': 'block', 'marginTop': '1rem'},
+        grid.to_dict('list'),
+        f"Repriced {len(book)} contracts over {pnl.size} scenarios.",
+        {
+            'marginTop': '1rem',
+            'padding': '1rem',
+            'borderRadius': '0.375rem',
+            'backgroundColor': '#c6f6d5',
+            'color': '#2f855a',
+            'display': 'block'
+        }
+    )
+
+# Create the correlation matrix callback
+@callback(
+    Output('correlation-heatmap', 'figure'),
+    Output('correlation-heatmap', 'style'),
+    Output('correlation-output-message', 'children'),
+    Output('correlation-output-message', 'style'),
+    Input('run-correlation-button', 'n_clicks'),
+    State('correlation-symbols', 'value'),
+    State('correlation-method', 'value'),
+    State('correlation-timeframe', 'value'),
+    prevent_initial_call=True
+)
+def show_correlation(n_clicks, symbols_text, method, timeframe):
+    error_style = {
+        'marginTop': '1rem',
+        'padding': '1rem',
+        'borderRadius': '0.375rem',
+        'backgroundColor': '#fed7d7',
+        'color': '#c53030',
+        'display': 'block'
+    }
+    symbols = correlation.parse_symbols(symbols_text)
+    if len(symbols) < 2:
+        return dash.no_update, {'display': 'none'}, "Enter at least two symbols", error_style
+    
+    try:
+        engine = correlation.correlation_engine(symbols, timeframe)
+        matrix = engine.correlation(method)
+    except Exception as e:
+        return dash.no_update, {'display': 'none'}, f"Error: {str(e)}", error_style
+    
+    figure = go.Figure(go.Heatmap(
+        z=matrix.to_numpy(),
+        x=matrix.columns,
+        y=matrix.index,
+        zmin=-1,
+        zmax=1,
+        colorscale='RdBu',
+        reversescale=True,
+        colorbar={'title': 'Correlation'}
+    ))
+    size = max(500, 12 * len(matrix))
+    figure.update_layout(
+        title=f"{'EWMA' if method == 'ewma' else 'Rolling'} correlation of daily returns to {engine.last_date:%Y-%m-%d}",
+        height=size,
+        yaxis={'autorange': 'reversed'},
+        margin={'l': 80, 'r': 20, 't': 50, 'b': 80}
+    )
+    missing = [symbol for symbol in symbols if symbol not in engine.symbols]
+    message = f"{len(engine.symbols)} symbols aligned on a common calendar."
+    if missing:
+        message += f" No price history for: {', '.join(missing)}"
+    return (
+        figure,
+        {'display': 'block', 'marginTop': '1rem'},
+        message,
+        {
+            'marginTop': '1rem',
+            'padding': '1rem',
+            'borderRadius': '0.375rem',
+            'backgroundColor': '#c6f6d5',
+            'color': '#2f855a',
+            'display': 'block'
+        }
+    )
+
+# Create the scenario grid download callback
+@callback(
+    Output('download-scenario-grid', 'data'),
+    Input('download-scenario-button', 'n_clicks'),
+    State('scenario-store', 'data'),
+    prevent_initial_call=True
+)
+def download_scenario_grid(n_clicks, grid):
+    if not grid:
+        raise dash.exceptions.PreventUpdate
+    
+    return dcc.send_data_frame(pd.DataFrame(grid).to_csv, "scenario_grid.csv", index=False)
+
+# Add callbacks for collapsible sections (run in the browser)
+clientside_callback(
+    ClientsideFunction(namespace='futures', function_name='toggle_sections'),
     [Output('energy-futures-content', 'style'),
      Output('metal-futures-content', 'style'),
      Output('ag-futures-content', 'style'),
@@ -900,30 +2005,7 @@ def download_futures_data(n_clicks, symbol, timeframe):
      Input('currency-futures-button', 'n_clicks'),
      Input('interest-futures-button', 'n_clicks')]
 )
-def toggle_sections(energy_clicks, metal_clicks, ag_clicks, index_clicks, currency_clicks, interest_clicks):
-    ctx = dash.callback_context
-    if not ctx.triggered:
-        return [{'display': 'none'}] * 6
-    
-    button_id = ctx.triggered[0]['prop_id'].split('.')[0]
-    
-    styles = [{'display': 'none'}] * 6
-    
-    if button_id == 'energy-futures-button':
-        styles[0] = {'display': 'block', 'padding': '1rem', 'backgroundColor': '#f8fafc'}
-    elif button_id == 'metal-futures-button':
-        styles[1] = {'display': 'block', 'padding': '1rem', 'backgroundColor': '#f8fafc'}
-    elif button_id == 'ag-futures-button':
-        styles[2] = {'display': 'block', 'padding': '1rem', 'backgroundColor': '#f8fafc'}
-    elif button_id == 'index-futures-button':
-        styles[3] = {'display': 'block', 'padding': '1rem', 'backgroundColor': '#f8fafc'}
-    elif button_id == 'currency-futures-button':
-        styles[4] = {'display': 'block', 'padding': '1rem', 'backgroundColor': '#f8fafc'}
-    elif button_id == 'interest-futures-button':
-        styles[5] = {'display': 'block', 'padding': '1rem', 'backgroundColor': '#f8fafc'}
-    
-    return styles
 
-# Run the app
+# Run the development server. For production use wsgi.py.
 if __name__ == '__main__':
-    app.run_server(debug=True, port=8050)
\ No newline at end of file
+    create_app().run_server(debug=True, port=8050)
\ No newline at end of file
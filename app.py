@@ -1,21 +1,13 @@
-import numpy as np
-import datetime as dt
-import yfinance as yf
+import os
 import dash
-from dash import dcc, html, dash_table
+from dash import dcc, html, callback
 from dash.dependencies import Input, Output, State
-import pandas as pd
-import io
-import base64
-from dash.dependencies import Input, Output
 
-# Initialize the Dash app with external stylesheets
-app = dash.Dash(__name__, 
-    external_stylesheets=[
-        'https://fonts.googleapis.com/css2?family=Open+Sans:wght@400;600&display=swap',
-        'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css'
-    ]
-)
+import api
+import market_data
+
+# Fonts and icons are served from here
+ASSETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
 
 # Define colors
 COLORS = {
@@ -28,7 +20,7 @@ COLORS = {
 }
 
 # Define the layout
-app.layout = html.Div([
+main_layout = html.Div([
     # Hero section with background image
     html.Div([
         html.Div([
@@ -175,7 +167,7 @@ app.layout = html.Div([
     })
 ], style={'backgroundColor': COLORS['background'], 'minHeight': '100vh'})
 
-@app.callback(
+@callback(
     Output('download-options-data', 'data'),
     Output('output-message', 'children'),
     Output('output-message', 'style'),
@@ -199,33 +191,10 @@ def download_options_data(n_clicks, ticker, option_type, lookback_days):
         }
     
     try:
-        # Get stock data
-        stock = yf.Ticker(ticker)
-        
-        # Calculate date range
-        end_date = dt.datetime.now()
-        start_date = end_date - dt.timedelta(days=lookback_days)
-        
-        # Get options chain
-        options_data = []
-        
-        # Get all available expiration dates
-        expirations = stock.options
+        # Get the full options chain (shared across workers)
+        df = market_data.fetch_option_chain(ticker, option_type)
         
-        for exp_date in expirations:
-            opt_chain = stock.option_chain(exp_date)
-            
-            if option_type in ['CALL', 'BOTH']:
-                calls = opt_chain.calls
-                calls['Option_Type'] = 'CALL'
-                options_data.append(calls)
-                
-            if option_type in ['PUT', 'BOTH']:
-                puts = opt_chain.puts
-                puts['Option_Type'] = 'PUT'
-                options_data.append(puts)
-        
-        if not options_data:
+        if df.empty:
             return None, "No options data found for this ticker", {
                 'marginTop': '1rem',
                 'padding': '1rem',
@@ -234,9 +203,6 @@ def download_options_data(n_clicks, ticker, option_type, lookback_days):
                 'color': '#c53030',
                 'display': 'block'
             }
-            
-        # Combine all data
-        df = pd.concat(options_data, axis=0)
         
         # Prepare for download
         return (
@@ -262,6 +228,15 @@ def download_options_data(n_clicks, ticker, option_type, lookback_days):
             'display': 'block'
         }
 
-# Run the app
+
+def create_app():
+    app = dash.Dash(__name__,
+        assets_folder=ASSETS_PATH
+    )
+    app.layout = main_layout
+    api.register(app.server)
+    return app
+
+# Run the development server. For production use wsgi.py.
 if __name__ == '__main__':
-    app.run_server(debug=True, port=8050) 
\ No newline at end of file
+    create_app().run_server(debug=True, port=8050) 
\ No newline at end of file
@@ -0,0 +1,44 @@
+// Pure-UI callbacks that run in the browser instead of round-tripping
+// through the server.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    navigation: {
+        // The page for a URL, as named by ROUTES in app v2.py
+        page_for: function(pathname) {
+            var pages = {'/options-chain': 'options', '/futures': 'futures', '/portfolio': 'portfolio'};
+            return pages[pathname] || 'stock';
+        },
+        // Show the page matching the URL
+        display_page: function(pathname) {
+            var current = dash_clientside.navigation.page_for(pathname);
+            return ['stock', 'options', 'futures', 'portfolio'].map(function(page) {
+                return {'display': page === current ? 'block' : 'none'};
+            });
+        },
+        // Ask the server for the page matching the URL the first time it is shown
+        request_page: function(pathname, loaded) {
+            var page = dash_clientside.navigation.page_for(pathname);
+            return (loaded || []).indexOf(page) >= 0 ? dash_clientside.no_update : page;
+        }
+    },
+    futures: {
+        // Expand the clicked futures reference section and collapse the rest
+        toggle_sections: function() {
+            var ids = [
+                'energy-futures-button',
+                'metal-futures-button',
+                'ag-futures-button',
+                'index-futures-button',
+                'currency-futures-button',
+                'interest-futures-button'
+            ];
+            var triggered = dash_clientside.callback_context.triggered;
+            var button = triggered.length ? triggered[0].prop_id.split('.')[0] : null;
+            return ids.map(function(id) {
+                if (id === button) {
+                    return {'display': 'block', 'padding': '1rem', 'backgroundColor': '#f8fafc'};
+                }
+                return {'display': 'none'};
+            });
+        }
+    }
+});
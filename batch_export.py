@@ -0,0 +1,199 @@
+"""Headless batch export of stock, futures and options data.
+
+    python batch_export.py tickers.txt --kind options --out exports
+    python batch_export.py tickers.txt --kind stock --days 1825 --format csv
+    python batch_export.py tickers.txt --kind options --resume
+
+Uses the same fetch, cache and chain-store code as the dashboard but never
+imports Dash. Output is partitioned as
+``<out>/<kind>/date=<run date>/ticker=<TICKER>/part-0.<format>``. Each
+finished ticker, exported or found to have no data, is appended to
+``_manifest.jsonl`` in the run directory, and ``--resume`` skips tickers
+already listed there, so an interrupted run picks up where it stopped.
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+import market_data
+from chain_store import filter_option_type
+
+KINDS = ('stock', 'futures', 'options')
+FORMATS = ('parquet', 'csv')
+
+# Manifest statuses --resume treats as finished; errors are retried
+FINISHED = ('ok', 'empty')
+
+
+def read_tickers(path):
+    """One ticker per line; blank lines and '#' comments are ignored.
+
+    Tickers are normalized as the fetch code does (upper-cased), so 'spy'
+    and 'SPY' are exported once. A line that is not a valid symbol is kept
+    as written, to be reported as an error by its export.
+    """
+    tickers = []
+    with open(path) as f:
+        for line in f:
+            ticker = line.split('#', 1)[0].strip()
+            if not ticker:
+                continue
+            try:
+                ticker = market_data.validate_symbol(ticker)
+            except market_data.InvalidSymbol:
+                pass
+            if ticker not in tickers:
+                tickers.append(ticker)
+    return tickers
+
+
+def fetch_table(kind, ticker, days, option_type):
+    """The export for one ticker as an Arrow table."""
+    if kind == 'options':
+        table = market_data.load_chain_table(ticker)
+        if option_type != 'BOTH':
+            table = filter_option_type(table, option_type)
+        return table
+    df = market_data.fetch_history(ticker, days)
+    return pa.Table.from_pandas(df.reset_index(), preserve_index=False)
+
+
+def write_table(table, path, fmt):
+    # Write to a temporary file and rename, so a killed run never leaves a
+    # partial file behind that looks finished.
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    os.close(fd)
+    try:
+        if fmt == 'parquet':
+            pq.write_table(table, tmp_path)
+        else:
+            pa_csv.write_csv(table, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class Manifest:
+    """Append-only record of finished tickers for one run directory.
+
+    A ticker is finished when it was exported or had no data to export.
+    """
+
+    def __init__(self, run_dir):
+        self.path = os.path.join(run_dir, '_manifest.jsonl')
+        self._lock = threading.Lock()
+
+    def completed(self):
+        done = set()
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        if entry.get('status', 'ok') in FINISHED:
+                            done.add(entry['ticker'])
+                    except (ValueError, KeyError, AttributeError):
+                        # A line cut short by a crash; that ticker reruns
+                        continue
+        except FileNotFoundError:
+            pass
+        return done
+
+    def record(self, entry):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+
+
+def export_one(ticker, args, run_dir, manifest):
+    started = time.perf_counter()
+    try:
+        try:
+            table = fetch_table(args.kind, ticker, args.days, args.option_type)
+        except market_data.NoChainError:
+            table = None
+        if table is None or table.num_rows == 0:
+            # Recorded, so --resume doesn't fetch it again
+            entry = {'ticker': ticker, 'status': 'empty', 'rows': 0,
+                     'seconds': time.perf_counter() - started}
+            manifest.record(entry)
+            return entry
+        path = os.path.join(run_dir, f'ticker={ticker.upper()}', f'part-0.{args.format}')
+        write_table(table, path, args.format)
+    except Exception as e:
+        return {'ticker': ticker, 'status': f'error: {e}', 'rows': 0,
+                'seconds': time.perf_counter() - started}
+
+    entry = {'ticker': ticker, 'status': 'ok', 'rows': table.num_rows,
+             'seconds': time.perf_counter() - started}
+    manifest.record(entry)
+    return entry
+
+
+def print_summary(results, elapsed):
+    print(f"\n{'ticker':<12}{'status':<10}{'rows':>10}{'seconds':>10}")
+    for result in sorted(results, key=lambda r: -r['seconds']):
+        status = result['status'].split(':', 1)[0]
+        print(f"{result['ticker']:<12}{status:<10}{result['rows']:>10}{result['seconds']:>10.2f}")
+    ok = sum(1 for r in results if r['status'] == 'ok')
+    print(f"\n{ok}/{len(results)} tickers exported in {elapsed:.1f}s")
+    for result in results:
+        if result['status'].startswith('error'):
+            print(f"{result['ticker']}: {result['status']}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('tickers', help='file with one ticker or futures symbol per line')
+    parser.add_argument('--kind', choices=KINDS, default='options')
+    parser.add_argument('--days', type=int, default=365, help='history window for stock/futures')
+    parser.add_argument('--option-type', choices=('CALL', 'PUT', 'BOTH'), default='BOTH')
+    parser.add_argument('--format', choices=FORMATS, default='parquet')
+    parser.add_argument('--out', default='exports')
+    parser.add_argument('--concurrency', type=int, default=8, help='tickers fetched at once')
+    parser.add_argument('--run-date', default=dt.date.today().isoformat(),
+                        help='partition date; reuse it with --resume to continue a run')
+    parser.add_argument('--resume', action='store_true', help='skip tickers already exported')
+    args = parser.parse_args(argv)
+
+    run_dir = os.path.join(args.out, args.kind, f'date={args.run_date}')
+    manifest = Manifest(run_dir)
+    tickers = read_tickers(args.tickers)
+    if args.resume:
+        done = manifest.completed()
+        skipped = [t for t in tickers if t in done]
+        tickers = [t for t in tickers if t not in done]
+        if skipped:
+            print(f"Resuming: {len(skipped)} tickers already exported or empty, {len(tickers)} to go")
+
+    started = time.perf_counter()
+    results = []
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(export_one, ticker, args, run_dir, manifest) for ticker in tickers]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print(f"[{len(results)}/{len(tickers)}] {result['ticker']}: {result['status']} "
+                  f"({result['seconds']:.2f}s)", flush=True)
+
+    print_summary(results, time.perf_counter() - started)
+    return 1 if any(r['status'].startswith('error') for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""Throughput benchmark: dev server vs. gunicorn workers.
+
+Start the server under test, then point this script at it:
+
+    python "app v2.py"                                  # dev server
+    python wsgi.py --workers 4 --threads 8              # production
+    python benchmarks/bench_server.py --url http://127.0.0.1:8050 \
+        --concurrency 32 --requests 500 --tickers SPY,QQQ,AAPL
+
+Each request fires the stock-download callback through Dash's
+``/_dash-update-component`` endpoint, the same path a browser click takes.
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def stock_download_payload(ticker, timeframe=365):
+    return {
+        'output': '..download-stock-data.data...stock-output-message.children...stock-output-message.style..',
+        'outputs': [
+            {'id': 'download-stock-data', 'property': 'data'},
+            {'id': 'stock-output-message', 'property': 'children'},
+            {'id': 'stock-output-message', 'property': 'style'},
+        ],
+        'inputs': [{'id': 'download-stock-button', 'property': 'n_clicks', 'value': 1}],
+        'changedPropIds': ['download-stock-button.n_clicks'],
+        'state': [
+            {'id': 'stock-ticker', 'property': 'value', 'value': ticker},
+            {'id': 'timeframe', 'property': 'value', 'value': timeframe},
+        ],
+    }
+
+
+def is_error(response):
+    """True for an HTTP error or a callback that returned its error message."""
+    if response.status_code != 200:
+        return True
+    try:
+        message = response.json()['response']['stock-output-message']['children']
+    except (ValueError, KeyError, TypeError):
+        return True
+    return isinstance(message, str) and message.startswith(('Error', 'No ', 'Please'))
+
+
+def run(url, tickers, concurrency, total):
+    endpoint = url.rstrip('/') + '/_dash-update-component'
+    session = requests.Session()
+    latencies = []
+    errors = 0
+
+    def one(i):
+        started = time.perf_counter()
+        try:
+            error = is_error(session.post(endpoint, json=stock_download_payload(tickers[i % len(tickers)])))
+        except requests.RequestException:
+            error = True
+        return time.perf_counter() - started, error
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for latency, error in pool.map(one, range(total)):
+            latencies.append(latency)
+            errors += error
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f'requests:    {total} ({errors} errors, {errors / total:.1%})')
+    print(f'concurrency: {concurrency}')
+    print(f'throughput:  {total / elapsed:.1f} req/s')
+    print(f'p50 latency: {statistics.median(latencies) * 1000:.1f} ms')
+    print(f'p95 latency: {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms')
+    print(f'p99 latency: {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8050')
+    parser.add_argument('--tickers', default='SPY,QQQ,AAPL,MSFT')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+    run(args.url, args.tickers.split(','), args.concurrency, args.requests)
+
+
+if __name__ == '__main__':
+    main()
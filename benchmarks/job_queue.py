@@ -0,0 +1,101 @@
+"""Fetch worker pool scaling: queue throughput as worker processes are added.
+
+    python benchmarks/job_queue.py --tickers 16 --processes 1,2,4,8
+    python benchmarks/job_queue.py --latency 200 --threads 4 --failure-rate 0.05
+
+Seeds a replay archive with ``--tickers`` copies of the SPY chain in
+``SPY_options_chain.csv``, queues a chain job for each, and times
+``jobs.py work --until-idle`` with each number of processes against a fresh
+queue, cache and chain store. ``--latency``/``--jitter``/``--failure-rate``
+shape the simulated upstream; the per-process upstream limits are lifted so
+the only limit is the workers themselves.
+
+Reports jobs per second, the speedup over the first configuration and the
+scaling efficiency (speedup per added worker). The time includes starting
+the worker processes.
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def seed_archive(archive_path, tickers):
+    import provider
+
+    archive = provider.Archive(archive_path)
+    provider.seed_from_csv(os.path.join(ROOT, 'SPY_options_chain.csv'), 'SPY', archive)
+    for ticker in tickers:
+        if ticker != 'SPY':
+            shutil.copytree(os.path.join(archive_path, 'SPY'), os.path.join(archive_path, ticker))
+
+
+def run(processes, args, archive, tickers):
+    """``(seconds, jobs done, jobs dead)`` for one drain of the queue."""
+    workdir = tempfile.mkdtemp(prefix='job-queue-')
+    env = dict(
+        os.environ,
+        DATA_PROVIDER='replay',
+        DATA_ARCHIVE_PATH=archive,
+        OPTIONS_CACHE_PATH=os.path.join(workdir, 'cache.sqlite'),
+        CHAIN_STORE_PATH=os.path.join(workdir, 'chains'),
+        ROLLUP_DB_PATH=os.path.join(workdir, 'rollups.sqlite'),
+        JOB_QUEUE_PATH=os.path.join(workdir, 'jobs.sqlite'),
+        JOB_POLL_SECONDS='0.05',
+        JOB_RETRY_DELAY='0.1',
+        REPLAY_LATENCY_MS=str(args.latency),
+        REPLAY_JITTER_MS=str(args.jitter),
+        REPLAY_FAILURE_RATE=str(args.failure_rate),
+        UPSTREAM_RATE='10000',
+        UPSTREAM_MAX_CONCURRENT='1000',
+    )
+    jobs = [sys.executable, os.path.join(ROOT, 'jobs.py')]
+    subprocess.run(jobs + ['enqueue'] + tickers, env=env, check=True, stdout=subprocess.DEVNULL)
+    started = time.perf_counter()
+    subprocess.run(jobs + ['work', '--processes', str(processes), '--threads', str(args.threads),
+                           '--until-idle'], env=env, check=True, stderr=subprocess.DEVNULL)
+    elapsed = time.perf_counter() - started
+    counts = dict(sqlite3.connect(env['JOB_QUEUE_PATH']).execute(
+        'SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall())
+    shutil.rmtree(workdir, ignore_errors=True)
+    return elapsed, counts.get('done', 0), counts.get('dead', 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tickers', type=int, default=16, help='chains to fetch')
+    parser.add_argument('--processes', default='1,2,4,8', help='comma-separated worker process counts')
+    parser.add_argument('--threads', type=int, default=1, help='threads per worker process')
+    parser.add_argument('--latency', type=float, default=100, help='replay upstream latency, ms')
+    parser.add_argument('--jitter', type=float, default=20, help='replay upstream jitter, ms')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='replay upstream failure rate')
+    args = parser.parse_args()
+
+    tickers = [f'T{i:03d}' for i in range(args.tickers)]
+    archive = os.path.join(tempfile.mkdtemp(prefix='job-queue-archive-'), 'archive')
+    seed_archive(archive, tickers)
+
+    print(f"{'workers':>8}{'seconds':>10}{'jobs':>8}{'dead':>6}{'jobs/s':>9}{'speedup':>9}{'efficiency':>12}")
+    baseline = None
+    for processes in [int(p) for p in args.processes.split(',')]:
+        elapsed, done, dead = run(processes, args, archive, tickers)
+        rate = done / elapsed
+        if baseline is None:
+            baseline = (processes, rate)
+        speedup = rate / baseline[1]
+        efficiency = speedup * baseline[0] / processes
+        print(f"{processes:>8}{elapsed:>10.2f}{done:>8}{dead:>6}{rate:>9.1f}{speedup:>9.2f}{efficiency:>12.0%}",
+              flush=True)
+    shutil.rmtree(os.path.dirname(archive), ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
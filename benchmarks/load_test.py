@@ -0,0 +1,309 @@
+"""Concurrent-user load test of the Dash callback endpoint.
+
+Virtual users post to ``/_dash-update-component`` exactly as a browser click
+on a download button does, picking stock, options or futures downloads at
+random in the proportions given by ``--mix``. Each user waits for its
+response (plus ``--think`` seconds) before sending the next.
+
+With ``--serve`` the script starts the server itself under gunicorn with the
+replay provider, or with ``--dev`` as well under Dash's debug dev server, so
+no network is needed: the archive is seeded from
+``SPY_options_chain.csv`` plus synthetic price histories for the stock and
+futures symbols, and ``--latency``/``--jitter``/``--failure-rate`` shape the
+simulated upstream.
+
+    python benchmarks/load_test.py --serve --workers 4 --threads 8 --users 50
+    python benchmarks/load_test.py --serve --dev --users 50 --label dev
+    python benchmarks/load_test.py --url http://127.0.0.1:8050 --users 20 --label dev
+
+Reports p50/p95/p99 latency, throughput and error rate per callback, and
+saves them with the run configuration as JSON under ``--results`` so runs
+against different server configurations can be compared.
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import requests
+
+from bench_server import stock_download_payload
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CALLBACKS = ('stock', 'options', 'futures')
+
+# Messages the download callbacks return instead of an HTTP error
+ERROR_PREFIXES = ('Error', 'No ', 'Please')
+
+
+def options_download_payload(ticker, option_type='BOTH'):
+    return {
+        'output': '..download-options-data.data...output-message.children...output-message.style'
+                  '...options-analytics.children..',
+        'outputs': [
+            {'id': 'download-options-data', 'property': 'data'},
+            {'id': 'output-message', 'property': 'children'},
+            {'id': 'output-message', 'property': 'style'},
+            {'id': 'options-analytics', 'property': 'children'},
+        ],
+        'inputs': [{'id': 'download-button', 'property': 'n_clicks', 'value': 1}],
+        'changedPropIds': ['download-button.n_clicks'],
+        'state': [
+            {'id': 'ticker', 'property': 'value', 'value': ticker},
+            {'id': 'option-type', 'property': 'value', 'value': option_type},
+            {'id': 'lookback-days', 'property': 'value', 'value': 30},
+            {'id': 'strikes-around-spot', 'property': 'value', 'value': None},
+        ],
+    }
+
+
+def futures_download_payload(symbol, timeframe=365):
+    return {
+        'output': '..download-futures-data.data...futures-output-message.children'
+                  '...futures-output-message.style..',
+        'outputs': [
+            {'id': 'download-futures-data', 'property': 'data'},
+            {'id': 'futures-output-message', 'property': 'children'},
+            {'id': 'futures-output-message', 'property': 'style'},
+        ],
+        'inputs': [{'id': 'download-futures-button', 'property': 'n_clicks', 'value': 1}],
+        'changedPropIds': ['download-futures-button.n_clicks'],
+        'state': [
+            {'id': 'futures-symbol', 'property': 'value', 'value': symbol},
+            {'id': 'futures-timeframe', 'property': 'value', 'value': timeframe},
+        ],
+    }
+
+
+PAYLOADS = {
+    'stock': stock_download_payload,
+    'options': options_download_payload,
+    'futures': futures_download_payload,
+}
+
+# Components whose 'children' carry the success or error message
+MESSAGES = {
+    'stock': 'stock-output-message',
+    'options': 'output-message',
+    'futures': 'futures-output-message',
+}
+
+
+def is_error(callback, response):
+    if response.status_code != 200:
+        return True
+    try:
+        message = response.json()['response'][MESSAGES[callback]]['children']
+    except (ValueError, KeyError, TypeError):
+        return True
+    return isinstance(message, str) and message.startswith(ERROR_PREFIXES)
+
+
+def synthetic_history(days, seed, start_price=100.0):
+    """A random-walk daily OHLCV frame ending today, for the replay archive."""
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=int(days * 252 / 365) + 1,
+                           tz='America/New_York', name='Date')
+    close = start_price * np.exp(np.cumsum(rng.normal(0, 0.01, len(index))))
+    open_ = close * np.exp(rng.normal(0, 0.003, len(index)))
+    spread = np.abs(rng.normal(0, 0.005, len(index)))
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) * (1 + spread),
+        'Low': np.minimum(open_, close) * (1 - spread),
+        'Close': close,
+        'Volume': rng.integers(1_000_000, 10_000_000, len(index)),
+        'Dividends': 0.0,
+        'Stock Splits': 0.0,
+    }, index=index)
+
+
+def seed_archive(archive_path, symbols):
+    import provider
+
+    archive = provider.Archive(archive_path)
+    provider.seed_from_csv(os.path.join(ROOT, 'SPY_options_chain.csv'), 'SPY', archive)
+    for seed, symbol in enumerate(sorted(set(symbols) | {'SPY'})):
+        archive.save_history(symbol, synthetic_history(1825, seed, 560.0 if symbol == 'SPY' else 100.0))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(args, symbols):
+    """Start wsgi.py (or the dev server with ``--dev``) on a free port with
+    the replay provider; returns ``(process, url)``."""
+    workdir = tempfile.mkdtemp(prefix='load-test-')
+    archive = os.path.join(workdir, 'archive')
+    seed_archive(archive, symbols)
+    env = dict(
+        os.environ,
+        DATA_PROVIDER='replay',
+        DATA_ARCHIVE_PATH=archive,
+        OPTIONS_CACHE_PATH=os.path.join(workdir, 'cache.sqlite'),
+        CHAIN_STORE_PATH=os.path.join(workdir, 'chains'),
+        REPLAY_LATENCY_MS=str(args.latency),
+        REPLAY_JITTER_MS=str(args.jitter),
+        REPLAY_FAILURE_RATE=str(args.failure_rate),
+    )
+    if args.cold:
+        env.update(HISTORY_CACHE_TTL='0', CHAIN_CACHE_TTL='0')
+    port = _free_port()
+    log = open(os.path.join(workdir, 'server.log'), 'w')
+    if args.dev:
+        # What ``python "app v2.py"`` runs, minus the reloader's second process
+        command = [sys.executable, '-c',
+                   f'import runpy; runpy.run_path({os.path.join(ROOT, "app v2.py")!r})["create_app"]()'
+                   f'.run(debug=True, port={port}, use_reloader=False)']
+    else:
+        command = [sys.executable, os.path.join(ROOT, 'wsgi.py'), '--bind', f'127.0.0.1:{port}',
+                   '--workers', str(args.workers), '--threads', str(args.threads)]
+    process = subprocess.Popen(command, env=env, cwd=ROOT, stdout=log, stderr=subprocess.STDOUT)
+    print(f'Server log: {log.name}')
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('server exited during startup')
+        try:
+            requests.get(url, timeout=1)
+            return process, url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('server did not start within 60s')
+
+
+def virtual_user(user, endpoint, mix, symbols, deadline, think, samples, lock):
+    rng = random.Random(user)
+    session = requests.Session()
+    names, weights = zip(*mix.items())
+    while time.monotonic() < deadline:
+        callback = rng.choices(names, weights)[0]
+        payload = PAYLOADS[callback](rng.choice(symbols[callback]))
+        started = time.perf_counter()
+        try:
+            response = session.post(endpoint, json=payload, timeout=120)
+            error = is_error(callback, response)
+        except requests.RequestException:
+            error = True
+        latency = time.perf_counter() - started
+        with lock:
+            samples.append((callback, latency, error))
+        if think:
+            time.sleep(think)
+
+
+def summarize(samples, elapsed):
+    """Per-callback and overall latency percentiles, throughput and errors."""
+    frame = pd.DataFrame(samples, columns=['callback', 'latency', 'error'])
+    rows = {}
+    for name, group in list(frame.groupby('callback')) + [('ALL', frame)]:
+        latency_ms = group['latency'].to_numpy() * 1000
+        rows[name] = {
+            'requests': len(group),
+            'throughput_rps': len(group) / elapsed,
+            'error_rate': float(group['error'].mean()),
+            'p50_ms': float(np.percentile(latency_ms, 50)),
+            'p95_ms': float(np.percentile(latency_ms, 95)),
+            'p99_ms': float(np.percentile(latency_ms, 99)),
+            'max_ms': float(latency_ms.max()),
+        }
+    return rows
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in CALLBACKS:
+            raise argparse.ArgumentTypeError(f'unknown callback {name!r}; use {", ".join(CALLBACKS)}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8050', help='server to test (ignored with --serve)')
+    parser.add_argument('--serve', action='store_true', help='start wsgi.py with the replay provider')
+    parser.add_argument('--dev', action='store_true', help='with --serve, start the debug dev server instead')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers with --serve')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads with --serve')
+    parser.add_argument('--latency', type=float, default=50, help='replay upstream latency, ms')
+    parser.add_argument('--jitter', type=float, default=20, help='replay upstream jitter, ms')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='replay upstream failure rate')
+    parser.add_argument('--cold', action='store_true', help='disable the fetch cache TTLs with --serve')
+    parser.add_argument('--users', type=int, default=20, help='concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=60, help='seconds to run')
+    parser.add_argument('--think', type=float, default=0.0, help='seconds between a user\'s requests')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('stock=4,options=3,futures=3'))
+    parser.add_argument('--stock-symbols', default='SPY,AAPL,MSFT')
+    parser.add_argument('--option-symbols', default='SPY')
+    parser.add_argument('--futures-symbols', default='CL=F,GC=F,ES=F')
+    parser.add_argument('--label', default='', help='name of the server configuration under test')
+    parser.add_argument('--results', default=os.path.join(ROOT, 'benchmarks', 'results'))
+    args = parser.parse_args()
+
+    symbols = {
+        'stock': args.stock_symbols.split(','),
+        'options': args.option_symbols.split(','),
+        'futures': args.futures_symbols.split(','),
+    }
+    process = None
+    url = args.url
+    if args.serve:
+        process, url = start_server(args, symbols['stock'] + symbols['futures'])
+    endpoint = url.rstrip('/') + '/_dash-update-component'
+
+    samples, lock = [], threading.Lock()
+    try:
+        started = time.monotonic()
+        deadline = started + args.duration
+        users = [threading.Thread(target=virtual_user, daemon=True,
+                                  args=(user, endpoint, args.mix, symbols, deadline, args.think, samples, lock))
+                 for user in range(args.users)]
+        for thread in users:
+            thread.start()
+        for thread in users:
+            thread.join()
+        elapsed = time.monotonic() - started
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    if not samples:
+        print('no requests completed', file=sys.stderr)
+        return 1
+    summary = summarize(samples, elapsed)
+    print(f"{'callback':<10}{'requests':>10}{'req/s':>9}{'errors':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, row in summary.items():
+        print(f"{name:<10}{row['requests']:>10}{row['throughput_rps']:>9.1f}{row['error_rate']:>9.1%}"
+              f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}")
+
+    os.makedirs(args.results, exist_ok=True)
+    stamp = dt.datetime.now().strftime('%Y%m%d-%H%M%S')
+    path = os.path.join(args.results, f"load-{args.label or 'run'}-{stamp}.json")
+    config = {key: value for key, value in vars(args).items() if key != 'results'}
+    with open(path, 'w') as f:
+        json.dump({'config': config, 'url': url, 'elapsed_s': elapsed, 'callbacks': summary}, f, indent=2)
+    print(f'\nResults saved to {path}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""Page-load and callbacks-per-session measurement.
+
+Run against a live server, once per version you want to compare (check out
+the commit before the clientside-callback change for the "before" numbers):
+
+    python benchmarks/page_load.py --url http://127.0.0.1:8050
+
+Reports:
+
+* the time to fetch every resource the browser needs before the page is
+  interactive (index HTML, every stylesheet and script it references,
+  including third-party CDNs, then ``_dash-layout`` and
+  ``_dash-dependencies``), fetched in dependency order as a browser would,
+  plus the initial server callbacks the renderer fires on load, round by
+  round, until the page stops changing (a page rendered by a callback only
+  exists after its round-trip);
+* the bytes those resources add up to, and how many come from third-party
+  hosts. A resource that cannot be fetched (e.g. a CDN without network
+  access) is counted under ``external_failed`` and adds no time, so the
+  time is a lower bound for a page that still depends on one;
+* how many server round-trips a scripted session makes: load the app, visit
+  each page, and open every futures reference section twice. Callbacks
+  registered as clientside functions cost no round-trip and are not counted,
+  but server callbacks they trigger are.
+
+On loopback every request is nearly free, which hides what the change is
+about. ``--rtt`` adds that many milliseconds of network round-trip to every
+request, including third-party ones that fail offline, where a real browser
+would spend at least that on DNS, TCP and TLS as well:
+
+    python benchmarks/page_load.py --url http://127.0.0.1:8050 --rtt 50
+
+For callback counts from real traffic, start the server with DASH_METRICS=1
+and read ``/debug/metrics``.
+"""
+import argparse
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import requests
+
+FUTURES_SECTIONS = ['energy', 'metal', 'ag', 'index', 'currency', 'interest']
+
+# The scripted session, as (component id, property) changes
+SESSION = (
+    [('url', 'pathname')] * 3
+    + [(f'{section}-futures-button', 'n_clicks') for section in FUTURES_SECTIONS] * 2
+)
+
+
+class LatencySession(requests.Session):
+    """A session whose every request first waits one network round-trip."""
+
+    def __init__(self, rtt=0.0):
+        super().__init__()
+        self.rtt = rtt
+
+    def request(self, *args, **kwargs):
+        time.sleep(self.rtt)
+        return super().request(*args, **kwargs)
+
+
+def _timed_get(session, url):
+    started = time.perf_counter()
+    try:
+        response = session.get(url, timeout=30)
+    except requests.RequestException:
+        return 0.0, 0, None
+    return time.perf_counter() - started, len(response.content), response.status_code
+
+
+# Properties a browser fills in on components that read the address bar
+BROWSER_PROPS = {'pathname': '/', 'search': '', 'hash': ''}
+
+
+def _components(node, found):
+    """Collect ``{id: props}`` for every component with a string id."""
+    if isinstance(node, list):
+        for child in node:
+            _components(child, found)
+    elif isinstance(node, dict) and 'props' in node:
+        props = node['props']
+        if isinstance(props.get('id'), str):
+            found[props['id']] = props
+        for value in props.values():
+            _components(value, found)
+    return found
+
+
+def _outputs(dependency):
+    spec = dependency['output']
+    parts = spec[2:-2].split('...') if spec.startswith('..') else [spec]
+    return [dict(zip(('id', 'property'), part.rsplit('.', 1))) for part in parts]
+
+
+def _fire_initial_callbacks(session, base_url, layout, dependencies):
+    """Post every initial server callback whose components are on the page,
+    applying responses and repeating for callbacks they bring into view.
+    Returns the number of round-trips."""
+    endpoint = urljoin(base_url, '_dash-update-component')
+    pending = [d for d in dependencies
+               if not d.get('clientside_function') and not d.get('prevent_initial_call')]
+    fired = 0
+    while True:
+        components = _components(layout, {})
+
+        def value(item):
+            props = components[item['id']]
+            return {**item, 'value': props.get(item['property'], BROWSER_PROPS.get(item['property']))}
+
+        ready = [d for d in pending
+                 if all(i['id'] in components for i in d['inputs'] + _outputs(d))]
+        if not ready:
+            return fired
+        pending = [d for d in pending if d not in ready]
+
+        def post(dependency):
+            outputs = _outputs(dependency)
+            payload = {
+                'output': dependency['output'],
+                'outputs': outputs if dependency['output'].startswith('..') else outputs[0],
+                'inputs': [value(i) for i in dependency['inputs']],
+                'state': [value(s) for s in dependency['state']],
+                'changedPropIds': [],
+            }
+            response = session.post(endpoint, json=payload, timeout=30)
+            return response.json().get('response', {}) if response.status_code == 200 else {}
+
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            for response in pool.map(post, ready):
+                for component_id, props in response.items():
+                    if component_id in components:
+                        components[component_id].update(props)
+        fired += len(ready)
+
+
+def load_time(base_url, rtt=0.0):
+    """Seconds until index, static resources, layout and dependencies are in
+    and the initial callbacks have returned, with ``rtt`` seconds of network
+    round-trip per request."""
+    session = LatencySession(rtt)
+    started = time.perf_counter()
+    index = session.get(base_url, timeout=30).text
+    resources = re.findall(r'<(?:link[^>]+href|script[^>]+src)="([^"]+)"', index)
+    resources = [urljoin(base_url, resource) for resource in resources]
+
+    # Stylesheets and scripts load in parallel, like a browser would
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        results = list(pool.map(lambda url: (url, *_timed_get(session, url)), resources))
+
+    layout_started = time.perf_counter()
+    layout = session.get(urljoin(base_url, '_dash-layout'), timeout=30)
+    layout_time, layout_bytes = time.perf_counter() - layout_started, len(layout.content)
+    deps_started = time.perf_counter()
+    dependencies = session.get(urljoin(base_url, '_dash-dependencies'), timeout=30)
+    deps_time, deps_bytes = time.perf_counter() - deps_started, len(dependencies.content)
+    callbacks_started = time.perf_counter()
+    initial_callbacks = _fire_initial_callbacks(session, base_url, layout.json(), dependencies.json())
+    callbacks_time = time.perf_counter() - callbacks_started
+    total = time.perf_counter() - started
+
+    external = [r for r in results if not r[0].startswith(base_url)]
+    return {
+        'time_to_interactive_ms': total * 1000,
+        'resources': len(results),
+        'resource_bytes': len(index) + sum(r[2] for r in results) + layout_bytes + deps_bytes,
+        'external_resources': len(external),
+        'external_failed': sum(1 for r in external if r[3] is None),
+        'external_ms': sum(r[1] for r in external) * 1000,
+        'layout_bytes': layout_bytes,
+        'layout_ms': layout_time * 1000,
+        'dependencies_ms': deps_time * 1000,
+        'initial_callbacks': initial_callbacks,
+        'initial_callbacks_ms': callbacks_time * 1000,
+    }
+
+
+def _inputs(dependency):
+    return {(i['id'], i['property']) for i in dependency['inputs']}
+
+
+def session_round_trips(base_url):
+    """Server callbacks fired by the scripted SESSION."""
+    dependencies = requests.get(urljoin(base_url, '_dash-dependencies'), timeout=30).json()
+    server_side = [d for d in dependencies if not d.get('clientside_function')]
+    clientside = [d for d in dependencies if d.get('clientside_function')]
+
+    def triggered_by(change):
+        # A change reaches a server callback directly or through the outputs
+        # of a clientside one (e.g. the first visit to a page requesting it).
+        # Counted whenever a clientside callback could pass it on, so an upper
+        # bound for pages the session has already loaded
+        changes = {change} | {(o['id'], o['property']) for d in clientside
+                              if change in _inputs(d) for o in _outputs(d)}
+        return sum(1 for d in server_side if changes & _inputs(d))
+
+    # Every callback without prevent_initial_call fires once on load
+    initial = sum(1 for d in server_side if not d.get('prevent_initial_call'))
+    triggered = sum(triggered_by(change) for change in SESSION)
+    return {
+        'server_callbacks': len(server_side),
+        'clientside_callbacks': len(dependencies) - len(server_side),
+        'round_trips_on_load': initial,
+        'round_trips_in_session': initial + triggered,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8050/')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--rtt', type=float, default=0.0, help='simulated network round-trip, ms')
+    args = parser.parse_args()
+    base_url = args.url if args.url.endswith('/') else args.url + '/'
+
+    runs = [load_time(base_url, args.rtt / 1000) for _ in range(args.runs)]
+    best = min(runs, key=lambda run: run['time_to_interactive_ms'])
+    for name, value in {**best, **session_round_trips(base_url)}.items():
+        print(f'{name:28s} {value:.1f}' if isinstance(value, float) else f'{name:28s} {value}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Worker cold-start benchmark: import time and time to first response.
+
+    python benchmarks/startup.py --runs 5
+
+Reports, as the median over ``--runs`` fresh interpreters:
+
+* the ``python -X importtime`` breakdown of ``import wsgi`` (the work every
+  new worker does before it can serve): total, the heaviest packages by
+  cumulative time, and whether pandas, NumPy, pyarrow and yfinance were
+  loaded at all;
+* time to first response: from starting ``wsgi.py`` (one gunicorn worker) to
+  the first 200 for the index page, and then for ``_dash-layout``.
+
+To compare against an earlier version, check it out and run the script
+again with the same arguments.
+"""
+import argparse
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_PACKAGES = ['dash', 'flask', 'plotly', 'pandas', 'numpy', 'pyarrow', 'yfinance', 'IPython']
+
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def _environment(workdir):
+    return dict(
+        os.environ,
+        OPTIONS_CACHE_PATH=os.path.join(workdir, 'cache.sqlite'),
+        CHAIN_STORE_PATH=os.path.join(workdir, 'chains'),
+    )
+
+
+def import_profile(workdir):
+    """``{module: (self_us, cumulative_us)}`` for ``import wsgi``."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import wsgi'],
+        cwd=ROOT, env=_environment(workdir), capture_output=True, text=True, check=True,
+    )
+    profile = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            profile[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return profile
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(url, deadline):
+    while time.perf_counter() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f'no response from {url}')
+
+
+def first_response(workdir):
+    """Seconds from launching the server to the index page, and to the layout."""
+    port = _free_port()
+    url = f'http://127.0.0.1:{port}/'
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'wsgi.py'), '--bind', f'127.0.0.1:{port}',
+         '--workers', '1', '--threads', '1'],
+        cwd=ROOT, env=_environment(workdir), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_for(url, started + 60)
+        index = time.perf_counter() - started
+        _wait_for(url + '_dash-layout', started + 60)
+        layout = time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait()
+    return index, layout
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='heaviest imports to list')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='startup-')
+    profiles = [import_profile(workdir) for _ in range(args.runs)]
+    responses = [first_response(workdir) for _ in range(args.runs)]
+
+    def median(module, field=1):
+        return statistics.median(p[module][field] for p in profiles if module in p) / 1000
+
+    print(f"{'import wsgi':<32}{median('wsgi'):>10.1f} ms")
+    for package in HEAVY_PACKAGES:
+        if any(package in p for p in profiles):
+            print(f"  {package:<30}{median(package):>10.1f} ms")
+        else:
+            print(f"  {package:<30}{'not loaded':>13}")
+
+    print(f"\nHeaviest imports by self time:")
+    last = profiles[-1]
+    for module, (self_us, _) in sorted(last.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"  {module:<40}{self_us / 1000:>8.1f} ms")
+
+    index = statistics.median(r[0] for r in responses)
+    layout = statistics.median(r[1] for r in responses)
+    print(f"\n{'first response (index)':<32}{index * 1000:>10.1f} ms")
+    print(f"{'first response (_dash-layout)':<32}{layout * 1000:>10.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
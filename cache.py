@@ -0,0 +1,198 @@
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# Default location of the shared cache database. Every worker process that
+# points at the same file shares the same cache.
+DEFAULT_CACHE_PATH = os.environ.get(
+    'OPTIONS_CACHE_PATH',
+    os.path.join(tempfile.gettempdir(), 'options_data_cache.sqlite3')
+)
+
+# WAL needs shared memory, so it only works for processes on one host. When
+# the SQLite files live on a filesystem shared by several hosts, set this to
+# DELETE (the rollback journal) instead.
+JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+
+
+class LocalConnection:
+    """One SQLite connection to ``path`` per (process, thread).
+
+    SQLite connections must not cross a fork or a thread. ``schema`` is a
+    list of statements run on every new connection.
+    """
+
+    def __init__(self, path, schema=()):
+        self.path = path
+        self.schema = schema
+        self._local = threading.local()
+
+    def get(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute(f'PRAGMA journal_mode={JOURNAL_MODE}')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        for statement in self.schema:
+            conn.execute(statement)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+
+class Memo:
+    """In-process LRU of values derived from one snapshot of some data.
+
+    Keys carry the snapshot's version (a chain version, a history's fetch
+    time), so a new snapshot simply misses and old entries age out once more
+    than ``maxsize`` are held. Threads share entries; two that miss on the
+    same key at once both compute it and the later result is kept. Callers
+    that update a cached value in place hold ``lock`` while they do.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.lock = threading.RLock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        """The value for ``key``, or None."""
+        with self.lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """The value for ``key``, calling ``compute()`` outside the lock on a
+        miss."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self._entries.clear()
+
+
+class SharedCache:
+    """Key/value cache backed by a local SQLite file.
+
+    The file is opened in WAL mode so any number of worker processes can read
+    concurrently while one of them writes. Values are pickled, so DataFrames
+    round-trip unchanged. ``get_or_fetch`` takes a short in-flight lease per
+    key, which means that when N workers miss on the same key at once only one
+    of them calls upstream and the others wait for its result.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, default_ttl=300, lease_seconds=60):
+        self.path = path
+        self.default_ttl = default_ttl
+        self.lease_seconds = lease_seconds
+        self._connection = LocalConnection(path, [
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+            'created REAL NOT NULL, expires REAL NOT NULL)',
+            'CREATE TABLE IF NOT EXISTS inflight ('
+            'key TEXT PRIMARY KEY, expires REAL NOT NULL)',
+        ])
+
+    def _connect(self):
+        return self._connection.get()
+
+    @staticmethod
+    def make_key(parts):
+        if isinstance(parts, str):
+            return parts
+        return '|'.join(str(part) for part in parts)
+
+    def get(self, key):
+        """Return the cached value for ``key`` or None if missing or expired."""
+        entry = self.get_entry(key)
+        return None if entry is None else entry[0]
+
+    def get_entry(self, key):
+        """Return ``(value, created_timestamp)`` for ``key`` or None."""
+        key = self.make_key(key)
+        row = self._connect().execute(
+            'SELECT value, created, expires FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or row[2] < time.time():
+            return None
+        return pickle.loads(row[0]), row[1]
+
+    def set(self, key, value, ttl=None):
+        key = self.make_key(key)
+        now = time.time()
+        ttl = self.default_ttl if ttl is None else ttl
+        self._connect().execute(
+            'INSERT OR REPLACE INTO cache (key, value, created, expires) VALUES (?, ?, ?, ?)',
+            (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), now, now + ttl)
+        )
+
+    def delete(self, key):
+        self._connect().execute('DELETE FROM cache WHERE key = ?', (self.make_key(key),))
+
+    def purge_expired(self):
+        now = time.time()
+        conn = self._connect()
+        conn.execute('DELETE FROM cache WHERE expires < ?', (now,))
+        conn.execute('DELETE FROM inflight WHERE expires < ?', (now,))
+
+    def _acquire_lease(self, key):
+        conn = self._connect()
+        now = time.time()
+        conn.execute('DELETE FROM inflight WHERE key = ? AND expires < ?', (key, now))
+        cursor = conn.execute(
+            'INSERT OR IGNORE INTO inflight (key, expires) VALUES (?, ?)',
+            (key, now + self.lease_seconds)
+        )
+        return cursor.rowcount == 1
+
+    def _release_lease(self, key):
+        self._connect().execute('DELETE FROM inflight WHERE key = ?', (key,))
+
+    def get_or_fetch(self, key, fetch, ttl=None, poll_interval=0.1):
+        """Return the cached value for ``key``, calling ``fetch()`` on a miss.
+
+        Only one process fetches a given key at a time; the rest poll the
+        cache until the value lands or the fetcher's lease runs out, in which
+        case they fetch themselves.
+        """
+        key = self.make_key(key)
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        deadline = time.time() + self.lease_seconds
+        while not self._acquire_lease(key):
+            time.sleep(poll_interval)
+            value = self.get(key)
+            if value is not None:
+                return value
+            if time.time() > deadline:
+                break
+
+        try:
+            # Another worker may have finished between our miss and the lease.
+            value = self.get(key)
+            if value is None:
+                value = fetch()
+                self.set(key, value, ttl)
+            return value
+        finally:
+            self._release_lease(key)
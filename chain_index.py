@@ -0,0 +1,119 @@
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+pa = lazy_import('pyarrow')
+
+SORT_COLUMNS = ['Expiration', 'Option_Type', 'strike']
+
+
+def sort_chain(df):
+    """Sort an assembled chain by (Expiration, Option_Type, strike).
+
+    The chain comes back from Yahoo per expiration as calls then puts, each in
+    strike order, so this is normally a no-op; the stable sort guarantees it.
+    """
+    if df.empty:
+        return df
+    return df.sort_values(SORT_COLUMNS, kind='mergesort')
+
+
+def build_index(df):
+    """Row ranges of each (Expiration, Option_Type) block in a sorted chain."""
+    if df.empty:
+        return pd.DataFrame(columns=['Expiration', 'Option_Type', 'start', 'stop'])
+    sizes = df.groupby(['Expiration', 'Option_Type'], sort=False).size()
+    stops = sizes.cumsum()
+    return pd.DataFrame({
+        'Expiration': sizes.index.get_level_values(0),
+        'Option_Type': sizes.index.get_level_values(1),
+        'start': (stops - sizes).values,
+        'stop': stops.values,
+    })
+
+
+class ChainIndex:
+    """Binary-search lookups over a chain sorted by ``sort_chain``.
+
+    ``table`` is the stored Arrow chain and ``blocks`` the frame produced by
+    ``build_index``. Every lookup finds the (expiration, right) block in a
+    dict and then searches its strike range with ``np.searchsorted``, so a
+    query costs O(log n) in the block size and results are zero-copy slices of
+    ``table``.
+
+    ``right`` is 'CALL', 'PUT' or 'BOTH'; with 'BOTH' the call and put
+    results are concatenated.
+    """
+
+    def __init__(self, table, blocks):
+        self.table = table
+        self.strikes = table.column('strike').to_numpy() if table.num_rows else np.empty(0)
+        self._blocks = {
+            (row.Expiration, row.Option_Type): (int(row.start), int(row.stop))
+            for row in blocks.itertuples(index=False)
+        }
+        self._expirations = sorted({expiration for expiration, _ in self._blocks})
+
+    @classmethod
+    def from_frame(cls, df):
+        df = sort_chain(df)
+        return cls(pa.Table.from_pandas(df), build_index(df))
+
+    def expirations(self):
+        return list(self._expirations)
+
+    def _ranges(self, expiration, right):
+        rights = ['CALL', 'PUT'] if right == 'BOTH' else [right]
+        return [self._blocks[(expiration, r)] for r in rights if (expiration, r) in self._blocks]
+
+    def _collect(self, slices):
+        slices = [self.table.slice(start, stop - start) for start, stop in slices if stop > start]
+        if not slices:
+            return self.table.slice(0, 0)
+        return slices[0] if len(slices) == 1 else pa.concat_tables(slices)
+
+    def strike_range(self, expiration, low, high, right='BOTH'):
+        """Contracts with ``low <= strike <= high``."""
+        slices = []
+        for start, stop in self._ranges(expiration, right):
+            strikes = self.strikes[start:stop]
+            slices.append((start + np.searchsorted(strikes, low, 'left'),
+                           start + np.searchsorted(strikes, high, 'right')))
+        return self._collect(slices)
+
+    def _around(self, start, stop, spot, n):
+        position = int(np.searchsorted(self.strikes[start:stop], spot, 'left'))
+        return start + max(position - n, 0), start + min(position + n, stop - start)
+
+    def around_spot(self, expiration, spot, n, right='BOTH'):
+        """The ``n`` strikes below ``spot`` and the ``n`` at or above it."""
+        return self._collect([self._around(start, stop, spot, n)
+                              for start, stop in self._ranges(expiration, right)])
+
+    def nearest(self, expiration, target, k=1, right='BOTH'):
+        """The ``k`` contracts per right whose strikes are closest to ``target``."""
+        slices = []
+        for start, stop in self._ranges(expiration, right):
+            strikes = self.strikes[start:stop]
+            position = int(np.searchsorted(strikes, target, 'left'))
+            low, high = position, position
+            # Grow the window one strike at a time towards the closer side
+            while high - low < k and (low > 0 or high < len(strikes)):
+                if low == 0:
+                    high += 1
+                elif high == len(strikes) or target - strikes[low - 1] <= strikes[high] - target:
+                    low -= 1
+                else:
+                    high += 1
+            slices.append((start + low, start + high))
+        return self._collect(slices)
+
+    def atm(self, expiration, spot, right='BOTH'):
+        """The at-the-money contract(s): the strike nearest ``spot``."""
+        return self.nearest(expiration, spot, k=1, right=right)
+
+    def around_spot_all(self, spot, n, right='BOTH'):
+        """``around_spot`` applied to every expiration, in index order."""
+        return self._collect([self._around(start, stop, spot, n)
+                              for expiration in self._expirations
+                              for start, stop in self._ranges(expiration, right)])
@@ -0,0 +1,191 @@
+import datetime as dt
+import os
+import tempfile
+import time
+from zoneinfo import ZoneInfo
+
+from lazy_imports import lazy_import
+
+pa = lazy_import('pyarrow')
+pc = lazy_import('pyarrow.compute')
+
+# Root directory for stored chains. Every worker process on the host (or on
+# several hosts sharing the directory) reads the same files.
+DEFAULT_STORE_PATH = os.environ.get(
+    'CHAIN_STORE_PATH',
+    os.path.join(tempfile.gettempdir(), 'options_chain_store')
+)
+
+# Number of snapshots kept per ticker
+DEFAULT_KEEP_SNAPSHOTS = int(os.environ.get('CHAIN_STORE_KEEP', 10))
+
+# Beyond those, the last snapshot of each of this many trading days is kept,
+# so day-over-day comparisons survive frequent refreshes
+DEFAULT_KEEP_DAYS = int(os.environ.get('CHAIN_STORE_KEEP_DAYS', 30))
+
+# Trading days are dated in exchange time
+MARKET_TIMEZONE = 'America/New_York'
+
+
+def snapshot_date(version):
+    """Trading date ('YYYY-MM-DD') of a snapshot version."""
+    return dt.datetime.fromtimestamp(version / 1e9, ZoneInfo(MARKET_TIMEZONE)).strftime('%Y-%m-%d')
+
+
+class ChainStore:
+    """Option chain snapshots stored as Arrow IPC files.
+
+    Each ticker gets a directory holding one uncompressed ``<version>.arrow``
+    file per snapshot and a ``LATEST`` file naming the current one. Readers
+    memory-map the snapshot, so a chain already in the page cache is served
+    without deserializing it and every worker shares the same physical pages.
+
+    Writes go to a temporary file that is renamed into place, and ``LATEST``
+    is swapped the same way afterwards, so a reader either sees the previous
+    complete snapshot or the new complete one, never a partial file.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_PATH, keep=DEFAULT_KEEP_SNAPSHOTS, keep_days=DEFAULT_KEEP_DAYS):
+        self.root = root
+        self.keep = keep
+        self.keep_days = keep_days
+
+    def _ticker_dir(self, ticker):
+        root = os.path.realpath(self.root)
+        path = os.path.realpath(os.path.join(root, ticker.upper()))
+        # Tickers come from users; one like '../x' must not name a directory
+        # outside the store
+        if os.path.dirname(path) != root:
+            raise ValueError(f"Invalid ticker {ticker!r}")
+        return path
+
+    def _snapshot_path(self, ticker, version):
+        return os.path.join(self._ticker_dir(ticker), f'{version}.arrow')
+
+    @staticmethod
+    def _atomic_write(path, write):
+        directory = os.path.dirname(path)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _extra_path(self, ticker, version, name):
+        return os.path.join(self._ticker_dir(ticker), f'{version}.{name}.arrow')
+
+    def _write_table(self, path, df):
+        table = pa.Table.from_pandas(df)
+
+        def write_table(f):
+            with pa.ipc.new_file(f, table.schema) as writer:
+                writer.write_table(table)
+
+        self._atomic_write(path, write_table)
+
+    def write(self, ticker, df, extras=None):
+        """Persist ``df`` as a new snapshot and return its version.
+
+        ``extras`` maps names to derived DataFrames (analytics and the like)
+        stored alongside the snapshot. They are written before the snapshot
+        becomes current, so a reader of ``LATEST`` always finds them.
+        """
+        os.makedirs(self._ticker_dir(ticker), exist_ok=True)
+        version = time.time_ns()
+        for name, extra in (extras or {}).items():
+            self._write_table(self._extra_path(ticker, version, name), extra)
+        self._write_table(self._snapshot_path(ticker, version), df)
+        self._atomic_write(
+            os.path.join(self._ticker_dir(ticker), 'LATEST'),
+            lambda f: f.write(str(version).encode())
+        )
+        self._prune(ticker)
+        return version
+
+    def latest_version(self, ticker):
+        try:
+            with open(os.path.join(self._ticker_dir(ticker), 'LATEST')) as f:
+                return int(f.read().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def versions(self, ticker):
+        """All stored snapshot versions for ``ticker``, oldest first."""
+        try:
+            names = os.listdir(self._ticker_dir(ticker))
+        except FileNotFoundError:
+            return []
+        return sorted(int(name[:-6]) for name in names
+                      if name.endswith('.arrow') and name[:-6].isdigit())
+
+    def daily_versions(self, ticker):
+        """``[(date, version)]`` with the last stored snapshot of each trading
+        day, oldest first."""
+        last = {}
+        for version in self.versions(ticker):
+            last[snapshot_date(version)] = version
+        return list(last.items())
+
+    def read(self, ticker, version=None):
+        """Memory-map a snapshot (the latest by default) as an Arrow table.
+
+        Returns None when nothing is stored. The table's buffers point into
+        the mapped file, so slicing and column selection copy nothing.
+        """
+        if version is None:
+            version = self.latest_version(ticker)
+            if version is None:
+                return None
+        try:
+            source = pa.memory_map(self._snapshot_path(ticker, version), 'r')
+        except FileNotFoundError:
+            return None
+        return pa.ipc.open_file(source).read_all()
+
+    def read_extra(self, ticker, name, version=None):
+        """Memory-map a table stored with a snapshot via ``write(extras=...)``."""
+        if version is None:
+            version = self.latest_version(ticker)
+            if version is None:
+                return None
+        try:
+            source = pa.memory_map(self._extra_path(ticker, version, name), 'r')
+        except FileNotFoundError:
+            return None
+        return pa.ipc.open_file(source).read_all()
+
+    def snapshot_age(self, ticker):
+        """Seconds since the latest snapshot was written, or None."""
+        version = self.latest_version(ticker)
+        if version is None:
+            return None
+        return time.time() - version / 1e9
+
+    def _prune(self, ticker):
+        # Old snapshots can still be mapped by readers; on POSIX the pages
+        # stay valid until they unmap, so removing the file is safe.
+        daily = {version for _, version in self.daily_versions(ticker)[-self.keep_days:]}
+        stale = {str(version) for version in self.versions(ticker)[:-self.keep] if version not in daily}
+        if not stale:
+            return
+        for name in os.listdir(self._ticker_dir(ticker)):
+            if name.split('.', 1)[0] in stale:
+                try:
+                    os.remove(os.path.join(self._ticker_dir(ticker), name))
+                except FileNotFoundError:
+                    pass
+
+
+def filter_option_type(table, option_type):
+    """Restrict a stored chain table to 'CALL', 'PUT' or 'BOTH'."""
+    if option_type == 'BOTH' or table.num_rows == 0:
+        return table
+    if option_type not in ('CALL', 'PUT'):
+        return table.slice(0, 0)
+    return table.filter(pc.equal(table['Option_Type'], option_type))
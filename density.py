@@ -0,0 +1,232 @@
+"""Risk-neutral densities per expiration (Breeden-Litzenberger).
+
+The density of the underlying at expiry is the discounted second derivative
+of the call price in strike, ``q(K) = exp(rT) d2C/dK2``. Differencing raw
+quotes is far too noisy for that, so each expiration's out-of-the-money
+implied volatilities are first smoothed with a polynomial in log-moneyness.
+Beyond the quoted strikes the polynomial is not trusted: total variance is
+carried on linearly from the edge, with its slope held between flat and
+Lee's moment bound. Call prices are rebuilt from the smile on a grid spaced
+in log-moneyness, densest around the forward, and repaired before
+differencing: the price slopes are clipped to [-discount factor, 0] and made
+non-decreasing (an isotonic fit), so the prices fall with strike and are
+convex and the density is never negative. How many grid points needed
+repair is reported per expiration. All expirations are fitted and priced
+together as 2-D arrays.
+"""
+import market_data
+import pricing
+from cache import Memo
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Degree of the smile polynomial in log-moneyness
+SMILE_DEGREE = 4
+
+# Ridge on the normal equations, relative to their diagonal
+RIDGE = 1e-6
+
+# Strike grid points per expiration
+GRID_POINTS = 200
+
+# The grid reaches at least this many ATM standard deviations either side of
+# the forward, whatever the quoted range
+GRID_STDEVS = 5
+
+# Largest slope of total variance in log-moneyness (Lee's moment formula)
+MAX_WING_SLOPE = 2.0
+
+# Quotes outside this IV range are treated as bad prints
+MIN_IV = 0.01
+MAX_IV = 5.0
+
+# Slack for floating-point noise in the static-arbitrage checks
+ARBITRAGE_TOLERANCE = 1e-6
+
+# Chain snapshots whose densities are kept in memory
+DENSITY_CACHE_SIZE = 64
+
+CURVE_COLUMNS = ['Expiration', 'strike', 'call', 'density', 'cdf']
+SUMMARY_COLUMNS = ['Expiration', 'mass', 'monotonic_violations', 'convexity_violations', 'mean', 'std']
+
+
+def _fit_smiles(codes, x, iv, n_expirations, degree=SMILE_DEGREE):
+    """Least-squares polynomial coefficients of IV in ``x``, one row per
+    expiration, solved as a batch of normal equations."""
+    powers = np.vander(x, degree + 1, increasing=True)
+    lhs = np.zeros((n_expirations, degree + 1, degree + 1))
+    rhs = np.zeros((n_expirations, degree + 1))
+    np.add.at(lhs, codes, powers[:, :, None] * powers[:, None, :])
+    np.add.at(rhs, codes, powers * iv[:, None])
+    # The diagonal runs from the quote count down to sums of x**8, so the
+    # ridge scales with each entry; expirations without quotes solve to zero
+    diagonal = np.arange(degree + 1)
+    lhs[:, diagonal, diagonal] *= 1 + RIDGE
+    lhs[lhs[:, 0, 0] == 0] = np.eye(degree + 1)
+    return np.linalg.solve(lhs, rhs[:, :, None])[:, :, 0]
+
+
+def _polynomial(coefficients, x):
+    # Horner's rule; coefficients are (expiration, power), x (expiration, point)
+    value = np.zeros_like(x)
+    for power in range(coefficients.shape[1] - 1, -1, -1):
+        value = value * x + coefficients[:, power, None]
+    return value
+
+
+def _smile_iv(coefficients, x, x_low, x_high, years):
+    """IV at log-moneyness ``x`` (expiration, point): the fitted smile inside
+    the quoted range [x_low, x_high], linear total variance outside it."""
+    years = years[:, None]
+    edges = np.stack([x_low, x_high], axis=1)
+    edge_iv = np.clip(_polynomial(coefficients, edges), MIN_IV, MAX_IV)
+    derivative = coefficients[:, 1:] * np.arange(1, coefficients.shape[1])
+    # dw/dx = 2 iv iv' T, held flat or rising outwards and within Lee's bound
+    edge_slope = 2 * edge_iv * _polynomial(derivative, edges) * years
+    edge_slope[:, 0] = np.clip(edge_slope[:, 0], -MAX_WING_SLOPE, 0)
+    edge_slope[:, 1] = np.clip(edge_slope[:, 1], 0, MAX_WING_SLOPE)
+
+    inside = np.clip(x, x_low[:, None], x_high[:, None])
+    variance = np.clip(_polynomial(coefficients, inside), MIN_IV, MAX_IV) ** 2 * years
+    variance += np.where(x < inside, edge_slope[:, :1], edge_slope[:, 1:]) * (x - inside)
+    return np.clip(np.sqrt(np.maximum(variance, 0) / years), MIN_IV, MAX_IV)
+
+
+def _log_moneyness_grid(x_low, x_high, scale, points):
+    """``points`` log-moneyness values per expiration covering the quoted
+    range and ``GRID_STDEVS`` ATM deviations, spaced as ``scale * sinh(u)``
+    for uniform ``u``: about ``scale / 40`` apart at the forward, wider in
+    the wings."""
+    low = np.minimum(x_low, -GRID_STDEVS * scale)
+    high = np.maximum(x_high, GRID_STDEVS * scale)
+    steps = np.linspace(0, 1, points)
+    u_low, u_high = np.arcsinh(low / scale), np.arcsinh(high / scale)
+    return scale[:, None] * np.sinh(u_low[:, None] + (u_high - u_low)[:, None] * steps)
+
+
+def _isotonic(values, weights):
+    """Weighted least-squares non-decreasing fit (pool adjacent violators)."""
+    means, sizes, counts = [], [], []
+    for value, weight in zip(values.tolist(), weights.tolist()):
+        means.append(value)
+        sizes.append(weight)
+        counts.append(1)
+        while len(means) > 1 and means[-2] > means[-1]:
+            size = sizes[-2] + sizes[-1]
+            means[-2] = (means[-2] * sizes[-2] + means[-1] * sizes[-1]) / size
+            sizes[-2] = size
+            counts[-2] += counts[-1]
+            del means[-1], sizes[-1], counts[-1]
+    return np.repeat(means, counts)
+
+
+def compute_densities(table, spot, now=None, rate=pricing.RISK_FREE_RATE,
+                      grid_points=GRID_POINTS):
+    """Densities and CDFs for every expiration of a chain table.
+
+    Returns ``(curves, summary)``. ``curves`` has one row per grid strike:
+    Expiration, strike, call (smoothed and repaired price), density and cdf.
+    ``summary`` has one row per expiration: the probability mass inside the
+    quoted strike range, the number of grid points that failed the
+    monotonicity and convexity checks before repair, and the density's mean
+    and standard deviation. Expirations with too few usable quotes are left
+    out.
+    """
+    chain = table.select(['strike', 'impliedVolatility', 'Option_Type',
+                          'Expiration']).to_pandas()
+    codes, expirations = pd.factorize(chain['Expiration'], sort=True)
+    years = pricing.years_to_expiry(np.asarray(expirations), now)
+    forward = spot * np.exp(rate * years)
+
+    strike = chain['strike'].to_numpy(dtype=float)
+    iv = chain['impliedVolatility'].to_numpy(dtype=float)
+    is_call = (chain['Option_Type'] == 'CALL').to_numpy()
+    # Out-of-the-money quotes are the liquid side of each strike
+    otm = np.where(is_call, strike >= forward[codes], strike < forward[codes])
+    usable = otm & (iv > MIN_IV) & (iv < MAX_IV)
+    codes, strike, iv = codes[usable], strike[usable], iv[usable]
+    x = np.log(strike / forward[codes])
+
+    counts = np.bincount(codes, minlength=len(expirations))
+    fitted = counts > SMILE_DEGREE + 2
+    coefficients = _fit_smiles(codes, x, iv, len(expirations))
+
+    x_low = np.full(len(expirations), np.inf)
+    x_high = np.full(len(expirations), -np.inf)
+    np.minimum.at(x_low, codes, x)
+    np.maximum.at(x_high, codes, x)
+    fitted &= x_high > x_low
+
+    expirations = np.asarray(expirations)[fitted]
+    years, forward, coefficients = years[fitted], forward[fitted], coefficients[fitted]
+    x_low, x_high = x_low[fitted], x_high[fitted]
+    if not len(expirations):
+        return pd.DataFrame(columns=CURVE_COLUMNS), pd.DataFrame(columns=SUMMARY_COLUMNS)
+
+    # Axes from here on: (expiration, grid strike)
+    atm_iv = _smile_iv(coefficients, np.zeros((len(expirations), 1)), x_low, x_high, years)[:, 0]
+    grid_x = _log_moneyness_grid(x_low, x_high, atm_iv * np.sqrt(years), grid_points)
+    grid = forward[:, None] * np.exp(grid_x)
+    grid_iv = _smile_iv(coefficients, grid_x, x_low, x_high, years)
+    call = pricing.black_scholes_price(spot, grid, years[:, None], grid_iv, True, rate)
+
+    dk = np.diff(grid, axis=1)
+    slope = np.diff(call, axis=1) / dk
+    discount = np.exp(-rate * years)
+    monotonic_violations = ((slope > ARBITRAGE_TOLERANCE)
+                            | (slope < -discount[:, None] - ARBITRAGE_TOLERANCE)).sum(axis=1)
+    convexity_violations = (np.diff(slope, axis=1) < -ARBITRAGE_TOLERANCE).sum(axis=1)
+
+    # Project the slopes onto falling-and-convex prices and rebuild the
+    # curve from them, anchored at the grid point nearest the forward
+    slope = np.clip(slope, -discount[:, None], 0)
+    slope = np.stack([_isotonic(row, widths) for row, widths in zip(slope, dk)])
+    anchor = np.abs(grid_x).argmin(axis=1)
+    rows = np.arange(len(expirations))
+    integral = np.concatenate([np.zeros((len(expirations), 1)), np.cumsum(slope * dk, axis=1)], axis=1)
+    call = np.maximum(call[rows, anchor][:, None] + integral - integral[rows, anchor][:, None], 0)
+
+    # Probability between the midpoints around each inner strike
+    inner = grid[:, 1:-1]
+    probability = np.diff(slope, axis=1) / discount[:, None]
+    total = probability.sum(axis=1)
+    probability /= np.where(total > 0, total, 1)[:, None]
+    density = probability / ((grid[:, 2:] - grid[:, :-2]) / 2)
+    cdf = np.cumsum(probability, axis=1)
+
+    quoted = (inner >= forward[:, None] * np.exp(x_low)[:, None]) & (inner <= forward[:, None] * np.exp(x_high)[:, None])
+    mass = (probability * quoted).sum(axis=1) * total
+    mean = (inner * probability).sum(axis=1)
+    std = np.sqrt(np.maximum(((inner - mean[:, None]) ** 2 * probability).sum(axis=1), 0))
+
+    n_inner = grid_points - 2
+    curves = pd.DataFrame({
+        'Expiration': np.repeat(expirations, n_inner),
+        'strike': inner.ravel(),
+        'call': call[:, 1:-1].ravel(),
+        'density': density.ravel(),
+        'cdf': cdf.ravel(),
+    })
+    summary = pd.DataFrame({
+        'Expiration': expirations,
+        'mass': mass,
+        'monotonic_violations': monotonic_violations,
+        'convexity_violations': convexity_violations,
+        'mean': mean,
+        'std': std,
+    })
+    return curves, summary
+
+
+_densities = Memo(DENSITY_CACHE_SIZE)
+
+
+def chain_densities(ticker):
+    """``compute_densities`` for the current snapshot of ``ticker``'s chain,
+    memoized per snapshot version."""
+    return _densities.get_or_compute(
+        (ticker.upper(), market_data.chain_version(ticker)),
+        lambda: compute_densities(market_data.load_chain_table(ticker),
+                                  market_data.underlying_price(ticker)))
@@ -0,0 +1,148 @@
+"""Server-side downsampling of price series for charting.
+
+A chart never needs more points than it has horizontal pixels. For each
+fetched history a few resolutions are precomputed with
+Largest-Triangle-Three-Buckets (which keeps the visual shape of a line) and
+cached; a view of any window and zoom level is then served from the coarsest
+resolution that still has about ``TARGET_POINTS`` points inside the visible
+range, or, zoomed in past the finest one, by downsampling the visible slice
+itself, so the payload and the browser's render time stay flat however long
+the history is.
+"""
+import market_data
+from cache import Memo
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+# Points sent to the browser for one view
+TARGET_POINTS = 1000
+
+# Precomputed resolutions, in points over the whole history
+LEVELS = (500, 1000, 2000, 4000, 8000, 16000)
+
+# Histories whose resolutions are kept in memory
+RESOLUTION_CACHE_SIZE = 128
+
+
+def lttb(x, y, n_out):
+    """Indices of ``n_out`` points of (x, y) chosen by Largest-Triangle-Three-
+    Buckets. The first and last points are always kept."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # Bucket boundaries for the n - 2 interior points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # The third vertex is the mean of the next bucket (or the last point)
+        if bucket + 2 < len(edges):
+            next_start, next_end = end, edges[bucket + 2]
+            next_x, next_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def minmax(y, n_buckets):
+    """Indices of the minimum and maximum of ``y`` in each of ``n_buckets``
+    equal buckets, in order. Keeps every spike; fully vectorized."""
+    n = len(y)
+    if 2 * n_buckets >= n:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    size = n // n_buckets
+    usable = size * n_buckets
+    buckets = y[:usable].reshape(n_buckets, size)
+    offsets = np.arange(n_buckets) * size
+    indices = np.concatenate([offsets + buckets.argmin(axis=1), offsets + buckets.argmax(axis=1),
+                              np.arange(usable, n)])
+    return np.unique(indices)
+
+
+class Resolutions:
+    """A series and its precomputed downsampled index sets.
+
+    ``method`` is 'lttb' for price lines or 'minmax' for series where every
+    extreme must stay visible, such as volume.
+    """
+
+    def __init__(self, x, y, levels=LEVELS, method='lttb'):
+        self.x = np.asarray(x)
+        self.y = np.asarray(y, dtype=float)
+        self.method = method
+        self._numeric_x = self.x.astype('datetime64[ns]').astype(np.int64) \
+            if np.issubdtype(self.x.dtype, np.datetime64) else self.x
+        self.levels = {level: self._downsample(0, len(self.y), level)
+                       for level in levels if level < len(self.y)}
+
+    def _downsample(self, low, high, n_out):
+        """Indices into the series of about ``n_out`` points of [low, high)."""
+        if self.method == 'minmax':
+            return low + minmax(self.y[low:high], n_out // 2)
+        return low + lttb(self._numeric_x[low:high], self.y[low:high], n_out)
+
+    def view(self, start=None, end=None, target=TARGET_POINTS):
+        """``(x, y)`` for the window [start, end] (the whole series when
+        omitted) with roughly ``target`` points in it."""
+        low = 0 if start is None else np.searchsorted(self.x, start, side='left')
+        high = len(self.x) if end is None else np.searchsorted(self.x, end, side='right')
+        # Keep one point either side so the line runs to the plot edges
+        low, high = max(low - 1, 0), min(high + 1, len(self.x))
+        fraction = (high - low) / max(len(self.x), 1)
+
+        for level in sorted(self.levels):
+            if level * fraction >= target:
+                chosen = self.levels[level]
+                indices = chosen[(chosen >= low) & (chosen < high)]
+                break
+        else:
+            # Zoomed in past the finest level: downsample the visible slice
+            # itself, which is still small next to the whole series
+            indices = self._downsample(low, high, target) if high - low > target else np.arange(low, high)
+        return self.x[indices], self.y[indices]
+
+
+_resolutions = Memo(RESOLUTION_CACHE_SIZE)
+
+
+def history_resolutions(symbol, days, column='Close', method='lttb'):
+    """Resolutions of ``symbol``'s cached history, built once per fetch."""
+    history, fetched_at = market_data.fetch_history_entry(symbol, days)
+
+    def build():
+        series = history[column].dropna()
+        index = series.index
+        if getattr(index, 'tz', None) is not None:
+            index = index.tz_localize(None)
+        return Resolutions(index.to_numpy(), series.to_numpy(), method=method)
+
+    return _resolutions.get_or_compute((symbol.upper(), days, column, method, fetched_at), build)
+
+
+def view_range(relayout_data):
+    """The visible x range from a ``dcc.Graph`` ``relayoutData`` dict.
+
+    Returns ``(start, end)`` as datetimes, ``(None, None)`` when the chart was
+    reset to the full range, or None when the x axis did not change.
+    """
+    if not relayout_data:
+        return None
+    if relayout_data.get('xaxis.autorange'):
+        return None, None
+    if 'xaxis.range[0]' in relayout_data:
+        bounds = relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']
+    elif 'xaxis.range' in relayout_data:
+        bounds = relayout_data['xaxis.range']
+    else:
+        return None
+    return tuple(np.datetime64(str(bound).replace(' ', 'T')) for bound in bounds)
@@ -0,0 +1,195 @@
+"""Futures forward curves from individual contract months.
+
+Yahoo Finance quotes each listed contract under its own symbol, e.g.
+``CLZ26.NYM`` for December 2026 WTI crude: root, month code, two-digit year
+and exchange. ``contract_symbols`` generates the next listed months for a
+root from its listing cycle in ``ROOTS``; ``build_curve`` fetches their
+histories concurrently through the shared cache and rate limiter and
+assembles
+
+* the forward curve: last close per contract, in delivery order;
+* calendar spreads: near minus next contract, as daily time series.
+
+Contracts Yahoo has no data for (expired, or not yet trading) are skipped
+and later months fetched in their place until the curve is full. The
+assembled curve is cached per root like any other fetch, unless a contract
+failed to fetch (a network or rate-limit error), so a transient failure
+never hides a contract for the cache's lifetime.
+"""
+import datetime as dt
+import itertools
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import market_data
+from lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+
+MONTH_CODES = 'FGHJKMNQUVXZ'
+
+# Exchange suffix Yahoo uses, listed delivery months, and how many contracts
+# make up the curve
+Root = namedtuple('Root', ['exchange', 'months', 'contracts'])
+
+ROOTS = {
+    # Energy
+    'CL': Root('NYM', MONTH_CODES, 12),
+    'BZ': Root('NYM', MONTH_CODES, 12),
+    'NG': Root('NYM', MONTH_CODES, 12),
+    'HO': Root('NYM', MONTH_CODES, 12),
+    'RB': Root('NYM', MONTH_CODES, 12),
+    # Metals
+    'GC': Root('CMX', 'GJMQVZ', 6),
+    'SI': Root('CMX', 'FHKNUZ', 6),
+    'HG': Root('CMX', 'HKNUZ', 5),
+    'PL': Root('NYM', 'FJNV', 4),
+    'PA': Root('NYM', 'HMUZ', 4),
+    # Agriculture
+    'ZC': Root('CBT', 'HKNUZ', 5),
+    'ZW': Root('CBT', 'HKNUZ', 5),
+    'ZS': Root('CBT', 'FHKNQUX', 7),
+    'ZL': Root('CBT', 'FHKNQUVZ', 8),
+    'CT': Root('NYB', 'HKNVZ', 5),
+    'SB': Root('NYB', 'HKNV', 4),
+    'KC': Root('NYB', 'HKNUZ', 5),
+    'CC': Root('NYB', 'HKNUZ', 5),
+    'LE': Root('CME', 'GJMQVZ', 6),
+    'HE': Root('CME', 'GJKMNQVZ', 8),
+    # Indices
+    'ES': Root('CME', 'HMUZ', 4),
+    'NQ': Root('CME', 'HMUZ', 4),
+    'YM': Root('CBT', 'HMUZ', 4),
+    'RTY': Root('CME', 'HMUZ', 4),
+    # Currencies
+    '6E': Root('CME', 'HMUZ', 4),
+    '6J': Root('CME', 'HMUZ', 4),
+    '6B': Root('CME', 'HMUZ', 4),
+    '6A': Root('CME', 'HMUZ', 4),
+    '6C': Root('CME', 'HMUZ', 4),
+    '6S': Root('CME', 'HMUZ', 4),
+    # Interest rates
+    'ZN': Root('CBT', 'HMUZ', 3),
+    'ZF': Root('CBT', 'HMUZ', 3),
+    'ZT': Root('CBT', 'HMUZ', 3),
+    'ZB': Root('CBT', 'HMUZ', 3),
+}
+
+# Concurrent contract fetches; the shared rate limiter still spaces them
+CURVE_WORKERS = int(os.environ.get('CURVE_WORKERS', 16))
+
+CURVE_COLUMNS = ['symbol', 'contract_month', 'last', 'last_date', 'volume']
+
+# Listed months tried beyond the curve's length before giving up on filling it
+EXTRA_CANDIDATES = 12
+
+
+def parse_root(symbol):
+    """The root of a continuous or contract symbol: 'CL=F' and 'cl' give 'CL'."""
+    root = symbol.strip().upper()
+    if root.endswith('=F'):
+        root = root[:-2]
+    if root not in ROOTS:
+        raise ValueError(f"No contract calendar for {symbol}; "
+                         f"curves are available for {', '.join(sorted(ROOTS))}")
+    return root
+
+
+def listed_contracts(root, today=None):
+    """``(symbol, first_of_delivery_month)`` for every listed contract month
+    of ``root`` from the current month on, endlessly."""
+    spec = ROOTS[root]
+    today = today or dt.date.today()
+    year, month = today.year, today.month
+    while True:
+        code = MONTH_CODES[month - 1]
+        if code in spec.months:
+            yield f'{root}{code}{year % 100:02d}.{spec.exchange}', dt.date(year, month, 1)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def contract_symbols(root, count=None, today=None):
+    """``[(symbol, first_of_delivery_month)]`` for the next ``count`` listed
+    contracts of ``root``, starting with the current month."""
+    return list(itertools.islice(listed_contracts(root, today), count or ROOTS[root].contracts))
+
+
+def _fetch(symbol, days):
+    """``(history, error)``: an empty history for a contract without data,
+    or the error of a fetch that failed."""
+    try:
+        return market_data.fetch_history(symbol, days), None
+    except market_data.InvalidSymbol:
+        return pd.DataFrame(), None
+    except Exception as e:
+        return pd.DataFrame(), e
+
+
+def build_curve(root, days=365, count=None):
+    """``(curve, spreads, failed)`` for ``root``.
+
+    ``curve`` has one row per contract with data (``CURVE_COLUMNS``), in
+    delivery order, up to ``count`` contracts: months without data are
+    replaced by later ones, trying at most ``EXTRA_CANDIDATES`` more, while
+    months that failed to fetch are left out.
+    ``spreads`` is indexed by date with one column per adjacent pair,
+    'near-next', holding near minus next close wherever both traded.
+    ``failed`` lists the contracts whose fetch raised.
+    """
+    spec = ROOTS[root]
+    count = count or spec.contracts
+    candidates = listed_contracts(root)
+    rows, closes, failed, errors = [], {}, [], []
+    tried = 0
+    with ThreadPoolExecutor(max_workers=CURVE_WORKERS) as pool:
+        # A failed contract still takes its place, so the curve has a gap
+        # (and goes uncached) rather than silently reaching further out
+        while len(rows) + len(failed) < count and tried < count + EXTRA_CANDIDATES:
+            batch = list(itertools.islice(candidates, min(count - len(rows) - len(failed),
+                                                          count + EXTRA_CANDIDATES - tried)))
+            tried += len(batch)
+            for (symbol, month), (history, error) in zip(
+                    batch, pool.map(lambda contract: _fetch(contract[0], days), batch)):
+                if error is not None:
+                    failed.append(symbol)
+                    errors.append(error)
+                    continue
+                history = history.dropna(subset=['Close']) if not history.empty else history
+                if history.empty:
+                    continue
+                index = history.index
+                if getattr(index, 'tz', None) is not None:
+                    index = index.tz_localize(None)
+                closes[symbol] = pd.Series(history['Close'].to_numpy(), index=index.normalize())
+                rows.append((symbol, month.strftime('%Y-%m'), float(history['Close'].iloc[-1]),
+                             index[-1].strftime('%Y-%m-%d'), float(history['Volume'].iloc[-1])))
+    if not rows:
+        if errors:
+            raise errors[0]
+        raise ValueError(f"No contract data found for {root}")
+
+    curve = pd.DataFrame(rows, columns=CURVE_COLUMNS)
+    symbols = curve['symbol'].tolist()
+    spreads = pd.DataFrame({
+        f'{near}-{far}': (closes[near] - closes[far]).dropna()
+        for near, far in zip(symbols, symbols[1:])
+    })
+    spreads.index.name = 'Date'
+    return curve, spreads, failed
+
+
+def fetch_curve(symbol, days=365):
+    """``(curve, spreads)`` from ``build_curve`` for the root of ``symbol``,
+    cached per root and window like the histories it is built from. A curve
+    missing a contract that failed to fetch is returned but not cached; the
+    contract histories themselves are still shared through the cache."""
+    root = parse_root(symbol)
+    key = ('curve', root, days)
+    cached = market_data.cache.get(key)
+    if cached is not None:
+        return cached
+    curve, spreads, failed = build_curve(root, days)
+    if not failed:
+        market_data.cache.set(key, (curve, spreads), ttl=market_data.HISTORY_TTL)
+    return curve, spreads
@@ -0,0 +1,13 @@
+# gunicorn settings for the dashboard. Used by ``gunicorn -c gunicorn_config.py``
+# and as the defaults for ``python wsgi.py``. Every value can be overridden
+# through the environment.
+import multiprocessing
+import os
+
+bind = os.environ.get('DASH_BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('DASH_THREADS', 4))
+timeout = int(os.environ.get('DASH_TIMEOUT', 120))
+
+# Import the app once in the master and fork workers from it
+preload_app = True
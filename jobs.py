@@ -0,0 +1,535 @@
+"""Durable fetch job queue and the worker pool that drains it.
+
+    python jobs.py enqueue SPY QQQ IWM --history 365
+    python jobs.py enqueue --file watchlist.txt
+    python jobs.py work --processes 4 --threads 4
+    python jobs.py status
+    python jobs.py retry
+
+Jobs live in a SQLite file (``JOB_QUEUE_PATH``), so they survive restarts
+and need no external service. Any number of worker processes, on this host
+or on several hosts sharing the file, claim jobs with a lease. A worker
+renews the leases of the jobs it is running; if it dies or hangs the lease
+runs out and the job is claimed again. A failed job is retried with
+exponential backoff, and after ``JOB_MAX_ATTEMPTS`` attempts it is moved to
+the dead letters, where ``status`` shows the error and ``retry`` requeues it.
+
+A chain job lists the expirations of its ticker and fans out one job per
+expiration, so a large chain is fetched by many workers at once. Each
+expiration is parked in the shared cache; when the last of them finishes,
+an assemble job builds the snapshot and publishes it to the chain store
+exactly as ``market_data.chain_version`` would, so the dashboard and API
+serve it without fetching. History jobs refresh the cached price history
+for a window.
+
+Throughput grows with the number of workers until Yahoo's rate limits or
+the CPU spent building snapshots are reached. ``UPSTREAM_RATE`` and
+``UPSTREAM_MAX_CONCURRENT`` apply per process, so size them per worker. For
+several hosts, put ``JOB_QUEUE_PATH``, ``OPTIONS_CACHE_PATH``,
+``CHAIN_STORE_PATH`` and ``ROLLUP_DB_PATH`` on a filesystem they share, with
+working POSIX locks, and set ``SQLITE_JOURNAL_MODE=DELETE``.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+import market_data
+from cache import LocalConnection
+from lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+
+DEFAULT_QUEUE_PATH = os.environ.get(
+    'JOB_QUEUE_PATH',
+    os.path.join(tempfile.gettempdir(), 'fetch_jobs.sqlite3')
+)
+
+# Seconds a claimed job stays leased without a heartbeat
+LEASE_SECONDS = float(os.environ.get('JOB_LEASE_SECONDS', 120))
+MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+# Delay before the first retry, doubled for each one after
+RETRY_DELAY = float(os.environ.get('JOB_RETRY_DELAY', 5))
+POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', 1))
+WORKER_THREADS = int(os.environ.get('JOB_WORKER_THREADS', 4))
+
+# How long fetched expirations wait in the cache for their chain's assembly
+PART_TTL = 3600
+
+STATES = ['queued', 'leased', 'blocked', 'done', 'dead']
+ACTIVE_STATES = ('queued', 'leased', 'blocked')
+
+# Higher runs first: a ticker's expirations and assembly go ahead of the
+# next ticker, so snapshots are published as the queue drains rather than
+# all at the end
+PRIORITIES = {'chain': 0, 'history': 0, 'expiration': 1, 'assemble': 2}
+
+JobSpec = namedtuple('JobSpec', ['kind', 'ticker', 'params'])
+Job = namedtuple('Job', ['id', 'kind', 'ticker', 'params', 'attempts', 'lease'])
+
+logger = logging.getLogger(__name__)
+
+
+class PermanentFailure(Exception):
+    """Raised by a job that retrying cannot fix; it is dead-lettered at once."""
+
+
+class JobQueue:
+    """Fetch jobs in a SQLite file shared by every worker process.
+
+    Jobs move from queued to leased to done. A leased job whose lease has
+    run out is claimable again; a failed one is queued again after a backoff
+    or, out of attempts, dead. A blocked job is queued once the children
+    pointing at it as their parent have all finished, done or dead.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, max_attempts=MAX_ATTEMPTS, retry_delay=RETRY_DELAY):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        # 'available' is when a queued job may run, or when a leased job's
+        # lease runs out, so one index finds every claimable job
+        self._connection = LocalConnection(path, [
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, ticker TEXT NOT NULL, '
+            'params TEXT NOT NULL, state TEXT NOT NULL, priority INTEGER NOT NULL, '
+            'attempts INTEGER NOT NULL DEFAULT 0, available REAL NOT NULL, '
+            'lease TEXT, worker TEXT, parent INTEGER, pending INTEGER NOT NULL DEFAULT 0, '
+            'error TEXT, created REAL NOT NULL, finished REAL)',
+            'CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (state, priority, available)',
+            'CREATE INDEX IF NOT EXISTS jobs_ticker ON jobs (ticker, kind)',
+        ])
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        # IMMEDIATE takes the write lock up front, so two workers can never
+        # both read a job as claimable
+        conn = self._connection.get()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    @staticmethod
+    def _insert(conn, spec, state, now, parent=None, pending=0):
+        cursor = conn.execute(
+            'INSERT INTO jobs (kind, ticker, params, state, priority, available, parent, pending, created) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (spec.kind, spec.ticker.upper(), json.dumps(spec.params, sort_keys=True), state,
+             PRIORITIES[spec.kind], now, parent, pending, now)
+        )
+        return cursor.lastrowid
+
+    @staticmethod
+    def _settle(conn, job_id, parent, state, error, now):
+        conn.execute('UPDATE jobs SET state = ?, error = ?, finished = ?, lease = NULL WHERE id = ?',
+                     (state, error, now, job_id))
+        if parent is not None:
+            conn.execute("UPDATE jobs SET pending = pending - 1, "
+                         "state = CASE WHEN state = 'blocked' AND pending <= 1 THEN 'queued' ELSE state END, "
+                         "available = ? WHERE id = ?", (now, parent))
+
+    def enqueue(self, specs):
+        """Queue ``specs``, skipping any identical to a job not yet finished.
+        Returns the ids of the jobs added."""
+        now = time.time()
+        ids = []
+        with self._transaction() as conn:
+            for spec in specs:
+                params = json.dumps(spec.params, sort_keys=True)
+                duplicate = conn.execute(
+                    'SELECT 1 FROM jobs WHERE ticker = ? AND kind = ? AND params = ? '
+                    f'AND state IN {ACTIVE_STATES}', (spec.ticker.upper(), spec.kind, params)
+                ).fetchone()
+                if duplicate is None:
+                    ids.append(self._insert(conn, spec, 'queued', now))
+        return ids
+
+    def claim(self, worker, limit=1, lease_seconds=LEASE_SECONDS):
+        """Lease up to ``limit`` runnable jobs to ``worker``."""
+        now = time.time()
+        claimed = []
+        # Idle workers poll; only take the write lock when there is a job
+        runnable = self._connection.get().execute(
+            "SELECT 1 FROM jobs WHERE state IN ('queued', 'leased') AND available <= ? LIMIT 1", (now,)
+        ).fetchone()
+        if runnable is None:
+            return claimed
+        with self._transaction() as conn:
+            # Jobs whose worker died on their last attempt
+            expired = conn.execute(
+                "SELECT id, parent FROM jobs WHERE state = 'leased' AND available <= ? AND attempts >= ?",
+                (now, self.max_attempts)
+            ).fetchall()
+            for job_id, parent in expired:
+                self._settle(conn, job_id, parent, 'dead', 'Lease expired on the last attempt', now)
+
+            rows = conn.execute(
+                "SELECT id, kind, ticker, params, attempts FROM jobs "
+                "WHERE state IN ('queued', 'leased') AND available <= ? "
+                "ORDER BY priority DESC, available LIMIT ?", (now, limit)
+            ).fetchall()
+            for job_id, kind, ticker, params, attempts in rows:
+                lease = uuid.uuid4().hex
+                conn.execute(
+                    "UPDATE jobs SET state = 'leased', attempts = attempts + 1, lease = ?, worker = ?, "
+                    "available = ? WHERE id = ?", (lease, worker, now + lease_seconds, job_id)
+                )
+                claimed.append(Job(job_id, kind, ticker, json.loads(params), attempts + 1, lease))
+        return claimed
+
+    def extend(self, jobs, lease_seconds=LEASE_SECONDS):
+        """Renew the leases of ``jobs``; ids whose lease was lost are returned."""
+        lost = []
+        with self._transaction() as conn:
+            for job in jobs:
+                cursor = conn.execute(
+                    "UPDATE jobs SET available = ? WHERE id = ? AND lease = ? AND state = 'leased'",
+                    (time.time() + lease_seconds, job.id, job.lease)
+                )
+                if cursor.rowcount == 0:
+                    lost.append(job.id)
+        return lost
+
+    def _owned(self, conn, job):
+        return conn.execute(
+            "SELECT parent, attempts FROM jobs WHERE id = ? AND lease = ? AND state = 'leased'",
+            (job.id, job.lease)
+        ).fetchone()
+
+    def complete(self, job, children=(), then=None):
+        """Mark ``job`` done and queue its follow-up work in the same
+        transaction: ``children``, and ``then``, which runs once they have
+        all finished. False if the lease was lost to another worker, in
+        which case nothing is queued."""
+        now = time.time()
+        with self._transaction() as conn:
+            owned = self._owned(conn, job)
+            if owned is None:
+                return False
+            parent = None
+            if then is not None:
+                parent = self._insert(conn, then, 'blocked' if children else 'queued', now,
+                                      pending=len(children))
+            for child in children:
+                self._insert(conn, child, 'queued', now, parent=parent)
+            self._settle(conn, job.id, owned[0], 'done', None, now)
+        return True
+
+    def fail(self, job, error, permanent=False):
+        """Record a failed attempt. The job is queued again after a backoff,
+        or dead-lettered when ``permanent`` or out of attempts. Returns the
+        new state, or None if the lease was lost."""
+        now = time.time()
+        with self._transaction() as conn:
+            owned = self._owned(conn, job)
+            if owned is None:
+                return None
+            parent, attempts = owned
+            if permanent or attempts >= self.max_attempts:
+                self._settle(conn, job.id, parent, 'dead', error, now)
+                return 'dead'
+            conn.execute(
+                "UPDATE jobs SET state = 'queued', lease = NULL, error = ?, available = ? WHERE id = ?",
+                (error, now + self.retry_delay * 2 ** (attempts - 1), job.id)
+            )
+        return 'queued'
+
+    def retry_dead(self, ids=None):
+        """Queue dead jobs again with fresh attempts: all of them, or those in
+        ``ids``. A retried expiration blocks its chain's assembly again.
+        Returns the number requeued."""
+        now = time.time()
+        query = "SELECT id, parent FROM jobs WHERE state = 'dead'"
+        if ids:
+            query += f" AND id IN ({', '.join('?' for _ in ids)})"
+        with self._transaction() as conn:
+            # Parents first, so a retried child's parent ends up blocked
+            rows = conn.execute(query + ' ORDER BY priority DESC', list(ids or ())).fetchall()
+            for job_id, parent in rows:
+                conn.execute(
+                    "UPDATE jobs SET state = 'queued', attempts = 0, available = ?, error = NULL, "
+                    "finished = NULL WHERE id = ?", (now, job_id)
+                )
+                if parent is not None:
+                    conn.execute(
+                        "UPDATE jobs SET pending = pending + 1, "
+                        "state = CASE WHEN state IN ('leased', 'done') THEN state ELSE 'blocked' END "
+                        "WHERE id = ?", (parent,)
+                    )
+        return len(rows)
+
+    def purge(self, older_than=86400):
+        """Delete jobs that finished successfully more than ``older_than``
+        seconds ago. Returns the number deleted."""
+        with self._transaction() as conn:
+            return conn.execute("DELETE FROM jobs WHERE state = 'done' AND finished < ?",
+                                (time.time() - older_than,)).rowcount
+
+    def active(self):
+        """Number of jobs not yet done or dead."""
+        return self._connection.get().execute(
+            f'SELECT COUNT(*) FROM jobs WHERE state IN {ACTIVE_STATES}'
+        ).fetchone()[0]
+
+    def stats(self, window=60):
+        """Job counts by state, and jobs finished in the last ``window``
+        seconds."""
+        conn = self._connection.get()
+        counts = dict.fromkeys(STATES, 0)
+        counts.update(conn.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall())
+        counts['recent'] = conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE state = 'done' AND finished >= ?", (time.time() - window,)
+        ).fetchone()[0]
+        return counts
+
+    def jobs(self, state, limit=20):
+        """The most recent jobs in ``state`` as a DataFrame."""
+        return pd.read_sql_query(
+            'SELECT id, kind, ticker, params, attempts, worker, error, created, finished FROM jobs '
+            'WHERE state = ? ORDER BY id DESC LIMIT ?', self._connection.get(), params=(state, limit)
+        )
+
+
+def _part_key(ticker, batch, expiration):
+    return ('chain-part', ticker, batch, expiration)
+
+
+def run_chain(job):
+    """Fan a chain out into one job per expiration, then an assembly."""
+    expirations = market_data.option_expirations(job.ticker)
+    if not expirations:
+        raise PermanentFailure(f"No options listed for {job.ticker}")
+    batch = job.id
+    children = [JobSpec('expiration', job.ticker, {'batch': batch, 'expiration': expiration})
+                for expiration in expirations]
+    return children, JobSpec('assemble', job.ticker, {'batch': batch, 'expirations': list(expirations)})
+
+
+def run_expiration(job):
+    parts = market_data.download_expiration(job.ticker, job.params['expiration'])
+    market_data.cache.set(_part_key(job.ticker, job.params['batch'], job.params['expiration']),
+                          pd.concat(parts, axis=0), ttl=PART_TTL)
+
+
+def run_assemble(job):
+    keys = [_part_key(job.ticker, job.params['batch'], expiration)
+            for expiration in job.params['expirations']]
+    parts = [market_data.cache.get(key) for key in keys]
+    missing = [key[-1] for key, part in zip(keys, parts) if part is None]
+    if missing:
+        # A partial chain would replace a complete snapshot; keep the old one
+        raise PermanentFailure(f"Expirations not fetched: {', '.join(missing)}")
+    market_data.publish_chain(job.ticker, pd.concat(parts, axis=0))
+    for key in keys:
+        market_data.cache.delete(key)
+
+
+def run_history(job):
+    market_data.refresh_history(job.ticker, job.params['days'])
+
+
+HANDLERS = {
+    'chain': run_chain,
+    'expiration': run_expiration,
+    'assemble': run_assemble,
+    'history': run_history,
+}
+
+
+class Worker:
+    """Runs jobs from ``queue`` on ``threads`` threads until stopped.
+
+    A heartbeat thread renews the leases of the running jobs every third of
+    ``lease_seconds``, so a job is only claimed again when this process dies
+    or hangs.
+    """
+
+    def __init__(self, queue, threads=WORKER_THREADS, lease_seconds=LEASE_SECONDS,
+                 poll_interval=POLL_SECONDS, name=None):
+        self.queue = queue
+        self.threads = threads
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self._running = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._finished = threading.Event()
+
+    def stop(self):
+        """Finish the running jobs, then return from ``run``."""
+        self._stop.set()
+
+    def _heartbeat(self):
+        # Runs until the last job has finished, not just until stop()
+        while not self._finished.wait(self.lease_seconds / 3):
+            with self._lock:
+                running = list(self._running.values())
+            if running:
+                for job_id in self.queue.extend(running, self.lease_seconds):
+                    logger.warning('%s: lost the lease on job %d', self.name, job_id)
+
+    def run_job(self, job):
+        with self._lock:
+            self._running[job.id] = job
+        try:
+            handler = HANDLERS.get(job.kind)
+            if handler is None:
+                raise PermanentFailure(f"Unknown job kind {job.kind!r}")
+            children, then = handler(job) or ((), None)
+        except PermanentFailure as e:
+            self.queue.fail(job, str(e), permanent=True)
+            logger.warning('%s job %d for %s dead-lettered: %s', job.kind, job.id, job.ticker, e)
+        except Exception as e:
+            state = self.queue.fail(job, f'{type(e).__name__}: {e}')
+            logger.warning('%s job %d for %s failed (attempt %d, now %s): %s',
+                           job.kind, job.id, job.ticker, job.attempts, state, e)
+        else:
+            if not self.queue.complete(job, children, then):
+                logger.warning('%s job %d for %s finished after its lease was lost',
+                               job.kind, job.id, job.ticker)
+        finally:
+            with self._lock:
+                self._running.pop(job.id, None)
+
+    def _loop(self, thread, until_idle):
+        name = f'{self.name}:{thread}'
+        while not self._stop.is_set():
+            jobs = self.queue.claim(name, 1, self.lease_seconds)
+            if not jobs:
+                if until_idle and not self.queue.active():
+                    return
+                self._stop.wait(self.poll_interval)
+            for job in jobs:
+                self.run_job(job)
+
+    def run(self, until_idle=False):
+        """Process jobs until ``stop`` is called or, with ``until_idle``,
+        until no job is left to run anywhere."""
+        self._stop.clear()
+        self._finished.clear()
+        heartbeat = threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True)
+        heartbeat.start()
+        threads = [threading.Thread(target=self._loop, args=(i, until_idle), name=f'job-worker-{i}')
+                   for i in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            self.stop()
+            for thread in threads:
+                thread.join()
+        self._stop.set()
+        self._finished.set()
+
+
+def _work(path, threads, lease_seconds, until_idle):
+    worker = Worker(JobQueue(path), threads, lease_seconds)
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    worker.run(until_idle)
+
+
+def run_workers(processes, threads=WORKER_THREADS, path=DEFAULT_QUEUE_PATH,
+                lease_seconds=LEASE_SECONDS, until_idle=False):
+    """Run ``processes`` worker processes of ``threads`` threads each."""
+    if processes == 1:
+        _work(path, threads, lease_seconds, until_idle)
+        return
+    workers = [multiprocessing.Process(target=_work, args=(path, threads, lease_seconds, until_idle),
+                                       name=f'job-worker-{i}')
+               for i in range(processes)]
+    for process in workers:
+        process.start()
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        # The workers got the interrupt too and are finishing their jobs
+        for process in workers:
+            process.join()
+
+
+def print_status(queue):
+    counts = queue.stats()
+    print('  '.join(f'{state}: {counts[state]}' for state in STATES))
+    print(f"finished in the last minute: {counts['recent']}")
+    for state, title in [('leased', 'Running'), ('dead', 'Dead letters')]:
+        jobs = queue.jobs(state)
+        if not jobs.empty:
+            # An assembly lists every expiration
+            jobs['params'] = jobs['params'].str.slice(0, 40)
+            columns = ['id', 'kind', 'ticker', 'params', 'attempts', 'worker']
+            if state == 'dead':
+                columns.append('error')
+            print(f'\n{title}:')
+            print(jobs[columns].to_string(index=False))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--queue', default=DEFAULT_QUEUE_PATH, help='queue database')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    enqueue = commands.add_parser('enqueue', help='queue chain and history fetches')
+    enqueue.add_argument('tickers', nargs='*')
+    enqueue.add_argument('--file', help='file with one ticker per line')
+    enqueue.add_argument('--history', type=int, action='append', default=[], metavar='DAYS',
+                         help='also refresh the price history over this window; repeatable')
+    enqueue.add_argument('--no-chains', action='store_true', help='queue history jobs only')
+
+    work = commands.add_parser('work', help='run workers until interrupted')
+    work.add_argument('--processes', type=int, default=1)
+    work.add_argument('--threads', type=int, default=WORKER_THREADS, help='jobs run at once per process')
+    work.add_argument('--lease', type=float, default=LEASE_SECONDS, help='lease length, seconds')
+    work.add_argument('--until-idle', action='store_true', help='exit once the queue is drained')
+
+    commands.add_parser('status', help='job counts, running jobs and dead letters')
+
+    retry = commands.add_parser('retry', help='requeue dead letters')
+    retry.add_argument('ids', nargs='*', type=int, help='job ids; all dead jobs by default')
+
+    purge = commands.add_parser('purge', help='delete finished jobs')
+    purge.add_argument('--older-than', type=float, default=86400, help='seconds')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(processName)s %(message)s')
+    queue = JobQueue(args.queue)
+    if args.command == 'enqueue':
+        tickers = list(args.tickers)
+        if args.file:
+            from batch_export import read_tickers
+            tickers += read_tickers(args.file)
+        specs = [] if args.no_chains else [JobSpec('chain', ticker, {}) for ticker in tickers]
+        specs += [JobSpec('history', ticker, {'days': days}) for ticker in tickers for days in args.history]
+        added = queue.enqueue(specs)
+        print(f"Queued {len(added)} jobs ({len(specs) - len(added)} already pending)")
+    elif args.command == 'work':
+        run_workers(args.processes, args.threads, args.queue, args.lease, args.until_idle)
+    elif args.command == 'status':
+        print_status(queue)
+    elif args.command == 'retry':
+        print(f"Requeued {queue.retry_dead(args.ids)} jobs")
+    elif args.command == 'purge':
+        print(f"Deleted {queue.purge(args.older_than)} jobs")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
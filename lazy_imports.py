@@ -0,0 +1,22 @@
+"""Deferred imports for heavy libraries.
+
+``pd = lazy_import('pandas')`` binds a stand-in module; the real import runs
+the first time one of its attributes is used. Importing the dashboard then
+costs nothing for pandas, NumPy, pyarrow or yfinance until a callback needs
+them, which keeps worker cold starts short.
+"""
+import importlib
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Stands in for a module until one of its attributes is used."""
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+def lazy_import(name):
+    return LazyModule(name)
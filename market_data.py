@@ -0,0 +1,317 @@
+import datetime as dt
+import logging
+import os
+import re
+import threading
+import time
+
+import analytics
+import memprofile
+import provider
+import rollups
+from cache import Memo, SharedCache
+from chain_index import ChainIndex, build_index, sort_chain
+from chain_store import ChainStore, filter_option_type
+from lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+# How long fetched data stays fresh, in seconds
+HISTORY_TTL = int(os.environ.get('HISTORY_CACHE_TTL', 300))
+CHAIN_TTL = int(os.environ.get('CHAIN_CACHE_TTL', 60))
+# How long data written ahead by the fetch workers (jobs.py) stays fresh. It
+# must outlast the interval between enqueues plus the time a drain takes, or
+# requests fall back to fetching on their own between runs.
+PUBLISHED_TTL = int(os.environ.get('PUBLISHED_CACHE_TTL', 900))
+
+# Stock, index, futures and contract symbols as Yahoo writes them. Symbols
+# name cache keys and chain store directories, so nothing else gets through.
+SYMBOL_PATTERN = re.compile(r'[A-Z0-9^][A-Z0-9.^=-]{0,14}')
+
+# Limits on calls to Yahoo Finance from this process
+UPSTREAM_MAX_CONCURRENT = int(os.environ.get('UPSTREAM_MAX_CONCURRENT', 4))
+UPSTREAM_RATE = float(os.environ.get('UPSTREAM_RATE', 5))
+
+# Chain indexes kept in memory, per (ticker, chain version)
+CHAIN_INDEX_CACHE_SIZE = 32
+
+
+class RateLimiter:
+    """Caps concurrent upstream calls and spaces their starts.
+
+    Use as a context manager around each upstream request. At most
+    ``max_concurrent`` run at once and consecutive starts are at least
+    ``1 / rate`` seconds apart, however many threads are fetching.
+    """
+
+    def __init__(self, max_concurrent=UPSTREAM_MAX_CONCURRENT, rate=UPSTREAM_RATE):
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def __enter__(self):
+        self._slots.acquire()
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_start - now
+            self._next_start = max(now, self._next_start) + self._interval
+        if wait > 0:
+            time.sleep(wait)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._slots.release()
+
+
+class InvalidSymbol(ValueError):
+    """A ticker or symbol that cannot be a Yahoo Finance symbol."""
+
+
+class NoChainError(ValueError):
+    """No options are listed for a ticker."""
+
+
+def validate_symbol(symbol):
+    """``symbol`` stripped and upper-cased; raises InvalidSymbol unless it
+    matches ``SYMBOL_PATTERN``."""
+    normalized = str(symbol or '').strip().upper()
+    if not SYMBOL_PATTERN.fullmatch(normalized):
+        raise InvalidSymbol(f"Invalid symbol {symbol!r}")
+    return normalized
+
+
+# Shared by every fetch in this process
+upstream = RateLimiter()
+
+# One cache shared by every worker process on this host
+cache = SharedCache()
+
+# Option chains live in memory-mapped Arrow files; the cache only tracks
+# which snapshot is current.
+store = ChainStore()
+
+# One row of chain metrics per ticker and day, updated with every snapshot
+daily_rollups = rollups.RollupStore()
+
+
+def _download_history(symbol, days):
+    end_date = dt.datetime.now()
+    start_date = end_date - dt.timedelta(days=days)
+    with upstream:
+        return provider.get_ticker(symbol).history(start=start_date, end=end_date)
+
+
+def fetch_history(symbol, days):
+    """Price history for ``symbol`` over the last ``days`` calendar days."""
+    symbol = validate_symbol(symbol)
+    return cache.get_or_fetch(('history', symbol, days),
+                              lambda: _download_history(symbol, days), ttl=HISTORY_TTL)
+
+
+def refresh_history(symbol, days):
+    """Fetch the history for ``symbol`` from upstream now and cache it, fresh
+    or not. Returns the number of rows."""
+    symbol = validate_symbol(symbol)
+    history = _download_history(symbol, days)
+    cache.set(('history', symbol, days), history, ttl=PUBLISHED_TTL)
+    return len(history)
+
+
+def fetch_history_entry(symbol, days):
+    """``(history, fetched_at)``, where ``fetched_at`` is the Unix time the
+    cached copy was fetched from upstream."""
+    symbol = validate_symbol(symbol)
+    key = ('history', symbol, days)
+    entry = cache.get_entry(key)
+    if entry is not None:
+        return entry
+    df = fetch_history(symbol, days)
+    entry = cache.get_entry(key)
+    return df, entry[1] if entry is not None else time.time()
+
+
+def option_expirations(ticker, stock=None):
+    """Listed expiration dates for ``ticker``, as 'YYYY-MM-DD' strings."""
+    stock = stock or provider.get_ticker(validate_symbol(ticker))
+    with upstream:
+        return tuple(stock.options)
+
+
+def download_expiration(ticker, exp_date, stock=None):
+    """``[calls, puts]`` for one expiration, tagged with Option_Type and
+    Expiration."""
+    stock = stock or provider.get_ticker(validate_symbol(ticker))
+    with upstream:
+        opt_chain = stock.option_chain(exp_date)
+
+    calls = opt_chain.calls
+    calls['Option_Type'] = 'CALL'
+    calls['Expiration'] = exp_date
+
+    puts = opt_chain.puts
+    puts['Option_Type'] = 'PUT'
+    puts['Expiration'] = exp_date
+    return [calls, puts]
+
+
+def _download_option_chain(ticker):
+    stock = provider.get_ticker(ticker)
+    options_data = []
+    with memprofile.stage('download'):
+        for exp_date in option_expirations(ticker, stock):
+            options_data.extend(download_expiration(ticker, exp_date, stock))
+
+    if not options_data:
+        return pd.DataFrame()
+    with memprofile.stage('concat'):
+        return pd.concat(options_data, axis=0)
+
+
+def chain_version(ticker):
+    """Current snapshot version of the chain for ``ticker``.
+
+    Fetches and stores a new snapshot when the current one is older than
+    ``CHAIN_TTL``. The full chain is stored regardless of the option type
+    asked for, so CALL and PUT requests for a ticker share one fetch. The
+    chain is stored sorted by (Expiration, Option_Type, strike), and its
+    block index and analytics are computed once here and stored with it. The
+    day's rollup row is updated from the same chain.
+
+    Raises InvalidSymbol for a malformed ticker and NoChainError when no
+    options are listed, in which case nothing is stored.
+    """
+    ticker = validate_symbol(ticker)
+    return cache.get_or_fetch(('chain', ticker.upper()),
+                              lambda: _store_chain(ticker, _download_option_chain(ticker)), ttl=CHAIN_TTL)
+
+
+def _store_chain(ticker, chain):
+    if chain.empty:
+        # Any earlier snapshot stays current; junk tickers leave no trace
+        raise NoChainError(f"No options data found for {ticker}")
+    chain = sort_chain(chain)
+    extras = analytics.compute_chain_analytics(chain)
+    extras['chain_index'] = build_index(chain)
+    version = store.write(ticker, chain, extras=extras)
+    try:
+        _record_rollup(ticker, chain, extras, version)
+    except Exception:
+        # The rollup is derived data that backfill can rebuild; a failure
+        # (spot lookup, locked database) must not fail the download
+        logger.exception('Daily rollup for %s snapshot %d not recorded', ticker, version)
+    return version
+
+
+def publish_chain(ticker, chain):
+    """Store ``chain``, fetched elsewhere (e.g. by the job workers), as the
+    current snapshot for ``ticker``, exactly as ``chain_version`` would have.
+    It stays current for ``PUBLISHED_TTL`` rather than ``CHAIN_TTL``, so it is
+    served until the next scheduled fetch replaces it. Returns the new
+    version."""
+    ticker = validate_symbol(ticker)
+    version = _store_chain(ticker, chain)
+    cache.set(('chain', ticker.upper()), version, ttl=PUBLISHED_TTL)
+    return version
+
+
+def _record_rollup(ticker, chain, extras, version):
+    if chain.empty:
+        return
+    spot = spot_price(ticker)
+    if spot is None:
+        expected_move = extras.get('expected_move')
+        if expected_move is None or expected_move.empty:
+            return
+        spot = float(expected_move['underlying'].iloc[0])
+    now = pd.Timestamp(version, unit='ns', tz='UTC')
+    daily_rollups.record(ticker, version, rollups.compute_rollup(chain, spot, now))
+
+
+def load_rollups(ticker, start=None, end=None):
+    """Daily rollups for ``ticker`` (see ``rollups.COLUMNS``), indexed by date."""
+    return daily_rollups.history(ticker, start, end)
+
+
+def load_chain_table(ticker):
+    """The current chain for ``ticker`` as a memory-mapped Arrow table."""
+    table = store.read(ticker, chain_version(ticker))
+    if table is None:
+        # The snapshot was pruned or the store wiped under us; refetch.
+        cache.delete(('chain', ticker.upper()))
+        table = store.read(ticker, chain_version(ticker))
+    return table
+
+
+_chain_indexes = Memo(CHAIN_INDEX_CACHE_SIZE)
+
+
+def load_chain_index(ticker):
+    """A ChainIndex over the current chain snapshot for ``ticker``.
+
+    Built once per snapshot and kept per (ticker, version), so repeat lookups
+    skip reading the stored block index until a new snapshot is stored.
+    """
+    version = chain_version(ticker)
+    index = _chain_indexes.get((ticker.upper(), version))
+    if index is not None:
+        return index
+    table = store.read(ticker, version)
+    blocks = store.read_extra(ticker, 'chain_index', version)
+    if table is None or blocks is None:
+        cache.delete(('chain', ticker.upper()))
+        version = chain_version(ticker)
+        table = store.read(ticker, version)
+        blocks = store.read_extra(ticker, 'chain_index', version)
+    index = ChainIndex(table, blocks.to_pandas())
+    _chain_indexes.put((ticker.upper(), version), index)
+    return index
+
+
+def spot_price(ticker):
+    """Latest close for ``ticker`` from the (cached) recent price history."""
+    history = fetch_history(ticker, 7)
+    if history.empty:
+        return None
+    return float(history['Close'].iloc[-1])
+
+
+def fetch_option_chain(ticker, option_type='BOTH', strikes_around_spot=None):
+    """Calls, puts or both for every listed expiration as a DataFrame.
+
+    With ``strikes_around_spot`` set, only that many strikes either side of
+    the current price are kept per expiration, looked up through the chain
+    index. Filtering runs on the mapped Arrow table, so only the selected
+    rows are converted to pandas.
+    """
+    if strikes_around_spot:
+        spot = spot_price(ticker)
+        if spot is not None:
+            index = load_chain_index(ticker)
+            return index.around_spot_all(spot, int(strikes_around_spot), option_type).to_pandas()
+    return filter_option_type(load_chain_table(ticker), option_type).to_pandas()
+
+
+def load_chain_analytics(ticker):
+    """Analytics tables stored with the current chain snapshot, as DataFrames."""
+    version = chain_version(ticker)
+    results = {}
+    for name in analytics.ANALYTICS_TABLES:
+        table = store.read_extra(ticker, name, version)
+        if table is not None:
+            results[name] = table.to_pandas()
+    return results
+
+
+def underlying_price(ticker):
+    """Spot price for pricing ``ticker``'s options: the latest close, or the
+    put-call parity estimate from the chain when there is no price history."""
+    spot = spot_price(ticker)
+    if spot is None:
+        expected_move = load_chain_analytics(ticker).get('expected_move')
+        if expected_move is None or expected_move.empty:
+            raise ValueError(f"No underlying price available for {ticker}")
+        spot = float(expected_move['underlying'].iloc[0])
+    return spot
@@ -0,0 +1,227 @@
+"""Opt-in memory profiling of callback requests.
+
+Set ``MEMORY_PROFILE=1`` to trace every Dash callback request with
+``tracemalloc`` and a background RSS sampler. Code marks its stages with
+
+    with memprofile.stage('serialize'):
+        csv = df.to_csv()
+
+and for each request and stage the peak traced allocation and the peak RSS
+are added to the shared metrics table, so the aggregates cover every worker.
+Stages nest; a stage inside 'fetch' is recorded as 'fetch/concat'. Requests
+slower than ``MEMORY_PROFILE_SLOW_SECONDS`` or allocating more than
+``MEMORY_PROFILE_LARGE_MB`` log their top allocation sites. ``/debug/memory``
+returns the aggregates.
+
+tracemalloc and RSS are per process, so with several threads per worker a
+stage's peak includes whatever the other threads allocated meanwhile; run
+with one thread per worker for exact attribution. Tracing makes callbacks
+several times slower, so leave it off in normal operation.
+"""
+import contextlib
+import logging
+import os
+import resource
+import threading
+import time
+import tracemalloc
+
+ENABLED = os.environ.get('MEMORY_PROFILE', '0') == '1'
+
+# Requests over either limit log their top allocation sites
+SLOW_SECONDS = float(os.environ.get('MEMORY_PROFILE_SLOW_SECONDS', 5))
+LARGE_BYTES = float(os.environ.get('MEMORY_PROFILE_LARGE_MB', 100)) * 1024 * 1024
+TOP_SITES = int(os.environ.get('MEMORY_PROFILE_TOP', 10))
+
+RSS_SAMPLE_SECONDS = 0.01
+
+logger = logging.getLogger(__name__)
+
+
+def current_rss():
+    """Resident set size of this process in bytes."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # No procfs (macOS): fall back to the process-lifetime peak
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RssSampler:
+    """Samples RSS in a daemon thread and tracks the peak for each open window."""
+
+    def __init__(self, interval=RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self._windows = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _run(self):
+        while True:
+            rss = current_rss()
+            with self._lock:
+                for window, peak in self._windows.items():
+                    if rss > peak:
+                        self._windows[window] = rss
+            time.sleep(self.interval)
+
+    def open(self):
+        # Threads do not survive a fork, so each worker starts its own
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+            self._thread.start()
+        window = object()
+        with self._lock:
+            self._windows[window] = current_rss()
+        return window
+
+    def close(self, window):
+        rss = current_rss()
+        with self._lock:
+            return max(self._windows.pop(window), rss)
+
+
+sampler = RssSampler()
+
+_local = threading.local()
+
+
+class _Stage:
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.start_traced = tracemalloc.get_traced_memory()[0]
+        # Peak seen before a nested stage reset the tracemalloc peak
+        self.peak_before_reset = 0
+        self.rss_window = sampler.open()
+        self.snapshot = None
+        self.snapshot_retained = 0
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Record peak memory for the enclosed block of the current request.
+
+    A no-op outside a profiled request.
+    """
+    stack = getattr(_local, 'stack', None)
+    if not stack:
+        yield
+        return
+
+    parent = stack[-1]
+    parent.peak_before_reset = max(parent.peak_before_reset, tracemalloc.get_traced_memory()[1])
+    current = _Stage(f'{parent.name}/{name}' if len(stack) > 1 else name)
+    tracemalloc.reset_peak()
+    stack.append(current)
+    try:
+        yield
+    finally:
+        stack.pop()
+        absolute, _ = _finish(current, stack[0])
+        # The parent's peak includes this stage's
+        parent.peak_before_reset = max(parent.peak_before_reset, absolute)
+
+
+def _finish(current, request):
+    """Record a finished stage; returns its absolute peak traced memory and
+    the peak relative to where it started."""
+    traced, peak = tracemalloc.get_traced_memory()
+    absolute = max(peak, current.peak_before_reset)
+    peak = absolute - current.start_traced
+    retained = traced - current.start_traced
+    rss = sampler.close(current.rss_window)
+    # Only reached while profiling, so the data layer never pulls in Flask
+    import metrics
+    if current is not request and peak > LARGE_BYTES and retained > request.snapshot_retained:
+        # The allocation sites are visible while the stage's result is
+        # alive; keep those of the stage that retained the most
+        request.snapshot = tracemalloc.take_snapshot()
+        request.snapshot_retained = retained
+    metrics.metrics.observe(f'memory:{request.label}:{current.name}:peak', peak)
+    metrics.metrics.observe(f'memory:{request.label}:{current.name}:rss', rss)
+    return absolute, peak
+
+
+def _top_sites(snapshot):
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ])
+    return [f'{stat.size / 1e6:9.1f} MB {stat.count:8d} blocks  {stat.traceback[0]}'
+            for stat in snapshot.statistics('lineno')[:TOP_SITES]]
+
+
+def start_request(label):
+    request = _Stage('request')
+    request.label = label
+    tracemalloc.reset_peak()
+    _local.stack = [request]
+
+
+def end_request():
+    stack = getattr(_local, 'stack', None)
+    if not stack:
+        return
+    request = stack[0]
+    _local.stack = None
+    elapsed = time.perf_counter() - request.started
+    _, peak = _finish(request, request)
+    if elapsed > SLOW_SECONDS or peak > LARGE_BYTES:
+        snapshot = request.snapshot or tracemalloc.take_snapshot()
+        logger.warning('%s: %.1fs, peak %.1f MB traced; top allocation sites:\n%s',
+                       request.label, elapsed, peak / 1e6, '\n'.join(_top_sites(snapshot)))
+
+
+def summary(snapshot):
+    """``{request: {stage: {count, mean_peak, max_peak, max_rss}}}`` from a
+    metrics snapshot."""
+    result = {}
+    for name, values in snapshot.items():
+        if not name.startswith('memory:'):
+            continue
+        # The request label may itself contain colons
+        label, stage_name, measure = name[len('memory:'):].rsplit(':', 2)
+        entry = result.setdefault(label, {}).setdefault(stage_name, {'count': values['count']})
+        if measure == 'peak':
+            entry['mean_peak'] = values['mean']
+            entry['max_peak'] = values['max']
+        else:
+            entry['max_rss'] = values['max']
+    return result
+
+
+def instrument(server):
+    """Profile callback requests and add ``/debug/memory``."""
+    from flask import g, jsonify
+
+    import metrics
+
+    # One frame per allocation: sites are reported by line, and every extra
+    # frame slows tracing further
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    @server.before_request
+    def start_profile():
+        name = metrics.request_name()
+        if name is not None and name.startswith('callback:'):
+            start_request(name)
+            g.memory_profiled = True
+
+    @server.teardown_request
+    def end_profile(exc):
+        # After the response body is built, so JSON encoding is included
+        if g.get('memory_profiled'):
+            end_request()
+
+    @server.route('/debug/memory')
+    def debug_memory():
+        traced, peak = tracemalloc.get_traced_memory()
+        return jsonify({
+            'process': {'pid': os.getpid(), 'rss': current_rss(), 'traced': traced},
+            'requests': summary(metrics.metrics.snapshot()),
+        })
@@ -0,0 +1,102 @@
+"""Opt-in request metrics shared by all worker processes.
+
+Set ``DASH_METRICS=1`` to record, for every Dash callback request and page
+load, a count and latency in the shared SQLite file, and to expose the totals
+at ``/debug/metrics``.
+"""
+import os
+import time
+
+from flask import g, jsonify, request
+
+from cache import DEFAULT_CACHE_PATH, LocalConnection
+
+ENABLED = os.environ.get('DASH_METRICS', '0') == '1'
+
+
+class Metrics:
+    """Named counters with total and max, aggregated across processes."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self._connection = LocalConnection(path, [
+            'CREATE TABLE IF NOT EXISTS metrics ('
+            'name TEXT PRIMARY KEY, count INTEGER NOT NULL, '
+            'total REAL NOT NULL, max REAL NOT NULL)'
+        ])
+
+    def observe(self, name, value=0.0, count=1):
+        self._connection.get().execute(
+            'INSERT INTO metrics (name, count, total, max) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT(name) DO UPDATE SET count = count + excluded.count, '
+            'total = total + excluded.total, max = MAX(max, excluded.max)',
+            (name, count, value, value)
+        )
+
+    def snapshot(self):
+        rows = self._connection.get().execute(
+            'SELECT name, count, total, max FROM metrics ORDER BY name'
+        ).fetchall()
+        return {
+            name: {'count': count, 'total': total, 'mean': total / count if count else 0.0, 'max': peak}
+            for name, count, total, peak in rows
+        }
+
+    def reset(self):
+        self._connection.get().execute('DELETE FROM metrics')
+
+
+metrics = Metrics()
+
+
+def request_name():
+    if request.path.endswith('/_dash-update-component'):
+        payload = request.get_json(silent=True) or {}
+        return 'callback:' + str(payload.get('output', 'unknown'))
+    if request.path == '/':
+        return 'page_load'
+    return None
+
+
+def instrument(server):
+    """Record callback and page-load timings and add ``/debug/metrics``."""
+
+    @server.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @server.after_request
+    def record(response):
+        name = request_name()
+        if name is not None and hasattr(g, 'metrics_started'):
+            metrics.observe(name, time.perf_counter() - g.metrics_started)
+        return response
+
+    @server.route('/debug/metrics')
+    def debug_metrics():
+        snapshot = metrics.snapshot()
+        callbacks = sum(v['count'] for k, v in snapshot.items() if k.startswith('callback:'))
+        page_loads = snapshot.get('page_load', {}).get('count', 0)
+        return jsonify({
+            'metrics': snapshot,
+            'callbacks_per_page_load': callbacks / page_loads if page_loads else None,
+            'downloads': download_summary(snapshot),
+        })
+
+
+def download_summary(snapshot):
+    """Per download kind: hit rate and mean serving time of cached payloads
+    against freshly serialized ones (see ``payload_cache``)."""
+    summary = {}
+    for name, values in snapshot.items():
+        if name.startswith('download:'):
+            _, kind, outcome = name.split(':')
+            summary.setdefault(kind, {})[outcome] = values
+    for kind, outcomes in summary.items():
+        cached = outcomes.get('cached', {'count': 0, 'mean': None})
+        fresh = outcomes.get('fresh', {'count': 0, 'mean': None})
+        summary[kind] = {
+            'hit_rate': cached['count'] / (cached['count'] + fresh['count']),
+            'cached_mean': cached['mean'],
+            'fresh_mean': fresh['mean'],
+        }
+    return summary
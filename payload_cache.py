@@ -0,0 +1,96 @@
+"""Cache of encoded download payloads.
+
+A download callback spends most of its time in ``df.to_csv`` and the base64
+encoding inside ``dcc.send_data_frame``, yet for a given data snapshot and
+set of filters the result is identical for every user and every click. This
+keeps the finished payload dicts, keyed by the snapshot version and the
+request parameters, so a repeat download is a dictionary lookup.
+
+Entries are grouped by scope (e.g. ``('options', 'SPY')``). When a request
+arrives with a newer version for its scope, every entry of that scope built
+from an older version is dropped. The total size of the cached payloads is
+bounded by ``DOWNLOAD_CACHE_BYTES`` per process, least recently used first.
+
+With ``DASH_METRICS=1`` each download records its serving time under
+``download:<kind>:cached`` or ``download:<kind>:fresh``.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+DOWNLOAD_CACHE_BYTES = int(os.environ.get('DOWNLOAD_CACHE_BYTES', 256 * 1024 * 1024))
+
+
+def payload_size(payload):
+    return len(payload.get('content') or '')
+
+
+class PayloadCache:
+    """Size-bounded LRU of download payloads, invalidated per scope."""
+
+    def __init__(self, max_bytes=DOWNLOAD_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def _drop(self, key):
+        self.size -= payload_size(self._entries.pop(key))
+
+    def _lookup(self, scope, version, key):
+        with self._lock:
+            current = self._versions.get(scope)
+            if current is None or version > current:
+                self._versions[scope] = version
+                for stale in [k for k in self._entries if k[0] == scope]:
+                    self._drop(stale)
+            full_key = (scope, version, key)
+            if full_key in self._entries:
+                self._entries.move_to_end(full_key)
+                return self._entries[full_key]
+        return None
+
+    def _store(self, scope, version, key, payload):
+        size = payload_size(payload)
+        with self._lock:
+            # A request that raced a newer snapshot is served but not kept
+            if size > self.max_bytes or self._versions.get(scope) != version:
+                return
+            full_key = (scope, version, key)
+            if full_key in self._entries:
+                self._drop(full_key)
+            self._entries[full_key] = payload
+            self.size += size
+            while self.size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def get_or_build(self, scope, version, key, build):
+        """The payload for ``key`` at ``version`` of ``scope``, calling
+        ``build()`` on a miss. A None from ``build`` is returned but not
+        cached."""
+        started = time.perf_counter()
+        payload = self._lookup(scope, version, key)
+        outcome = 'cached'
+        if payload is None:
+            outcome = 'fresh'
+            payload = build()
+            if payload is None:
+                return None
+            self._store(scope, version, key, payload)
+        if metrics.ENABLED:
+            metrics.metrics.observe(f'download:{scope[0]}:{outcome}', time.perf_counter() - started)
+        return payload
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self.size = 0
+
+
+# Shared by every download callback in this process
+payloads = PayloadCache()
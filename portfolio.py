@@ -0,0 +1,195 @@
+"""Portfolio Greeks from an uploaded position file.
+
+A position file is a CSV with a contract symbol column (``contractSymbol``,
+``symbol`` or ``contract``) and a quantity column (``quantity``, ``qty`` or
+``position``); negative quantities are short. Contract symbols must be OCC
+symbols (root, YYMMDD, C or P, strike x 1000 in eight digits), and a file
+with any other symbol is rejected; rows with a blank or non-numeric quantity
+are left out and reported. Positions are joined against
+the cached chain of their underlying through a hash index on
+``contractSymbol``, and Greeks for each chain snapshot are computed once and
+reused, so re-aggregating a book is an index lookup and a groupby.
+"""
+import base64
+import io
+import re
+
+import market_data
+import pricing
+from cache import Memo
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+CONTRACT_MULTIPLIER = 100
+GREEKS = ['delta', 'gamma', 'vega', 'theta']
+
+SYMBOL_COLUMNS = ['contractSymbol', 'symbol', 'contract']
+QUANTITY_COLUMNS = ['quantity', 'qty', 'position']
+
+# Root, expiration (YYMMDD), right and strike x 1000, e.g. SPY250317C00525000
+OCC_PATTERN = re.compile(r'(?P<root>[A-Z][A-Z0-9.]{0,5})(?P<expiry>\d{6})(?P<right>[CP])(?P<strike>\d{8})')
+
+# Errors that mean an underlying's chain could not be had, as opposed to bugs
+FETCH_ERRORS = (market_data.NoChainError, market_data.InvalidSymbol, OSError)
+
+# Chain snapshots whose Greeks are kept in memory
+GREEKS_CACHE_SIZE = 64
+
+
+def _find_column(columns, candidates, what):
+    lookup = {column.strip().lower(): column for column in columns}
+    for candidate in candidates:
+        if candidate.lower() in lookup:
+            return lookup[candidate.lower()]
+    raise ValueError(f"Position file needs a {what} column ({', '.join(candidates)})")
+
+
+def read_positions(buffer):
+    """Parse a position CSV into (contractSymbol, quantity), netting duplicates.
+
+    Returns ``(positions, rejected)``: ``rejected`` lists ``(contractSymbol,
+    reason)`` for each row left out because its quantity is blank or not a
+    number.
+    """
+    df = pd.read_csv(buffer, dtype=str, keep_default_na=False)
+    symbol = _find_column(df.columns, SYMBOL_COLUMNS, 'contract symbol')
+    quantity = _find_column(df.columns, QUANTITY_COLUMNS, 'quantity')
+    positions = pd.DataFrame({
+        'contractSymbol': df[symbol].str.strip().str.upper(),
+        'quantity': pd.to_numeric(df[quantity].str.strip(), errors='coerce'),
+    })
+    malformed = positions.loc[~positions['contractSymbol'].str.fullmatch(OCC_PATTERN.pattern),
+                              'contractSymbol']
+    if not malformed.empty:
+        raise ValueError(f"Not OCC contract symbols: {', '.join(malformed.unique()[:10])}")
+
+    invalid = positions['quantity'].isna()
+    rejected = [(contract, f"quantity {raw.strip()!r} is not a number" if raw.strip() else "no quantity")
+                for contract, raw in zip(positions.loc[invalid, 'contractSymbol'], df.loc[invalid, quantity])]
+    positions = positions[~invalid]
+    return positions.groupby('contractSymbol', as_index=False, sort=False)['quantity'].sum(), rejected
+
+
+def parse_upload(contents, filename):
+    """Parse the ``contents`` string of a ``dcc.Upload`` (a base64 data URL)
+    as ``read_positions`` does."""
+    if not filename.lower().endswith(('.csv', '.txt')):
+        raise ValueError("Upload a CSV file of positions")
+    _, content_string = contents.split(',', 1)
+    return read_positions(io.StringIO(base64.b64decode(content_string).decode('utf-8')))
+
+
+def underlying_of(symbols):
+    """OCC root of each contract symbol; NaN where a symbol is not OCC."""
+    return symbols.str.extract(OCC_PATTERN.pattern, expand=True)['root']
+
+
+class ChainGreeks:
+    """Greeks for every contract in one chain snapshot, hash-indexed by symbol.
+
+    The pricing inputs (``strike``, ``years``, ``vol``, ``is_call``) are kept
+    alongside so other tools can reprice the same contracts. Contracts the
+    chain quotes no implied volatility for are not priced: their ``vol`` and
+    Greeks are NaN and ``priced`` is False.
+    """
+
+    def __init__(self, symbols, strike, years, vol, is_call, spot):
+        self.index = pd.Index(symbols)
+        self.strike = strike
+        self.years = years
+        self.vol = vol
+        self.is_call = is_call
+        self.spot = spot
+        self.priced = ~np.isnan(vol)
+        result = pricing.black_scholes(spot, strike, years, vol, is_call)
+        self.greeks = np.column_stack([result[name] for name in GREEKS])
+
+    @classmethod
+    def from_table(cls, table, spot, now=None):
+        chain = table.select(['contractSymbol', 'strike', 'impliedVolatility',
+                              'Option_Type', 'Expiration']).to_pandas()
+        return cls(
+            chain['contractSymbol'].to_numpy(),
+            chain['strike'].to_numpy(),
+            pricing.years_to_expiry(chain['Expiration'].to_numpy(), now),
+            chain['impliedVolatility'].to_numpy(dtype=float),
+            (chain['Option_Type'] == 'CALL').to_numpy(),
+            spot,
+        )
+
+    def lookup(self, symbols):
+        """Row positions of ``symbols`` in the chain; -1 where missing."""
+        return self.index.get_indexer(symbols)
+
+
+_greeks = Memo(GREEKS_CACHE_SIZE)
+
+
+def chain_greeks(ticker):
+    """ChainGreeks for the current snapshot of ``ticker``'s chain, memoized
+    per snapshot version."""
+    return _greeks.get_or_compute(
+        (ticker.upper(), market_data.chain_version(ticker)),
+        lambda: ChainGreeks.from_table(market_data.load_chain_table(ticker),
+                                       market_data.underlying_price(ticker)))
+
+
+def position_greeks(positions):
+    """Per-position dollar Greeks.
+
+    Returns ``(greeks, skipped)``: ``positions`` plus underlying, spot,
+    quantity-weighted delta/gamma/vega/theta, with NaN for contracts that are
+    not matched or not priced, and ``unpriced``, True for contracts in the
+    chain without an implied volatility; and a dict of underlying -> error
+    for underlyings whose chain could not be fetched.
+    """
+    positions = positions.reset_index(drop=True)
+    underlying = underlying_of(positions['contractSymbol'])
+    exposures = np.full((len(positions), len(GREEKS)), np.nan)
+    spots = np.full(len(positions), np.nan)
+    unpriced = np.zeros(len(positions), dtype=bool)
+    skipped = {}
+
+    for ticker, rows in positions.groupby(underlying, sort=False).indices.items():
+        try:
+            greeks = chain_greeks(ticker)
+        except FETCH_ERRORS as e:
+            skipped[ticker] = str(e)
+            continue
+        found = greeks.lookup(positions['contractSymbol'].to_numpy()[rows])
+        matched = found >= 0
+        exposures[rows[matched]] = greeks.greeks[found[matched]]
+        unpriced[rows[matched]] = ~greeks.priced[found[matched]]
+        spots[rows] = greeks.spot
+
+    exposures *= (positions['quantity'].to_numpy() * CONTRACT_MULTIPLIER)[:, None]
+    result = positions.assign(underlying=underlying.to_numpy(), spot=spots)
+    for column, name in enumerate(GREEKS):
+        result[name] = exposures[:, column]
+    result['unpriced'] = unpriced
+    return result, skipped
+
+
+def aggregate(positions):
+    """Greeks per underlying plus a 'TOTAL' row for the whole book.
+
+    Returns ``(summary, unmatched, unpriced, skipped)``: ``unmatched`` lists
+    contract symbols not found in their underlying's current chain,
+    ``unpriced`` those found but quoted without an implied volatility (left
+    out of the totals rather than priced at zero vol), and ``skipped`` maps
+    each underlying whose chain could not be fetched to the error and the
+    contract symbols left out because of it.
+    """
+    greeks, errors = position_greeks(positions)
+    matched = greeks['delta'].notna()
+    fetched = ~greeks['underlying'].isin(list(errors))
+    unpriced = greeks['unpriced']
+    summary = greeks[matched].groupby('underlying', sort=True)[GREEKS].sum()
+    summary['positions'] = greeks[matched].groupby('underlying').size()
+    summary.loc['TOTAL'] = summary.sum()
+    skipped = {ticker: (error, greeks.loc[greeks['underlying'] == ticker, 'contractSymbol'].tolist())
+               for ticker, error in errors.items()}
+    return (summary.reset_index(), greeks.loc[~matched & fetched & ~unpriced, 'contractSymbol'].tolist(),
+            greeks.loc[unpriced, 'contractSymbol'].tolist(), skipped)
@@ -0,0 +1,100 @@
+"""Vectorized Black-Scholes pricing and Greeks.
+
+Yahoo Finance chains carry implied volatilities but no Greeks, so Greeks are
+computed here from strike, expiry, IV and the underlying price. Every
+function takes NumPy arrays (or scalars) and broadcasts, so a whole chain,
+or a chain across a grid of scenarios, is priced in one call.
+"""
+import os
+
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+RISK_FREE_RATE = float(os.environ.get('RISK_FREE_RATE', 0.04))
+
+# Contracts expire at the 4pm New York close, 21:00 UTC for most of the year
+EXPIRY_HOUR_UTC = 21
+
+# Floors that keep d1/d2 finite for expired contracts and zero-IV quotes
+MIN_TIME = 1.0 / (365 * 24)
+MIN_VOL = 1e-4
+
+
+def norm_pdf(x):
+    return np.exp(-0.5 * x * x) / np.sqrt(2 * np.pi)
+
+
+def norm_cdf(x):
+    # erfc from Numerical Recipes (fractional error below 1.2e-7), which
+    # unlike math.erf works on whole arrays
+    z = np.abs(x) / np.sqrt(2)
+    t = 1.0 / (1.0 + 0.5 * z)
+    erfc = t * np.exp(-z * z - 1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (
+        0.09678418 + t * (-0.18628806 + t * (0.27886807 + t * (-1.13520398 + t * (
+            1.48851587 + t * (-0.82215223 + t * 0.17087277)))))))))
+    return np.where(x >= 0, 1.0 - 0.5 * erfc, 0.5 * erfc)
+
+
+def years_to_expiry(expirations, now=None):
+    """Year fractions from ``now`` (UTC) to each 'YYYY-MM-DD' expiration."""
+    now = pd.Timestamp.now(tz='UTC') if now is None else pd.Timestamp(now)
+    if now.tzinfo is None:
+        now = now.tz_localize('UTC')
+    # A chain has few distinct expirations; parse each once
+    codes, unique = pd.factorize(np.asarray(expirations))
+    expiry = pd.to_datetime(unique, format='%Y-%m-%d', utc=True) + pd.Timedelta(hours=EXPIRY_HOUR_UTC)
+    years = (expiry - now).total_seconds().to_numpy() / (365 * 24 * 3600)
+    return np.maximum(years, MIN_TIME)[codes]
+
+
+def black_scholes_price(spot, strike, years, vol, is_call, rate=RISK_FREE_RATE):
+    """European option prices only; cheaper than ``black_scholes`` when the
+    Greeks are not needed, e.g. repricing over a scenario grid."""
+    years = np.maximum(years, MIN_TIME)
+    vol = np.maximum(vol, MIN_VOL)
+    vol_sqrt_t = vol * np.sqrt(years)
+    d1 = (np.log(spot / strike) + (rate + 0.5 * vol * vol) * years) / vol_sqrt_t
+    discounted_strike = strike * np.exp(-rate * years)
+    call_price = spot * norm_cdf(d1) - discounted_strike * norm_cdf(d1 - vol_sqrt_t)
+    return np.where(is_call, call_price, call_price - spot + discounted_strike)
+
+
+def black_scholes(spot, strike, years, vol, is_call, rate=RISK_FREE_RATE):
+    """Price and Greeks for European options.
+
+    Returns a dict of arrays: ``price``, ``delta``, ``gamma``, ``vega`` (per
+    1 vol point) and ``theta`` (per calendar day), all per unit of
+    underlying. Inputs broadcast against each other.
+    """
+    spot = np.asarray(spot, dtype=float)
+    strike = np.asarray(strike, dtype=float)
+    years = np.maximum(np.asarray(years, dtype=float), MIN_TIME)
+    vol = np.maximum(np.asarray(vol, dtype=float), MIN_VOL)
+    is_call = np.asarray(is_call, dtype=bool)
+
+    sqrt_t = np.sqrt(years)
+    d1 = (np.log(spot / strike) + (rate + 0.5 * vol * vol) * years) / (vol * sqrt_t)
+    d2 = d1 - vol * sqrt_t
+    discount = np.exp(-rate * years)
+    pdf_d1 = norm_pdf(d1)
+
+    cdf_d1 = norm_cdf(d1)
+    cdf_d2 = norm_cdf(d2)
+    call_price = spot * cdf_d1 - strike * discount * cdf_d2
+    put_price = call_price - spot + strike * discount
+
+    gamma = pdf_d1 / (spot * vol * sqrt_t)
+    vega = spot * pdf_d1 * sqrt_t / 100
+    decay = -spot * pdf_d1 * vol / (2 * sqrt_t)
+    call_theta = (decay - rate * strike * discount * cdf_d2) / 365
+    put_theta = (decay + rate * strike * discount * (1 - cdf_d2)) / 365
+
+    return {
+        'price': np.where(is_call, call_price, put_price),
+        'delta': np.where(is_call, cdf_d1, cdf_d1 - 1),
+        'gamma': gamma,
+        'vega': vega,
+        'theta': np.where(is_call, call_theta, put_theta),
+    }
@@ -0,0 +1,265 @@
+"""Market data providers: live Yahoo Finance, recording, and replay.
+
+``market_data`` gets every ticker object from ``get_ticker``, which returns
+one of:
+
+* live (the default): ``yfinance.Ticker``;
+* record: a live ticker that also writes every ``options``,
+  ``option_chain`` and ``history`` response to the archive;
+* replay: answers from the archive only, never touching the network, with
+  optional injected latency, jitter and failures.
+
+Pick one with ``DATA_PROVIDER`` (live, record or replay) and point
+``DATA_ARCHIVE_PATH`` at the archive. The archive is a directory per symbol
+holding ``options.json`` and zstd-compressed Arrow (Feather) files, one per
+chain side and expiration and one per history.
+
+Replayed histories are anchored at the last recorded bar rather than at the
+wall clock: a request for the last N days returns the N days up to the end of
+the recording, so runs are repeatable whenever they happen.
+
+A chain CSV such as ``SPY_options_chain.csv`` can seed an archive:
+
+    python provider.py seed SPY_options_chain.csv --symbol SPY
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+from lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+feather = lazy_import('pyarrow.feather')
+
+DEFAULT_ARCHIVE_PATH = os.environ.get(
+    'DATA_ARCHIVE_PATH',
+    os.path.join(tempfile.gettempdir(), 'market_data_archive')
+)
+PROVIDER = os.environ.get('DATA_PROVIDER', 'live')
+
+# Fault injection for replay
+REPLAY_LATENCY_MS = float(os.environ.get('REPLAY_LATENCY_MS', 0))
+REPLAY_JITTER_MS = float(os.environ.get('REPLAY_JITTER_MS', 0))
+REPLAY_FAILURE_RATE = float(os.environ.get('REPLAY_FAILURE_RATE', 0))
+REPLAY_SEED = os.environ.get('REPLAY_SEED')
+
+# The shape yfinance returns from Ticker.option_chain
+OptionChain = namedtuple('OptionChain', ['calls', 'puts', 'underlying'])
+
+
+class ReplayFailure(ConnectionError):
+    """An upstream failure injected by the replay provider."""
+
+
+class Archive:
+    """Recorded responses on disk, one directory per symbol."""
+
+    def __init__(self, root=DEFAULT_ARCHIVE_PATH):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _path(self, symbol, name):
+        root = os.path.realpath(self.root)
+        directory = os.path.realpath(os.path.join(root, symbol.upper()))
+        # Same check as the chain store: a symbol never escapes the archive
+        if os.path.dirname(directory) != root:
+            raise ValueError(f"Invalid symbol {symbol!r}")
+        return os.path.join(directory, name)
+
+    def _write(self, path, write):
+        # Same temp-file-and-rename pattern as the chain store, so a
+        # concurrent reader never sees a partial file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _write_frame(self, path, df):
+        self._write(path, lambda tmp: feather.write_feather(df, tmp, compression='zstd'))
+
+    def save_options(self, symbol, expirations):
+        def write(tmp):
+            with open(tmp, 'w') as f:
+                json.dump(list(expirations), f)
+        self._write(self._path(symbol, 'options.json'), write)
+
+    def load_options(self, symbol):
+        try:
+            with open(self._path(symbol, 'options.json')) as f:
+                return tuple(json.load(f))
+        except FileNotFoundError:
+            return ()
+
+    def save_chain(self, symbol, expiration, calls, puts):
+        self._write_frame(self._path(symbol, f'calls-{expiration}.feather'), calls)
+        self._write_frame(self._path(symbol, f'puts-{expiration}.feather'), puts)
+
+    def load_chain(self, symbol, expiration):
+        try:
+            return OptionChain(
+                feather.read_feather(self._path(symbol, f'calls-{expiration}.feather')),
+                feather.read_feather(self._path(symbol, f'puts-{expiration}.feather')),
+                None,
+            )
+        except FileNotFoundError:
+            # yfinance raises ValueError for an expiration it doesn't list
+            raise ValueError(f"Expiration `{expiration}` cannot be found for {symbol}")
+
+    def save_history(self, symbol, df):
+        # Keep the longest history seen, so every shorter window replays
+        path = self._path(symbol, 'history.feather')
+        with self._lock:
+            existing = self.load_history(symbol)
+            if len(existing) > len(df):
+                return
+            self._write_frame(path, df)
+
+    def load_history(self, symbol):
+        try:
+            return feather.read_feather(self._path(symbol, 'history.feather'))
+        except FileNotFoundError:
+            return pd.DataFrame()
+
+
+class RecordingTicker:
+    """A live ticker that archives every response it returns."""
+
+    def __init__(self, symbol, archive):
+        import yfinance as yf
+        self._ticker = yf.Ticker(symbol)
+        self._symbol = symbol
+        self._archive = archive
+
+    @property
+    def options(self):
+        expirations = self._ticker.options
+        self._archive.save_options(self._symbol, expirations)
+        return expirations
+
+    def option_chain(self, date=None):
+        chain = self._ticker.option_chain(date)
+        self._archive.save_chain(self._symbol, date, chain.calls, chain.puts)
+        return chain
+
+    def history(self, *args, **kwargs):
+        df = self._ticker.history(*args, **kwargs)
+        if not df.empty:
+            self._archive.save_history(self._symbol, df)
+        return df
+
+
+class ReplayTicker:
+    """Serves archived responses with injected latency and failures."""
+
+    def __init__(self, symbol, archive, latency_ms=REPLAY_LATENCY_MS,
+                 jitter_ms=REPLAY_JITTER_MS, failure_rate=REPLAY_FAILURE_RATE, rng=None):
+        self._symbol = symbol
+        self._archive = archive
+        self._latency = latency_ms / 1000
+        self._jitter = jitter_ms / 1000
+        self._failure_rate = failure_rate
+        self._rng = rng or random.Random()
+
+    def _respond(self, what):
+        delay = self._latency + self._rng.uniform(-self._jitter, self._jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if self._rng.random() < self._failure_rate:
+            raise ReplayFailure(f"Injected failure fetching {what} for {self._symbol}")
+
+    @property
+    def options(self):
+        self._respond('options')
+        return self._archive.load_options(self._symbol)
+
+    def option_chain(self, date=None):
+        self._respond('option chain')
+        if date is None:
+            expirations = self._archive.load_options(self._symbol)
+            if not expirations:
+                raise ValueError(f"No options recorded for {self._symbol}")
+            date = expirations[0]
+        return self._archive.load_chain(self._symbol, date)
+
+    def history(self, start=None, end=None, period=None, **kwargs):
+        self._respond('history')
+        df = self._archive.load_history(self._symbol)
+        if df.empty or start is None:
+            return df
+        # Anchor the requested window at the end of the recording
+        window = pd.Timestamp(end or pd.Timestamp.now()) - pd.Timestamp(start)
+        return df[df.index >= df.index[-1] - window]
+
+
+_archive = None
+_rng = random.Random(REPLAY_SEED) if REPLAY_SEED is not None else random.Random()
+
+
+def get_ticker(symbol):
+    """A ticker object for ``symbol`` from the provider in ``PROVIDER``."""
+    global _archive
+    if PROVIDER == 'live':
+        import yfinance as yf
+        return yf.Ticker(symbol)
+    if _archive is None:
+        _archive = Archive()
+    if PROVIDER == 'record':
+        return RecordingTicker(symbol, _archive)
+    if PROVIDER == 'replay':
+        return ReplayTicker(symbol, _archive, rng=_rng)
+    raise ValueError(f"Unknown DATA_PROVIDER {PROVIDER!r}; use live, record or replay")
+
+
+def seed_from_csv(path, symbol=None, archive=None):
+    """Archive a chain CSV in the format of ``SPY_options_chain.csv``.
+
+    Expiration and right are read from each OCC contract symbol. Returns the
+    list of expirations written.
+    """
+    archive = archive or Archive()
+    df = pd.read_csv(path, index_col=0)
+    symbols = df['contractSymbol'].astype(str)
+    if symbol is None:
+        symbol = symbols.str[:-15].iloc[0]
+    expirations = pd.to_datetime(symbols.str[-15:-9], format='%y%m%d').dt.strftime('%Y-%m-%d')
+    is_call = symbols.str[-9] == 'C'
+    if 'lastTradeDate' in df:
+        df['lastTradeDate'] = pd.to_datetime(df['lastTradeDate'], utc=True)
+    df = df.drop(columns=['Option_Type', 'Expiration'], errors='ignore')
+
+    written = sorted(expirations.unique())
+    for expiration in written:
+        rows = expirations == expiration
+        archive.save_chain(symbol, expiration,
+                           df[rows & is_call].reset_index(drop=True),
+                           df[rows & ~is_call].reset_index(drop=True))
+    archive.save_options(symbol, written)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    seed = commands.add_parser('seed', help='archive a chain CSV as a replay fixture')
+    seed.add_argument('csv')
+    seed.add_argument('--symbol', help='underlying; read from the contract symbols by default')
+    seed.add_argument('--archive', default=DEFAULT_ARCHIVE_PATH)
+    args = parser.parse_args(argv)
+
+    written = seed_from_csv(args.csv, args.symbol, Archive(args.archive))
+    print(f"Archived {len(written)} expirations to {args.archive}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""Daily rollups of option chain metrics, one row per ticker and trading day.
+
+Every chain snapshot is reduced to a handful of numbers as it is stored:
+ATM implied vol at fixed tenors, 25-delta skew, term-structure slope, and
+open interest and volume by right with put/call ratios. Rows live in a
+SQLite table keyed by (ticker, date); a later snapshot on the same day
+replaces the earlier one, so each day keeps its last reading. A query over
+years of history then reads one row per day instead of every contract.
+
+Rows for snapshots already in the chain store can be filled in with
+``backfill``:
+
+    python rollups.py SPY --backfill
+    python rollups.py SPY --start 2025-01-01 > spy_rollups.csv
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import pricing
+from cache import LocalConnection
+from chain_store import snapshot_date
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+DEFAULT_ROLLUP_PATH = os.environ.get(
+    'ROLLUP_DB_PATH',
+    os.path.join(tempfile.gettempdir(), 'options_rollups.sqlite3')
+)
+
+# Tenors, in calendar days, at which ATM IV is interpolated
+TENORS = (7, 30, 60, 90, 180, 365)
+
+# Skew is read at this tenor, and the term slope runs between these two
+SKEW_TENOR = 30
+SLOPE_TENORS = (30, 90)
+
+SKEW_DELTA = 0.25
+
+COLUMNS = (
+    ['spot']
+    + [f'atm_iv_{tenor}d' for tenor in TENORS]
+    + ['skew_25d', 'term_slope', 'call_oi', 'put_oi', 'call_volume', 'put_volume',
+       'put_call_oi', 'put_call_volume']
+)
+
+
+def _at_tenor(years, values, tenor, total_variance=False):
+    """``values`` (one per expiration, ``years`` ascending) at ``tenor`` years.
+
+    Interpolates linearly, in total variance for implied vols. Tenors before
+    the first expiration take its value; past the last one there is no
+    reading.
+    """
+    if len(years) == 0 or tenor > years[-1]:
+        return np.nan
+    if tenor <= years[0]:
+        return float(values[0])
+    if total_variance:
+        return float(np.sqrt(np.interp(tenor, years, values * values * years) / tenor))
+    return float(np.interp(tenor, years, values))
+
+
+def _delta_iv(delta, iv, target):
+    """IV at ``target`` delta, interpolated over one expiration's OTM quotes."""
+    order = np.argsort(delta)
+    delta, iv = delta[order], iv[order]
+    if len(delta) < 2 or not delta[0] <= target <= delta[-1]:
+        return np.nan
+    return float(np.interp(target, delta, iv))
+
+
+def term_structure(chain, spot, now):
+    """Per expiration: years to expiry, ATM IV and the 25-delta call and put
+    IVs, ordered by expiry."""
+    years = pricing.years_to_expiry(chain['Expiration'].to_numpy(), now)
+    # Contracts past expiry (or expiring now) say nothing about the curve
+    live = (chain['impliedVolatility'] > 0).to_numpy() & (years > pricing.MIN_TIME)
+    quoted = chain[live]
+    years = years[live]
+    strike = quoted['strike'].to_numpy(dtype=float)
+    iv = quoted['impliedVolatility'].to_numpy(dtype=float)
+    is_call = (quoted['Option_Type'] == 'CALL').to_numpy()
+    delta = pricing.black_scholes(spot, strike, years, iv, is_call)['delta']
+
+    rows = []
+    for expiration, positions in quoted.groupby('Expiration', sort=True).indices.items():
+        distance = np.abs(strike[positions] - spot)
+        atm = positions[distance == distance.min()]
+        calls = positions[is_call[positions] & (strike[positions] >= spot)]
+        puts = positions[~is_call[positions] & (strike[positions] <= spot)]
+        rows.append((expiration, years[positions[0]], iv[atm].mean(),
+                     _delta_iv(delta[calls], iv[calls], SKEW_DELTA),
+                     _delta_iv(delta[puts], iv[puts], -SKEW_DELTA)))
+    return (pd.DataFrame(rows, columns=['Expiration', 'years', 'atm_iv', 'call_25d_iv', 'put_25d_iv'])
+            .sort_values('years', kind='mergesort')
+            .reset_index(drop=True))
+
+
+def compute_rollup(chain, spot, now):
+    """One day's metrics (keys in ``COLUMNS``) for an assembled chain."""
+    structure = term_structure(chain, spot, now)
+    years = structure['years'].to_numpy()
+    atm_iv = structure['atm_iv'].to_numpy()
+    row = {'spot': float(spot)}
+    for tenor in TENORS:
+        row[f'atm_iv_{tenor}d'] = _at_tenor(years, atm_iv, tenor / 365, total_variance=True)
+
+    skew = (structure['put_25d_iv'] - structure['call_25d_iv']).to_numpy()
+    has_skew = ~np.isnan(skew)
+    row['skew_25d'] = _at_tenor(years[has_skew], skew[has_skew], SKEW_TENOR / 365)
+    short, long = SLOPE_TENORS
+    row['term_slope'] = row[f'atm_iv_{long}d'] - row[f'atm_iv_{short}d']
+
+    is_call = chain['Option_Type'] == 'CALL'
+    open_interest = chain['openInterest'].fillna(0)
+    volume = chain['volume'].fillna(0)
+    row['call_oi'] = float(open_interest[is_call].sum())
+    row['put_oi'] = float(open_interest[~is_call].sum())
+    row['call_volume'] = float(volume[is_call].sum())
+    row['put_volume'] = float(volume[~is_call].sum())
+    row['put_call_oi'] = row['put_oi'] / row['call_oi'] if row['call_oi'] else np.nan
+    row['put_call_volume'] = row['put_volume'] / row['call_volume'] if row['call_volume'] else np.nan
+    return row
+
+
+class RollupStore:
+    """Daily rollup rows in a SQLite file shared by every worker process."""
+
+    def __init__(self, path=DEFAULT_ROLLUP_PATH):
+        self.path = path
+        self._connection = LocalConnection(path, [
+            'CREATE TABLE IF NOT EXISTS daily_rollups ('
+            'ticker TEXT NOT NULL, date TEXT NOT NULL, version INTEGER NOT NULL, '
+            + ', '.join(f'{column} REAL' for column in COLUMNS)
+            + ', PRIMARY KEY (ticker, date))',
+        ])
+
+    def record(self, ticker, version, row):
+        """Store ``row`` as the rollup for the day of snapshot ``version``,
+        unless that day already holds a later snapshot."""
+        names = ', '.join(COLUMNS)
+        placeholders = ', '.join('?' for _ in COLUMNS)
+        updates = ', '.join(f'{column} = excluded.{column}' for column in COLUMNS)
+        # NaN has no SQL form; store it as NULL
+        values = [None if pd.isna(row[column]) else row[column] for column in COLUMNS]
+        self._connection.get().execute(
+            f'INSERT INTO daily_rollups (ticker, date, version, {names}) '
+            f'VALUES (?, ?, ?, {placeholders}) '
+            f'ON CONFLICT (ticker, date) DO UPDATE SET version = excluded.version, {updates} '
+            f'WHERE excluded.version >= daily_rollups.version',
+            [ticker.upper(), snapshot_date(version), version] + values
+        )
+
+    def latest_version(self, ticker):
+        """Version of the newest snapshot rolled up for ``ticker``, or None."""
+        row = self._connection.get().execute(
+            'SELECT MAX(version) FROM daily_rollups WHERE ticker = ?', (ticker.upper(),)
+        ).fetchone()
+        return row[0]
+
+    def history(self, ticker, start=None, end=None):
+        """Rollups for ``ticker`` between ``start`` and ``end`` (inclusive
+        'YYYY-MM-DD' strings, open-ended when omitted), indexed by date."""
+        cursor = self._connection.get().execute(
+            f'SELECT date, {", ".join(COLUMNS)} FROM daily_rollups '
+            'WHERE ticker = ? AND date >= ? AND date <= ? ORDER BY date',
+            (ticker.upper(), start or '', end or '9999')
+        )
+        rows = cursor.fetchall()
+        index = pd.DatetimeIndex([row[0] for row in rows], name='date')
+        return pd.DataFrame([row[1:] for row in rows], columns=COLUMNS, index=index, dtype=float)
+
+
+def backfill(ticker, chains, rollups):
+    """Roll up every snapshot of ``ticker`` in the ChainStore ``chains``.
+
+    The spot for a stored snapshot is the put-call parity estimate saved with
+    it. Returns the number of snapshots rolled up.
+    """
+    count = 0
+    for version in chains.versions(ticker):
+        table = chains.read(ticker, version)
+        expected_move = chains.read_extra(ticker, 'expected_move', version)
+        if table is None or expected_move is None or expected_move.num_rows == 0:
+            continue
+        spot = expected_move.column('underlying')[0].as_py()
+        now = pd.Timestamp(version, unit='ns', tz='UTC')
+        rollups.record(ticker, version, compute_rollup(table.to_pandas(), spot, now))
+        count += 1
+    return count
+
+
+def main():
+    from chain_store import ChainStore
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('ticker')
+    parser.add_argument('--start', help='first date, YYYY-MM-DD')
+    parser.add_argument('--end', help='last date, YYYY-MM-DD')
+    parser.add_argument('--backfill', action='store_true',
+                        help='roll up the snapshots in the chain store first')
+    parser.add_argument('--db', default=DEFAULT_ROLLUP_PATH)
+    args = parser.parse_args()
+
+    rollups = RollupStore(args.db)
+    if args.backfill:
+        count = backfill(args.ticker, ChainStore(), rollups)
+        print(f"Rolled up {count} snapshots of {args.ticker.upper()}", file=sys.stderr)
+    rollups.history(args.ticker, args.start, args.end).to_csv(sys.stdout)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
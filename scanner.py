@@ -0,0 +1,204 @@
+"""Unusual options activity across a watchlist.
+
+    python scanner.py watchlist.txt
+    python scanner.py watchlist.txt --min-zscore 4 --out unusual.csv
+
+For each ticker the current chain is compared with the last snapshot of each
+earlier trading day kept in the chain store (``CHAIN_STORE_KEEP_DAYS``): the
+previous trading day for open-interest changes, and up to ``--baseline``
+trading days as the rolling baseline for volume. Intraday refreshes never
+count as baseline days, and tickers with fewer than ``MIN_BASELINE_DAYS``
+prior days are skipped rather than scored. Contracts are matched across snapshots by ``contractSymbol`` with a
+hash join, so each ticker costs a few vectorized passes over its chain.
+Tickers are scanned concurrently; chains come from the shared fetch cache
+and chain store, so only tickers whose snapshot has expired hit Yahoo.
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import market_data
+from batch_export import read_tickers
+from chain_store import snapshot_date
+
+COLUMNS = ['contractSymbol', 'Expiration', 'Option_Type', 'strike',
+           'lastPrice', 'volume', 'openInterest']
+
+# Default flag thresholds
+MIN_VOLUME = 100
+VOLUME_OI_RATIO = 2.0
+VOLUME_ZSCORE = 3.0
+OI_CHANGE_PCT = 0.5
+
+# Prior trading days averaged for the volume baseline, and the fewest a
+# ticker needs before it is scored at all
+BASELINE_DAYS = 5
+MIN_BASELINE_DAYS = 2
+
+
+class InsufficientHistory(ValueError):
+    """Raised when a ticker has too few prior trading days to score."""
+
+
+def _snapshot(ticker, version):
+    table = market_data.store.read(ticker, version)
+    if table is None:
+        return None
+    df = table.select(COLUMNS).to_pandas()
+    df['volume'] = df['volume'].fillna(0)
+    df['openInterest'] = df['openInterest'].fillna(0)
+    return df
+
+
+def _aligned(index, prior, column):
+    """``prior[column]`` reordered to match ``index``; NaN where missing."""
+    positions = index.get_indexer(prior['contractSymbol'].to_numpy())
+    values = np.full(len(index), np.nan)
+    found = positions >= 0
+    values[positions[found]] = prior[column].to_numpy(dtype=float)[found]
+    return values
+
+
+def _daily_priors(ticker, version, baseline):
+    """Last snapshot of each of up to ``baseline`` trading days before the
+    day of ``version``, oldest first."""
+    today = snapshot_date(version)
+    days = [v for date, v in market_data.store.daily_versions(ticker) if date < today][-baseline:]
+    return [p for p in (_snapshot(ticker, v) for v in days) if p is not None]
+
+
+def scan_ticker(ticker, baseline=BASELINE_DAYS, min_volume=MIN_VOLUME,
+                volume_oi_ratio=VOLUME_OI_RATIO, volume_zscore=VOLUME_ZSCORE,
+                oi_change_pct=OI_CHANGE_PCT):
+    """Flagged contracts for one ticker as a DataFrame (possibly empty).
+
+    A contract with at least ``min_volume`` traded is flagged when its
+    volume/OI ratio, its volume z-score against the baseline days, or its
+    relative OI change since the previous trading day reaches the threshold.
+    The ``reasons`` column lists which checks fired. Raises
+    InsufficientHistory when fewer than ``MIN_BASELINE_DAYS`` prior trading
+    days are stored.
+    """
+    version = market_data.chain_version(ticker)
+    current = _snapshot(ticker, version)
+    if current is None or current.empty:
+        return pd.DataFrame()
+    priors = _daily_priors(ticker, version, baseline)
+    if len(priors) < min(MIN_BASELINE_DAYS, baseline):
+        raise InsufficientHistory(f"{len(priors)} prior trading days stored, "
+                                  f"need {min(MIN_BASELINE_DAYS, baseline)}")
+
+    index = pd.Index(current['contractSymbol'].to_numpy())
+    volume = current['volume'].to_numpy(dtype=float)
+    open_interest = current['openInterest'].to_numpy(dtype=float)
+
+    ratio = volume / np.maximum(open_interest, 1)
+    # Axes: (contract, prior trading day)
+    history = np.column_stack([_aligned(index, p, 'volume') for p in priors])
+    observed = ~np.isnan(history)
+    counts = observed.sum(axis=1)
+    filled = np.where(observed, history, 0)
+    mean = filled.sum(axis=1) / np.maximum(counts, 1)
+    std = np.sqrt(np.maximum((filled ** 2).sum(axis=1) / np.maximum(counts, 1) - mean ** 2, 0))
+    mean[counts == 0] = np.nan
+    with np.errstate(invalid='ignore', divide='ignore'):
+        zscore = np.where((counts > 1) & (std > 0), (volume - mean) / std, np.nan)
+
+    previous_oi = _aligned(index, priors[-1], 'openInterest')
+    oi_change = open_interest - previous_oi
+    oi_change_ratio = oi_change / np.maximum(previous_oi, 1)
+
+    checks = {
+        'volume/OI': ratio >= volume_oi_ratio,
+        'volume z-score': zscore >= volume_zscore,
+        'OI change': np.abs(oi_change_ratio) >= oi_change_pct,
+    }
+    active = volume >= min_volume
+    flagged = active & np.logical_or.reduce(list(checks.values()))
+    if not flagged.any():
+        return pd.DataFrame()
+
+    reasons = np.full(len(index), '', dtype=object)
+    for name, fired in checks.items():
+        reasons[fired] += np.where(reasons[fired] == '', name, ', ' + name)
+
+    result = current.assign(
+        ticker=ticker.upper(),
+        volume_oi_ratio=ratio,
+        volume_baseline=mean,
+        volume_zscore=zscore,
+        oi_change=oi_change,
+        reasons=reasons,
+    )[flagged]
+    return result[['ticker'] + COLUMNS + ['volume_oi_ratio', 'volume_baseline',
+                                          'volume_zscore', 'oi_change', 'reasons']]
+
+
+def scan(tickers, workers=8, **thresholds):
+    """Scan ``tickers`` on a thread pool.
+
+    Returns ``(flagged, errors, skipped)``: every flagged contract sorted by
+    volume z-score then volume/OI ratio, a dict of ticker -> error message,
+    and a dict of ticker -> reason for tickers without enough history.
+    """
+    results, errors, skipped = [], {}, {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(scan_ticker, ticker, **thresholds): ticker for ticker in tickers}
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except InsufficientHistory as e:
+                skipped[futures[future]] = str(e)
+            except Exception as e:
+                errors[futures[future]] = str(e)
+    results = [r for r in results if not r.empty]
+    if not results:
+        return pd.DataFrame(), errors, skipped
+    flagged = pd.concat(results, ignore_index=True)
+    flagged = flagged.sort_values(['volume_zscore', 'volume_oi_ratio'], ascending=False,
+                                  na_position='last', ignore_index=True)
+    return flagged, errors, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('watchlist', help='file with one ticker per line')
+    parser.add_argument('--workers', type=int, default=8, help='tickers scanned at once')
+    parser.add_argument('--baseline', type=int, default=BASELINE_DAYS,
+                        help='prior trading days in the volume baseline')
+    parser.add_argument('--min-volume', type=float, default=MIN_VOLUME)
+    parser.add_argument('--min-ratio', type=float, default=VOLUME_OI_RATIO, help='volume/OI threshold')
+    parser.add_argument('--min-zscore', type=float, default=VOLUME_ZSCORE, help='volume z-score threshold')
+    parser.add_argument('--min-oi-change', type=float, default=OI_CHANGE_PCT,
+                        help='relative OI change threshold (0.5 is 50%%)')
+    parser.add_argument('--out', help='write flagged contracts to this CSV')
+    args = parser.parse_args(argv)
+
+    tickers = read_tickers(args.watchlist)
+    started = time.perf_counter()
+    flagged, errors, skipped = scan(
+        tickers, workers=args.workers, baseline=args.baseline, min_volume=args.min_volume,
+        volume_oi_ratio=args.min_ratio, volume_zscore=args.min_zscore,
+        oi_change_pct=args.min_oi_change,
+    )
+    elapsed = time.perf_counter() - started
+
+    if args.out:
+        flagged.to_csv(args.out, index=False)
+    elif not flagged.empty:
+        print(flagged.head(50).to_string(index=False))
+    print(f"\n{len(flagged)} contracts flagged across {len(tickers) - len(errors) - len(skipped)} tickers "
+          f"in {elapsed:.1f}s")
+    for ticker, reason in sorted(skipped.items()):
+        print(f"{ticker}: skipped: {reason}", file=sys.stderr)
+    for ticker, error in sorted(errors.items()):
+        print(f"{ticker}: error: {error}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""Scenario P&L over a grid of spot, volatility and time shocks.
+
+A book is a set of option contracts with quantities: either an uploaded
+position file or a full chain (one long contract of each), leaving out
+contracts quoted without an implied volatility. Every contract is
+repriced at every (days forward, spot shock, vol shock) point with NumPy
+broadcasting. Contracts are processed in chunks sized so that the
+intermediate arrays stay within a memory budget.
+"""
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+
+import portfolio
+import pricing
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Bytes of working memory for one chunk of the grid evaluation; small chunks
+# stay in CPU cache and run faster than one big broadcast
+MEMORY_BUDGET = int(os.environ.get('SCENARIO_MEMORY_BUDGET', 16 * 1024 * 1024))
+
+# Roughly how many float64 temporaries one grid point needs while pricing
+TEMPORARIES_PER_POINT = 12
+
+
+@dataclass
+class Book:
+    """Contract-level pricing inputs, one entry per contract."""
+    spot: np.ndarray
+    strike: np.ndarray
+    years: np.ndarray
+    vol: np.ndarray
+    is_call: np.ndarray
+    weight: np.ndarray  # quantity x contract multiplier; negative for short
+
+    def __len__(self):
+        return len(self.strike)
+
+
+def book_from_positions(positions):
+    """A Book for an uploaded position set; unmatched and unpriced contracts
+    are skipped."""
+    positions = positions.reset_index(drop=True)
+    underlying = portfolio.underlying_of(positions['contractSymbol'])
+    parts = []
+    for ticker, rows in positions.groupby(underlying, sort=False).indices.items():
+        chain = portfolio.chain_greeks(ticker)
+        found = chain.lookup(positions['contractSymbol'].to_numpy()[rows])
+        matched = found >= 0
+        matched[matched] = chain.priced[found[matched]]
+        found = found[matched]
+        parts.append(Book(
+            spot=np.full(len(found), chain.spot),
+            strike=chain.strike[found],
+            years=chain.years[found],
+            vol=chain.vol[found],
+            is_call=chain.is_call[found],
+            weight=positions['quantity'].to_numpy()[rows[matched]] * portfolio.CONTRACT_MULTIPLIER,
+        ))
+    if not parts:
+        raise ValueError("None of the positions were found in current chains")
+    return Book(*(np.concatenate([getattr(part, field) for part in parts])
+                  for field in ('spot', 'strike', 'years', 'vol', 'is_call', 'weight')))
+
+
+def book_from_chain(ticker, option_type='BOTH'):
+    """A Book holding one long contract of every listed option for ``ticker``
+    that has an implied volatility."""
+    chain = portfolio.chain_greeks(ticker)
+    selected = chain.priced
+    if option_type == 'CALL':
+        selected = selected & chain.is_call
+    elif option_type == 'PUT':
+        selected = selected & ~chain.is_call
+    count = int(selected.sum())
+    return Book(
+        spot=np.full(count, chain.spot),
+        strike=chain.strike[selected],
+        years=chain.years[selected],
+        vol=chain.vol[selected],
+        is_call=chain.is_call[selected],
+        weight=np.full(count, float(portfolio.CONTRACT_MULTIPLIER)),
+    )
+
+
+def chunk_size(n_points, memory_budget=MEMORY_BUDGET):
+    """Contracts per chunk so a chunk's temporaries fit in ``memory_budget``."""
+    return max(1, memory_budget // (n_points * TEMPORARIES_PER_POINT * 8))
+
+
+def scenario_pnl(book, spot_shocks, vol_shocks, days_forward=(0,), memory_budget=MEMORY_BUDGET):
+    """P&L of ``book`` for every scenario, as an array shaped
+    (len(days_forward), len(spot_shocks), len(vol_shocks)).
+
+    ``spot_shocks`` are relative moves of each underlying (0.1 is +10%),
+    ``vol_shocks`` are absolute changes in implied vol (0.05 is +5 points) and
+    ``days_forward`` are calendar days of time decay.
+    """
+    spot_shocks = np.asarray(spot_shocks, dtype=float)
+    vol_shocks = np.asarray(vol_shocks, dtype=float)
+    days_forward = np.asarray(days_forward, dtype=float)
+    base = pricing.black_scholes_price(book.spot, book.strike, book.years, book.vol, book.is_call)
+
+    pnl = np.zeros((len(days_forward), len(spot_shocks), len(vol_shocks)))
+    step = chunk_size(len(spot_shocks) * len(vol_shocks), memory_budget)
+    for start in range(0, len(book), step):
+        chunk = slice(start, start + step)
+        # Axes: (contract, spot shock, vol shock)
+        spot = book.spot[chunk, None, None] * (1 + spot_shocks[None, :, None])
+        vol = book.vol[chunk, None, None] + vol_shocks[None, None, :]
+        strike = book.strike[chunk, None, None]
+        is_call = book.is_call[chunk, None, None]
+        for i, days in enumerate(days_forward):
+            years = (book.years[chunk] - days / 365)[:, None, None]
+            price = pricing.black_scholes_price(spot, strike, years, vol, is_call)
+            price -= base[chunk, None, None]
+            pnl[i] += np.tensordot(book.weight[chunk], price, axes=1)
+    return pnl
+
+
+def grid_frame(pnl, spot_shocks, vol_shocks, days_forward=(0,)):
+    """Long-format DataFrame of a ``scenario_pnl`` result, for download."""
+    days, spot, vol = np.meshgrid(days_forward, spot_shocks, vol_shocks, indexing='ij')
+    return pd.DataFrame({
+        'days_forward': days.ravel(),
+        'spot_shock': spot.ravel(),
+        'vol_shock': vol.ravel(),
+        'pnl': pnl.ravel(),
+    })
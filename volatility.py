@@ -0,0 +1,117 @@
+"""Realized volatility estimators and the ATM implied-vol term structure.
+
+Every rolling estimator is a windowed mean of a per-bar quantity, so all of
+them are computed from cumulative sums: one pass over the series whatever
+the window, instead of a ``rolling().apply`` per window. Results are
+annualized with ``TRADING_DAYS``.
+"""
+import market_data
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+TRADING_DAYS = 252
+DEFAULT_WINDOW = 21
+
+ESTIMATORS = ['close_to_close', 'parkinson', 'garman_klass', 'yang_zhang']
+
+TERM_COLUMNS = ['Expiration', 'days', 'atm_strike', 'atm_iv']
+
+
+def _rolling_mean(values, window):
+    """Trailing mean over ``window`` bars; NaN until the window is full."""
+    cumulative = np.concatenate([[0.0], np.cumsum(values)])
+    result = np.full(len(values), np.nan)
+    if len(values) >= window:
+        result[window - 1:] = (cumulative[window:] - cumulative[:-window]) / window
+    return result
+
+
+def _rolling_var(values, window):
+    """Trailing sample variance over ``window`` bars."""
+    mean = _rolling_mean(values, window)
+    return (_rolling_mean(values * values, window) - mean * mean) * window / (window - 1)
+
+
+def realized_vol(history, window=DEFAULT_WINDOW):
+    """Annualized rolling realized vol of an OHLC history, one column per
+    estimator in ``ESTIMATORS``, indexed like ``history``.
+
+    The first bar has no previous close, so estimators that use close-to-close
+    or overnight returns start one bar later than Parkinson and Garman-Klass.
+    """
+    # A NaN would poison every later cumulative sum
+    history = history.dropna(subset=['Open', 'High', 'Low', 'Close'])
+    open_ = np.log(history['Open'].to_numpy(dtype=float))
+    high = np.log(history['High'].to_numpy(dtype=float))
+    low = np.log(history['Low'].to_numpy(dtype=float))
+    close = np.log(history['Close'].to_numpy(dtype=float))
+
+    returns = np.diff(close)
+    overnight = open_[1:] - close[:-1]
+    intraday = close - open_
+    high_low = high - low
+    rogers_satchell = (high - close) * (high - open_) + (low - close) * (low - open_)
+
+    # Series that need a previous close are one bar shorter; pad them back
+    def padded(series):
+        return np.concatenate([[np.nan], series])
+
+    close_to_close = padded(_rolling_var(returns, window))
+    parkinson = _rolling_mean(high_low ** 2, window) / (4 * np.log(2))
+    garman_klass = _rolling_mean(0.5 * high_low ** 2 - (2 * np.log(2) - 1) * intraday ** 2, window)
+    k = 0.34 / (1.34 + (window + 1) / (window - 1))
+    yang_zhang = (
+        padded(_rolling_var(overnight, window))
+        + k * padded(_rolling_var(intraday[1:], window))
+        + (1 - k) * padded(_rolling_mean(rogers_satchell[1:], window))
+    )
+
+    variances = {
+        'close_to_close': close_to_close,
+        'parkinson': parkinson,
+        'garman_klass': garman_klass,
+        'yang_zhang': yang_zhang,
+    }
+    return pd.DataFrame(
+        {name: np.sqrt(np.maximum(variance, 0) * TRADING_DAYS) for name, variance in variances.items()},
+        index=history.index,
+    )
+
+
+def atm_term_structure(table, spot, now=None):
+    """ATM implied vol per expiration: the mean call/put IV at the listed
+    strike nearest ``spot``, with calendar days to expiry. Empty when there
+    is no chain."""
+    if table is None or table.num_rows == 0:
+        return pd.DataFrame(columns=TERM_COLUMNS)
+    chain = table.select(['Expiration', 'strike', 'impliedVolatility']).to_pandas()
+    chain = chain[chain['impliedVolatility'] > 0]
+    if chain.empty:
+        return pd.DataFrame(columns=TERM_COLUMNS)
+    distance = (chain['strike'] - spot).abs()
+    nearest = distance.groupby(chain['Expiration']).transform('min')
+    atm = (chain[distance == nearest]
+           .groupby('Expiration', sort=True)
+           .agg(atm_strike=('strike', 'first'), atm_iv=('impliedVolatility', 'mean'))
+           .reset_index())
+    now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+    days = (pd.to_datetime(atm['Expiration']) - now.normalize()).dt.days
+    return atm.assign(days=days.to_numpy())[TERM_COLUMNS]
+
+
+def vol_comparison(ticker, days=365, window=DEFAULT_WINDOW):
+    """``(realized, term_structure)`` for ``ticker`` from the cached history
+    and the current chain snapshot. The term structure is empty for a ticker
+    with no listed options."""
+    history = market_data.fetch_history(ticker, days)
+    if history.empty:
+        raise ValueError(f"No price history found for {ticker}")
+    realized = realized_vol(history, window)
+    spot = float(history['Close'].iloc[-1])
+    try:
+        table = market_data.load_chain_table(ticker)
+    except market_data.NoChainError:
+        table = None
+    return realized, atm_term_structure(table, spot)
@@ -0,0 +1,77 @@
+"""Production entry point.
+
+Runs the dashboard under gunicorn, a preforking WSGI server, instead of the
+single-process Flask development server started by ``python "app v2.py"``.
+
+    python wsgi.py --workers 4 --threads 8 --bind 0.0.0.0:8050
+
+or, equivalently, with gunicorn's own CLI:
+
+    gunicorn wsgi:server -c gunicorn_config.py
+
+Workers share fetched data through the SQLite cache in ``cache.py``, so
+adding workers does not multiply upstream Yahoo Finance requests.
+"""
+import argparse
+import importlib.util
+import os
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# The app file to serve; 'app v2.py' is the multi-page dashboard
+APP_FILE = os.environ.get('DASH_APP_FILE', 'app v2.py')
+
+
+def load_app_module(app_file=APP_FILE):
+    # The app files are scripts whose names are not importable, so load them
+    # from their path.
+    path = os.path.join(HERE, app_file)
+    module_name = os.path.splitext(os.path.basename(path))[0].replace(' ', '_')
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def create_app(app_file=APP_FILE):
+    return load_app_module(app_file).create_app()
+
+
+app = create_app()
+server = app.server
+
+# Dash registers callbacks on the first request, and a second thread that
+# arrives while that is under way finds none. Make that first request here,
+# once, before gunicorn forks and starts threads.
+with server.test_client() as client:
+    client.get('/_dash-dependencies')
+
+
+def main():
+    from gunicorn.app.base import BaseApplication
+
+    import gunicorn_config as defaults
+
+    parser = argparse.ArgumentParser(description='Serve the dashboard with gunicorn')
+    parser.add_argument('--bind', default=defaults.bind)
+    parser.add_argument('--workers', type=int, default=defaults.workers)
+    parser.add_argument('--threads', type=int, default=defaults.threads)
+    parser.add_argument('--timeout', type=int, default=defaults.timeout)
+    args = parser.parse_args()
+
+    class DashApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', args.bind)
+            self.cfg.set('workers', args.workers)
+            self.cfg.set('threads', args.threads)
+            self.cfg.set('timeout', args.timeout)
+            self.cfg.set('preload_app', True)
+
+        def load(self):
+            return server
+
+    DashApplication().run()
+
+
+if __name__ == '__main__':
+    main()